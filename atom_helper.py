@@ -0,0 +1,117 @@
+"""
+Fast parser for Environment Canada Atom weather feeds.
+
+feedparser understands every feed format ever published and is slow to
+import and to run. WeatherPeg only needs a few fields of a few entry
+categories, so this parser streams the document with iterparse, builds
+only the entries it was asked for, and stops reading once it has them.
+The result looks like feedparser's for the fields WeatherPeg uses
+(`feed.entries[i].title`, `.summary`, `.link`, `.category`, `.updated`,
+`.updated_parsed` and `feed.feed.updated_parsed`). If the document is
+not well-formed Atom, feedparser parses it instead.
+"""
+
+import datetime
+import io
+import logging
+import xml.etree.ElementTree as ET
+
+ATOM = "{http://www.w3.org/2005/Atom}"
+WANTED_CATEGORIES = frozenset({"Warnings and Watches", "Current Conditions", "Weather Forecasts"})
+
+_ENTRY = ATOM + "entry"
+_UPDATED = ATOM + "updated"
+
+
+class FeedDict(dict):
+    """dict with attribute access, like feedparser's FeedParserDict."""
+
+    def __getattr__(self, name):
+        try:
+            return self[name]
+        except KeyError:
+            raise AttributeError(name) from None
+
+
+def _parse_time(text):
+    """Atom date-time text as a UTC struct_time, or None."""
+    try:
+        value = datetime.datetime.fromisoformat(text.strip().replace("Z", "+00:00"))
+    except (AttributeError, ValueError):
+        return None
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=datetime.timezone.utc)
+    return value.utctimetuple()
+
+
+def _read_entry(element):
+    entry = FeedDict(title="", summary="", link="", category=None, updated="", updated_parsed=None)
+    for child in element:
+        tag = child.tag
+        if tag == ATOM + "title":
+            entry["title"] = (child.text or "").strip()
+        elif tag == ATOM + "summary":
+            entry["summary"] = child.text or ""
+        elif tag == ATOM + "link":
+            if not entry["link"] and child.get("rel", "alternate") == "alternate":
+                entry["link"] = child.get("href", "")
+        elif tag == ATOM + "category":
+            if entry["category"] is None:
+                entry["category"] = child.get("term")
+        elif tag == _UPDATED:
+            entry["updated"] = (child.text or "").strip()
+            entry["updated_parsed"] = _parse_time(entry["updated"])
+        elif tag == ATOM + "id":
+            entry["id"] = (child.text or "").strip()
+    return entry
+
+
+def parse_atom(content, categories=WANTED_CATEGORIES):
+    """Parse Atom bytes into a feedparser-like result with only the entries in `categories`.
+
+    Entries of one category are grouped together in these feeds, so
+    reading stops at the first unwanted entry after every wanted category
+    has been seen. Raises ET.ParseError on malformed XML.
+    """
+    result = FeedDict(feed=FeedDict(), entries=[], bozo=0)
+    remaining = set(categories)
+    depth = 0
+    for event, element in ET.iterparse(io.BytesIO(content), events=("start", "end")):
+        if event == "start":
+            depth += 1
+            continue
+        depth -= 1
+        if element.tag == _ENTRY:
+            category = next((child.get("term") for child in element if child.tag == ATOM + "category"), None)
+            if category in categories:
+                result.entries.append(_read_entry(element))
+                remaining.discard(category)
+            elif not remaining:
+                break
+            element.clear()
+        elif depth == 1:
+            # feed-level element
+            if element.tag == _UPDATED:
+                result.feed["updated"] = (element.text or "").strip()
+                result.feed["updated_parsed"] = _parse_time(result.feed["updated"])
+            elif element.tag == ATOM + "title":
+                result.feed["title"] = (element.text or "").strip()
+    return result
+
+
+def parse(content, categories=WANTED_CATEGORIES):
+    """Parse a feed with the fast path, falling back to feedparser for anything it cannot read."""
+    try:
+        result = parse_atom(content, categories)
+    except ET.ParseError as e:
+        logging.warning(f"Fast feed parser failed ({e}), using feedparser")
+    else:
+        if result.entries:
+            return result
+        logging.info("Fast feed parser found no entries, using feedparser")
+    import feedparser  # only imported when actually needed
+    return feedparser.parse(content)
+
+
+if __name__ == "__main__":
+    print("This is a module, and not meant to be run directly")
@@ -0,0 +1,49 @@
+"""
+Micro-benchmark for conditions_helper.parse_summary over txt/history.txt.
+
+Run from the repository root:
+
+    python benchmarks/bench_conditions.py [--repeat 20]
+
+Reports records parsed per second with the memo cache cleared before every
+parse (cold) and with it left warm, as repeated refreshes see it.
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from conditions_helper import parse_summary  # noqa: E402
+from history_helper import HISTORY_TXT, read_history_txt  # noqa: E402
+
+
+def _rate(summaries, repeat, clear_cache):
+    parse_summary.cache_clear()
+    started = time.perf_counter()
+    for _ in range(repeat):
+        for summary in summaries:
+            if clear_cache:
+                parse_summary.cache_clear()
+            parse_summary(summary)
+    elapsed = time.perf_counter() - started
+    return len(summaries) * repeat / elapsed
+
+
+def main():
+    """Print parse_summary throughput with a cold and a warm cache."""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--source", default=HISTORY_TXT)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    summaries = [block["summary"] for block in read_history_txt(args.source) if block["summary"]]
+    print(f"{len(summaries)} summaries ({len(set(summaries))} distinct) from {args.source}")
+    print(f"cold: {_rate(summaries, args.repeat, clear_cache=True):,.0f} records/s")
+    print(f"warm: {_rate(summaries, args.repeat, clear_cache=False):,.0f} records/s")
+
+
+if __name__ == "__main__":
+    main()
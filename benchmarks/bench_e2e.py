@@ -0,0 +1,254 @@
+"""
+End-to-end benchmark suite, run against the offline replay server.
+
+Run from the repository root:
+
+    python benchmarks/bench_e2e.py [--refreshes 50] [--latency-ms 0] [--output run.json] [--compare old.json]
+
+Measures, with feeds from benchmarks/replay_server.py instead of weather.gc.ca:
+
+- parse throughput: feeds/s and MB/s through the fast Atom parser, and
+  through parsing plus WeatherFetcher._read_feed,
+- poll-to-display latency: a headless WeatherFetcher polls the replay
+  server; each step moves the feed on, asks for a refresh and times how
+  long until the new weather reaches the state the GUI and web tier read,
+- memory per refresh: Python memory still allocated after the refreshes
+  (tracemalloc), per refresh, and the peak during them,
+- web requests/sec: benchmarks/load_test.py against a spawned
+  web_service.py (skip with --web-duration 0; needs flask).
+
+WeatherFetcher runs in a temporary directory with a copy of
+txt/config.txt, so the history store and the last-known-good snapshot
+are not touched. Results are printed as JSON and written to --output.
+--compare prints the change in every number against an earlier run.
+"""
+
+import argparse
+import contextlib
+import datetime
+import gc
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import atom_helper  # noqa: E402
+from config import CONFIG_FILE  # noqa: E402
+from load_test import percentile  # noqa: E402
+from replay_server import ReplayServer, load_fixtures  # noqa: E402
+from source_helper import FeedSource  # noqa: E402
+from weather_fetcher import WeatherFetcher  # noqa: E402
+
+# settings for the benchmarked WeatherFetcher: no side effects, polls only when asked
+CONFIG_OVERRIDES = {
+    "write_log": 0,
+    "last_good_snapshot": 0,
+    "webserver": 0,
+    "fast_parser": 1,
+    "adaptive_polling": 0,
+    "refresh_delay": 3600000,
+}
+
+
+@contextlib.contextmanager
+def sandbox(overrides):
+    """Run in a temporary directory holding txt/config.txt with `overrides` applied."""
+    directory = tempfile.mkdtemp(prefix="weatherpeg-bench-")
+    lines = []
+    with open(os.path.join(ROOT, CONFIG_FILE), "r", encoding="utf-8") as f:
+        for line in f:
+            key = line.split(":", 1)[0].strip()
+            if key not in overrides:
+                lines.append(line.rstrip("\n"))
+    lines.extend(f"{key}: {value}" for key, value in overrides.items())
+    os.makedirs(os.path.join(directory, os.path.dirname(CONFIG_FILE)))
+    with open(os.path.join(directory, CONFIG_FILE), "w", encoding="utf-8") as f:
+        f.write("\n".join(lines) + "\n")
+    previous = os.getcwd()
+    os.chdir(directory)
+    try:
+        yield directory
+    finally:
+        os.chdir(previous)
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def bench_parse(feeds, repeat):
+    """Parse throughput of the fast parser, alone and with the fetcher's entry processing."""
+    reader = WeatherFetcher.__new__(WeatherFetcher)  # _read_feed needs no instance state
+    total_bytes = sum(map(len, feeds))
+    results = {"feeds": len(feeds), "average_kib": total_bytes / len(feeds) / 1024}
+    for name, work in (("parse", atom_helper.parse),
+                       ("parse_and_read", lambda content: reader._read_feed(atom_helper.parse(content)))):
+        started = time.perf_counter()
+        for _ in range(repeat):
+            for content in feeds:
+                work(content)
+        elapsed = time.perf_counter() - started
+        results[name] = {
+            "feeds_per_sec": len(feeds) * repeat / elapsed,
+            "mb_per_sec": total_bytes * repeat / elapsed / 1e6,
+        }
+    return results
+
+
+def _refresh_steps(fetcher, server, displayed, count, timeout):
+    """Advance the feed and refresh `count` times; return (latencies in seconds, timeouts)."""
+    latencies = []
+    timeouts = 0
+    for _ in range(count):
+        displayed.clear()
+        server.advance(0)
+        started = time.perf_counter()
+        fetcher.engine.refresh(0)
+        if displayed.wait(timeout):
+            latencies.append(time.perf_counter() - started)
+        else:
+            timeouts += 1
+    return latencies, timeouts
+
+
+def bench_poll_to_display(feeds, refreshes, timeout, server_options):
+    """Poll-to-display latency and memory per refresh for a headless WeatherFetcher."""
+    server = ReplayServer(feeds, **server_options).start()
+    fetcher = WeatherFetcher(sources=[FeedSource(server.url(0))])
+    displayed = threading.Event()
+    fetcher.state.subscribe(lambda delta, snapshot: displayed.set())
+    try:
+        fetcher.get_weather()
+        if not displayed.wait(timeout):
+            return {"error": f"no weather displayed within {timeout}s of the first poll"}, None
+
+        latencies, timeouts = _refresh_steps(fetcher, server, displayed, refreshes, timeout)
+        latency = {
+            "refreshes": refreshes,
+            "timeouts": timeouts,
+            "mean_ms": statistics.mean(latencies) * 1000 if latencies else None,
+            "p50_ms": percentile(latencies, 50) * 1000,
+            "p99_ms": percentile(latencies, 99) * 1000,
+            "max_ms": max(latencies) * 1000 if latencies else None,
+        }
+
+        # separate pass, since tracing allocations slows everything down
+        gc.collect()
+        tracemalloc.start()
+        before = tracemalloc.get_traced_memory()[0]
+        _refresh_steps(fetcher, server, displayed, refreshes, timeout)
+        gc.collect()
+        after, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        memory = {
+            "refreshes": refreshes,
+            "retained_bytes_per_refresh": (after - before) / refreshes,
+            "peak_kib_above_start": (peak - before) / 1024,
+        }
+        with server.lock:
+            latency["server"] = dict(server.stats)
+        return latency, memory
+    finally:
+        fetcher.engine.stop()
+        server.stop()
+
+
+def bench_web(port, clients, duration):
+    """HTTP requests/sec for the web tier, measured by load_test.py against a spawned server."""
+    command = [sys.executable, os.path.join(ROOT, "benchmarks", "load_test.py"), "--spawn", "--port", str(port),
+               "--ws-clients", "0", "--http-clients", str(clients), "--duration", str(duration),
+               "--path", "/weather", "--path", "/api/v1/current"]
+    output = subprocess.run(command, cwd=ROOT, capture_output=True, text=True, check=False)
+    lines = output.stdout.splitlines()
+    if output.returncode != 0 or "{" not in lines:
+        return {"error": (output.stderr.strip().splitlines() or ["load_test.py failed"])[-1]}
+    start = len(lines) - 1 - lines[::-1].index("{")
+    return json.loads("\n".join(lines[start:]))["http"]
+
+
+def compare(old, new, path=""):
+    """Print the relative change of every number in `new` against `old`."""
+    if isinstance(new, dict) and isinstance(old, dict):
+        for key, value in new.items():
+            if key in old and key != "meta":
+                compare(old[key], value, f"{path}.{key}" if path else key)
+    elif isinstance(new, list) and isinstance(old, list):
+        for index, (before, after) in enumerate(zip(old, new)):
+            compare(before, after, f"{path}[{index}]")
+    elif isinstance(new, (int, float)) and isinstance(old, (int, float)) and not isinstance(new, bool):
+        change = f"{(new - old) / old * 100:+.1f}%" if old else "n/a"
+        print(f"{path:60} {old:>14.3f} -> {new:>14.3f}  {change}")
+
+
+def git_revision():
+    """Short hash of the checked-out commit, or None outside git."""
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    """Run every benchmark, print the results as JSON and compare with an earlier run."""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--refreshes", type=int, default=50)
+    parser.add_argument("--parse-repeat", type=int, default=5)
+    parser.add_argument("--timeout", type=float, default=15.0, help="seconds to wait for each refresh")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="replay server response delay")
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--drip-bytes", type=int, default=0)
+    parser.add_argument("--drip-ms", type=float, default=0.0)
+    parser.add_argument("--web-port", type=int, default=2051)
+    parser.add_argument("--web-clients", type=int, default=20)
+    parser.add_argument("--web-duration", type=float, default=5.0, help="seconds of web load (0 to skip)")
+    parser.add_argument("--output", help="write the results JSON here too")
+    parser.add_argument("--compare", help="earlier results JSON to compare with")
+    args = parser.parse_args()
+    output = os.path.abspath(args.output) if args.output else None
+
+    feeds = load_fixtures()
+    if not feeds:
+        sys.exit("No archived feeds found to replay")
+    displayable = [content for content in feeds
+                   if any(entry.category == "Current Conditions" for entry in atom_helper.parse(content).entries)]
+
+    results = {
+        "meta": {
+            "timestamp": datetime.datetime.now().isoformat(timespec="seconds"),
+            "revision": git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "args": vars(args),
+        },
+        "parse": bench_parse(feeds, args.parse_repeat),
+    }
+    server_options = {"latency_ms": args.latency_ms, "jitter_ms": args.jitter_ms, "error_rate": args.error_rate,
+                      "drip_bytes": args.drip_bytes, "drip_ms": args.drip_ms, "seed": 1}
+    # WeatherFetcher prints every update; keep stdout for the results
+    with sandbox(CONFIG_OVERRIDES), contextlib.redirect_stdout(sys.stderr):
+        results["poll_to_display"], results["memory"] = bench_poll_to_display(
+            displayable, args.refreshes, args.timeout, server_options)
+    if args.web_duration:
+        results["web"] = bench_web(args.web_port, args.web_clients, args.web_duration)
+
+    text = json.dumps(results, indent=2)
+    print(text)
+    if output:
+        with open(output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            compare(json.load(f), results)
+
+
+if __name__ == "__main__":
+    main()
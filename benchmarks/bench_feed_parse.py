@@ -0,0 +1,111 @@
+"""
+Benchmark atom_helper.parse_atom against feedparser.parse.
+
+Feeds come from archived history/*.xml files and from the raw bodies kept
+in the history store (history/weatherpeg.db). Run from the repository root:
+
+    python benchmarks/bench_feed_parse.py [--repeat 20] [--glob "history/*.xml"] [--store-limit 200]
+
+For each parser this reports parse time per feed, the peak memory
+allocated during one parse (tracemalloc), the import time in a fresh
+interpreter, and how many feeds gave different titles/summaries/links for
+the entries WeatherPeg reads.
+"""
+
+import argparse
+import glob
+import os
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import atom_helper  # noqa: E402
+from conditions_helper import clean_summary  # noqa: E402
+from history_helper import HISTORY_DB, HistoryStore  # noqa: E402
+
+
+def load_feeds(pattern, store_path, store_limit):
+    """Feed bodies from the files matching `pattern`, then up to `store_limit` from the history store."""
+    feeds = []
+    for path in sorted(glob.glob(pattern)):
+        with open(path, "rb") as f:
+            feeds.append(f.read())
+    if store_limit and os.path.exists(store_path):
+        store = HistoryStore(store_path)
+        try:
+            feeds.extend(store.iter_bodies(limit=store_limit))
+        finally:
+            store.close()
+    return feeds
+
+
+def import_ms(module):
+    """Milliseconds to import `module` in a fresh interpreter."""
+    code = f"import time; t = time.perf_counter(); import {module}; print((time.perf_counter() - t) * 1000)"
+    output = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True, check=True)
+    return float(output.stdout)
+
+
+def measure(parse, feeds, repeat):
+    """Time `parse` over every feed `repeat` times, and its peak memory per feed."""
+    times = []
+    for _ in range(repeat):
+        for content in feeds:
+            started = time.perf_counter()
+            parse(content)
+            times.append((time.perf_counter() - started) * 1000)
+    peak = 0
+    for content in feeds:
+        tracemalloc.start()
+        parse(content)
+        peak = max(peak, tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+    return {
+        "mean_ms": statistics.mean(times),
+        "p50_ms": statistics.median(times),
+        "max_ms": max(times),
+        "peak_kib": peak / 1024,
+    }
+
+
+def wanted_fields(result):
+    """The entry fields WeatherPeg reads, to check that both parsers agree."""
+    # compared after clean_summary, since feedparser rewrites the summary HTML
+    return [(entry.category, entry.title, clean_summary(entry.summary), entry.link) for entry in result.entries
+            if getattr(entry, "category", None) in atom_helper.WANTED_CATEGORIES]
+
+
+def main():
+    """Benchmark both parsers on the archived feeds and print the results."""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--glob", default=os.path.join("history", "*.xml"))
+    parser.add_argument("--store", default=HISTORY_DB)
+    parser.add_argument("--store-limit", type=int, default=200, help="bodies to take from the store (0 for none)")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    feeds = load_feeds(args.glob, args.store, args.store_limit)
+    if not feeds:
+        sys.exit(f"No feeds found in {args.glob} or {args.store}")
+    print(f"{len(feeds)} feeds, {sum(map(len, feeds)) / len(feeds) / 1024:.1f} KiB average")
+
+    import feedparser
+    parsers = {"atom_helper": atom_helper.parse_atom, "feedparser": feedparser.parse}
+    for name, parse in parsers.items():
+        stats = measure(parse, feeds, args.repeat)
+        print(f"{name:12} mean {stats['mean_ms']:.3f}ms  p50 {stats['p50_ms']:.3f}ms  "
+              f"max {stats['max_ms']:.3f}ms  peak {stats['peak_kib']:.0f} KiB  "
+              f"import {import_ms(name):.1f}ms")
+
+    differing = sum(wanted_fields(atom_helper.parse_atom(content)) != wanted_fields(feedparser.parse(content))
+                    for content in feeds)
+    print(f"feeds where the fields WeatherPeg reads differ: {differing}/{len(feeds)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+"""
+Micro-benchmark for the cost of recording a metric with metrics_helper.
+
+Run from the repository root:
+
+    python benchmarks/bench_metrics.py [--number 1000000]
+
+Reports nanoseconds per Counter.inc, Timer.record and Timer.since
+(including its time.perf_counter call), with the cost of an empty call
+subtracted. All of them must stay under a microsecond.
+"""
+
+import argparse
+import os
+import sys
+import time
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from metrics_helper import Registry  # noqa: E402
+
+
+def main():
+    """Time each recording call and report it against the 1 microsecond budget."""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--number", type=int, default=1000000)
+    args = parser.parse_args()
+
+    registry = Registry()
+    counter = registry.counter("bench_total")
+    timer = registry.timer("bench_seconds")
+    started = time.perf_counter()
+    cases = {
+        "empty call": lambda: None,
+        "Counter.inc": counter.inc,
+        "Timer.record": lambda: timer.record(0.003),
+        "Timer.since": lambda: timer.since(started),
+    }
+    costs = {name: min(timeit.repeat(case, number=args.number, repeat=3)) / args.number * 1e9
+             for name, case in cases.items()}
+    baseline = costs.pop("empty call")
+    for name, ns in costs.items():
+        verdict = "ok" if ns - baseline < 1000 else "OVER 1us"
+        print(f"{name:14} {ns - baseline:7.0f} ns  {verdict}")
+
+
+if __name__ == "__main__":
+    main()
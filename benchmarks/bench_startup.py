@@ -0,0 +1,96 @@
+"""
+Startup benchmark for WeatherPeg.
+
+Two measurements, run from the repository root:
+
+    python benchmarks/bench_startup.py [--runs 5] [--top 15]
+
+1. Import time. `python -X importtime` for the GUI path (`import gui`)
+   and the headless path (`import weather_fetcher`), with the total and
+   the slowest modules by cumulative time. Heavy packages such as flask,
+   feedparser, requests, env_canada or PIL showing up here is a regression.
+2. Time to first paint. main.py is started `--runs` times. The wall clock
+   time until it prints "First paint" is recorded, along with the time
+   main.py measured itself. This needs a display (use xvfb-run on a
+   server) and is skipped if the window never appears.
+
+Results are printed as JSON.
+"""
+
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+_IMPORT_RE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|(\s*)(\S+)")
+_PAINT_RE = re.compile(r"First paint (\d+)ms after start")
+
+
+def import_breakdown(module, top):
+    """Parse `python -X importtime -c "import module"` into totals and the slowest imports."""
+    output = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                            cwd=ROOT, capture_output=True, text=True, check=True).stderr
+    rows = []
+    for line in output.splitlines():
+        match = _IMPORT_RE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            rows.append({"module": name, "depth": (len(indent) - 1) // 2,
+                         "self_ms": int(self_us) / 1000, "cumulative_ms": int(cumulative_us) / 1000})
+    total = next((row["cumulative_ms"] for row in rows if row["module"] == module), None)
+    slowest = sorted((row for row in rows if row["module"] != module),
+                     key=lambda row: row["cumulative_ms"], reverse=True)[:top]
+    return {"module": module, "total_ms": total, "modules_imported": len(rows), "slowest": slowest}
+
+
+def first_paint(timeout):
+    """Start main.py and return (wall clock ms, self-reported ms) until first paint, or None."""
+    started = time.perf_counter()
+    process = subprocess.Popen([sys.executable, "main.py"], cwd=ROOT, stdout=subprocess.PIPE,
+                               stderr=subprocess.DEVNULL, text=True)
+    try:
+        deadline = started + timeout
+        while time.perf_counter() < deadline:
+            line = process.stdout.readline()
+            if not line:
+                return None  # exited, e.g. no display
+            match = _PAINT_RE.search(line)
+            if match:
+                return (time.perf_counter() - started) * 1000, float(match.group(1))
+        return None
+    finally:
+        process.terminate()
+        process.wait(timeout=10)
+
+
+def main():
+    """Measure import times and time to first paint, and print them as JSON."""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5, help="first-paint runs (0 to skip)")
+    parser.add_argument("--top", type=int, default=15, help="slowest imports to list")
+    parser.add_argument("--timeout", type=float, default=30.0)
+    args = parser.parse_args()
+
+    results = {
+        "imports": [import_breakdown("gui", args.top), import_breakdown("weather_fetcher", args.top)],
+        "first_paint": None,
+    }
+    paints = [paint for paint in (first_paint(args.timeout) for _ in range(args.runs)) if paint]
+    if paints:
+        results["first_paint"] = {
+            "runs": len(paints),
+            "wall_median_ms": statistics.median(wall for wall, _ in paints),
+            "in_process_median_ms": statistics.median(own for _, own in paints),
+        }
+    elif args.runs:
+        print("main.py never painted a window (no display?), first paint skipped", file=sys.stderr)
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
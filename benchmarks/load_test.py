@@ -0,0 +1,197 @@
+"""
+Load test for the WeatherPeg web tier.
+
+Measures requests/sec and latency percentiles for an HTTP path, and
+Socket.IO fan-out latency: the time from publishing a state change to
+each connected client receiving weather_updated.
+
+Fan-out needs to publish state, so by default this script starts its own
+web process (web_service.py) with a known channel key:
+
+    python benchmarks/load_test.py --spawn --port 2050 --http-clients 50 --ws-clients 1000
+
+To test an already running server over HTTP only:
+
+    python benchmarks/load_test.py --url http://127.0.0.1:2046 --ws-clients 0
+
+The Socket.IO part needs python-socketio with its asyncio client (aiohttp).
+"""
+
+import argparse
+import asyncio
+import functools
+import http.client
+import json
+import math
+import os
+import secrets
+import subprocess
+import sys
+import threading
+import time
+import urllib.parse
+from multiprocessing.connection import Client
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from channel_helper import default_address, format_address  # noqa: E402
+from state_helper import DEFAULT_STATE  # noqa: E402
+from web_service import CHANNEL_KEY_ENV  # noqa: E402
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a list of numbers."""
+    if not values:
+        return float("nan")
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, math.ceil(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def http_load(url, path, clients, duration):
+    """Hammer `path` from `clients` keep-alive connections for `duration` seconds."""
+    parsed = urllib.parse.urlparse(url)
+    latencies = []
+    errors = [0]
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+
+    def worker():
+        conn = http.client.HTTPConnection(parsed.hostname, parsed.port or 80, timeout=10)
+        local = []
+        local_errors = 0
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            try:
+                conn.request("GET", path, headers={"Accept-Encoding": "gzip"})
+                response = conn.getresponse()
+                response.read()
+                if response.status >= 400:
+                    local_errors += 1
+            except (OSError, http.client.HTTPException):
+                local_errors += 1
+                conn.close()
+                conn = http.client.HTTPConnection(parsed.hostname, parsed.port or 80, timeout=10)
+                continue
+            local.append(time.perf_counter() - started)
+        with lock:
+            latencies.extend(local)
+            errors[0] += local_errors
+
+    threads = [threading.Thread(target=worker) for _ in range(clients)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    return {
+        "path": path,
+        "clients": clients,
+        "requests": len(latencies),
+        "errors": errors[0],
+        "requests_per_sec": len(latencies) / elapsed,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+    }
+
+
+async def ws_fanout(url, clients, updates, publish):
+    """Connect `clients` Socket.IO clients, publish `updates` changes and time their delivery."""
+    import socketio
+
+    latencies = []
+    received = [0]
+
+    def make_client():
+        client = socketio.AsyncClient(reconnection=False)
+
+        @client.on("weather_updated")
+        def _on_update(delta):
+            summary = delta.get("summary", "")
+            if summary.startswith("loadtest "):
+                latencies.append(time.time() - float(summary.split()[1]))
+                received[0] += 1
+        return client
+
+    connected = []
+    batch = 100
+    started = time.perf_counter()
+    for offset in range(0, clients, batch):
+        group = [make_client() for _ in range(min(batch, clients - offset))]
+        results = await asyncio.gather(*(client.connect(url, transports=["websocket"]) for client in group),
+                                       return_exceptions=True)
+        connected.extend(client for client, result in zip(group, results) if not isinstance(result, Exception))
+    connect_seconds = time.perf_counter() - started
+
+    for _ in range(updates):
+        publish(f"loadtest {time.time()!r}")
+        await asyncio.sleep(1.0)
+    await asyncio.sleep(2.0)
+    await asyncio.gather(*(client.disconnect() for client in connected), return_exceptions=True)
+    return {
+        "clients_requested": clients,
+        "clients_connected": len(connected),
+        "connect_seconds": connect_seconds,
+        "updates": updates,
+        "deliveries": received[0],
+        "delivery_ratio": received[0] / max(1, len(connected) * updates),
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+    }
+
+
+def send_summary(conn, snapshot, summary):
+    """Publish `snapshot` with `summary` over the state channel, as the GUI process would."""
+    conn.send({"snapshot": dict(snapshot, summary=summary)})
+
+
+def main():
+    """Run the HTTP load and Socket.IO fan-out tests and print the results as JSON."""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="base URL of a running server (default: the spawned one)")
+    parser.add_argument("--spawn", action="store_true", help="start web_service.py for the test")
+    parser.add_argument("--port", type=int, default=2050)
+    parser.add_argument("--path", action="append", help="HTTP path to load (repeatable, default /weather)")
+    parser.add_argument("--http-clients", type=int, default=50)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--ws-clients", type=int, default=1000)
+    parser.add_argument("--updates", type=int, default=5)
+    args = parser.parse_args()
+
+    process = None
+    publish = None
+    url = args.url or f"http://127.0.0.1:{args.port}"
+    if args.spawn:
+        authkey = secrets.token_hex(16)
+        address = default_address(args.port)
+        process = subprocess.Popen(
+            [sys.executable, os.path.join(ROOT, "web_service.py"), "--port", str(args.port),
+             "--channel", format_address(address)],
+            env=dict(os.environ, **{CHANNEL_KEY_ENV: authkey}), cwd=ROOT,
+        )
+        time.sleep(3.0)  # let the server bind
+        conn = Client(address, authkey=authkey.encode())
+        publish = functools.partial(send_summary, conn, dict(DEFAULT_STATE, version=0, title="Load test"))
+        publish("load test starting")
+
+    results = {"url": url, "http": [], "websocket": None}
+    try:
+        for path in args.path or ["/weather"]:
+            if args.http_clients:
+                results["http"].append(http_load(url, path, args.http_clients, args.duration))
+        if args.ws_clients:
+            if publish is None:
+                print("Socket.IO fan-out needs --spawn so this script can publish updates", file=sys.stderr)
+            else:
+                results["websocket"] = asyncio.run(ws_fanout(url, args.ws_clients, args.updates, publish))
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait(timeout=10)
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,323 @@
+"""
+Offline stand-in for weather.gc.ca that replays archived feeds.
+
+Feeds come from archived history/*.xml files, the raw bodies kept in the
+history store (history/weatherpeg.db), and Atom feeds rebuilt from the
+records in txt/history.txt. Run from the repository root:
+
+    python benchmarks/replay_server.py [--port 8046] [--latency-ms 200] [--error-rate 0.05]
+
+then point txt/source.txt at http://127.0.0.1:8046/feed/0.xml (use
+/feed/1.xml, /feed/2.xml, ... for more locations; each one starts at a
+different point in the archive).
+
+- The feed moves on to the next archived body every --update-every
+  seconds (0: on every request). GET /advance moves every feed on now.
+- ETag and Last-Modified are sent, and conditional requests get a 304
+  while the body is unchanged (unless --no-conditional).
+- --latency-ms/--jitter-ms delay each response, --error-rate fails a
+  share of requests with a 503 (or a dropped connection with
+  --error-kind reset), and --drip-bytes/--drip-ms send the body slowly.
+- GET /stats returns request, 304, error and byte counts as JSON.
+
+ReplayServer can also be started in-process; see bench_e2e.py.
+"""
+
+import argparse
+import glob
+import hashlib
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from xml.sax.saxutils import escape, quoteattr
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from history_helper import HISTORY_DB, HISTORY_TXT, HistoryStore, read_history_txt  # noqa: E402
+
+_FEED_PATH_RE = re.compile(r"^/feed/(\d+)\.xml$")
+
+_ATOM_FEED = """<?xml version="1.0" encoding="UTF-8"?>
+<feed xmlns="http://www.w3.org/2005/Atom" xml:lang="en-ca">
+<title>Replayed - Weather - Environment Canada</title>
+<updated>{updated}</updated>
+<entry>
+<title>{warning}</title>
+<link type="text/html" href={link}/>
+<updated>{updated}</updated>
+<category term="Warnings and Watches"/>
+<summary type="html">{warning}</summary>
+</entry>
+<entry>
+<title>{title}</title>
+<link type="text/html" href={link}/>
+<updated>{updated}</updated>
+<category term="Current Conditions"/>
+<summary type="html">{summary}</summary>
+</entry>
+</feed>
+"""
+
+
+def history_txt_feeds(filename=HISTORY_TXT):
+    """Atom feed bodies rebuilt from the records in a legacy history.txt file."""
+    feeds = []
+    for record in read_history_txt(filename):
+        if not record["title"] or not record["summary"]:
+            continue
+        feeds.append(_ATOM_FEED.format(
+            updated=time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(record["logged_at"])),
+            warning=escape(record["warning"] or "No watches or warnings in effect."),
+            title=escape(record["title"]),
+            summary=escape(record["summary"]),
+            link=quoteattr(record["link"] or "https://weather.gc.ca/"),
+        ).encode("utf-8"))
+    return feeds
+
+
+def load_fixtures(pattern=os.path.join("history", "*.xml"), store_path=HISTORY_DB, store_limit=200,
+                  history_txt=HISTORY_TXT):
+    """Archived feed bodies, oldest first, without duplicates."""
+    feeds = []
+    for path in sorted(glob.glob(pattern)):
+        with open(path, "rb") as f:
+            feeds.append(f.read())
+    if store_limit and os.path.exists(store_path):
+        store = HistoryStore(store_path)
+        try:
+            feeds.extend(reversed(list(store.iter_bodies(limit=store_limit))))
+        finally:
+            store.close()
+    if history_txt and os.path.exists(history_txt):
+        feeds.extend(history_txt_feeds(history_txt))
+    return list(dict.fromkeys(feeds))
+
+
+class FeedCursor:
+    """Where one replayed location is in the archive, and the headers of its current body."""
+
+    def __init__(self, feeds, start):
+        self.feeds = feeds
+        self.position = start % len(feeds)
+        self.changed_at = time.time()
+        self._set_headers()
+
+    def advance(self):
+        """Move on to the next archived feed, with a new ETag and Last-Modified."""
+        self.position = (self.position + 1) % len(self.feeds)
+        self.changed_at = time.time()
+        self._set_headers()
+
+    @property
+    def body(self):
+        """Bytes of the feed currently served."""
+        return self.feeds[self.position]
+
+    def _set_headers(self):
+        self.etag = '"' + hashlib.sha1(self.body).hexdigest()[:16] + '"'
+        self.last_modified = formatdate(self.changed_at, usegmt=True)
+
+
+class ReplayServer:
+    """Threaded HTTP server replaying `feeds` with configurable latency, errors, 304s and slow bodies.
+
+    `update_every` is the seconds between archive steps: None to step only
+    on `advance()`, 0 to step on every request.
+    """
+
+    def __init__(self, feeds, port=0, host="127.0.0.1", update_every=None, latency_ms=0.0, jitter_ms=0.0,
+                 error_rate=0.0, error_kind="503", conditional=True, drip_bytes=0, drip_ms=0.0, seed=None):
+        if not feeds:
+            raise ValueError("no feeds to replay")
+        self.feeds = feeds
+        self.update_every = update_every
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.error_kind = error_kind
+        self.conditional = conditional
+        self.drip_bytes = drip_bytes
+        self.drip_ms = drip_ms
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.cursors = {}
+        self.stats = {"requests": 0, "ok": 0, "not_modified": 0, "errors": 0, "bytes": 0}
+        self.httpd = ThreadingHTTPServer((host, port), self._handler_class())
+        self.httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def port(self):
+        """The port actually bound, useful with port=0."""
+        return self.httpd.server_address[1]
+
+    def url(self, index=0):
+        """URL of the feed `index` on this server."""
+        return f"http://{self.httpd.server_address[0]}:{self.port}/feed/{index}.xml"
+
+    def start(self):
+        """Serve on a background thread."""
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name="replay-server", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Stop serving and close the socket."""
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def advance(self, index=None):
+        """Move one feed (or every feed served so far) on to its next archived body."""
+        with self.lock:
+            targets = self.cursors.values() if index is None else [self._cursor(index)]
+            for cursor in targets:
+                cursor.advance()
+
+    def _cursor(self, index):
+        cursor = self.cursors.get(index)
+        if cursor is None:
+            # spread locations over the archive so they do not all show the same weather
+            cursor = self.cursors[index] = FeedCursor(self.feeds, index * 7)
+        return cursor
+
+    def _count(self, key, amount=1):
+        with self.lock:
+            self.stats[key] += amount
+
+    @staticmethod
+    def _not_modified(headers, etag, last_modified):
+        """RFC 7232: If-None-Match decides when present; If-Modified-Since is only used without it.
+
+        Last-Modified has 1-second resolution, so after an advance within the
+        same second only the ETag can tell the bodies apart.
+        """
+        if_none_match = headers.get("If-None-Match")
+        if if_none_match is not None:
+            return etag in (tag.strip() for tag in if_none_match.split(","))
+        return headers.get("If-Modified-Since") == last_modified
+
+    def _respond(self, handler, index):
+        """Serve one feed request. Runs on a request thread."""
+        with self.lock:
+            self.stats["requests"] += 1
+            cursor = self._cursor(index)
+            if self.update_every == 0 or (self.update_every and time.time() - cursor.changed_at >= self.update_every):
+                cursor.advance()
+            body, etag, last_modified = cursor.body, cursor.etag, cursor.last_modified
+            delay = max(0.0, self.latency_ms + self.random.uniform(-self.jitter_ms, self.jitter_ms)) / 1000
+            failed = self.random.random() < self.error_rate
+        if delay:
+            time.sleep(delay)
+        if failed:
+            self._count("errors")
+            if self.error_kind == "reset":
+                handler.close_connection = True
+                return
+            handler.send_error(503, "Replay server error")
+            return
+        if self.conditional and self._not_modified(handler.headers, etag, last_modified):
+            self._count("not_modified")
+            handler.send_response(304)
+            handler.send_header("ETag", etag)
+            handler.end_headers()
+            return
+        handler.send_response(200)
+        handler.send_header("Content-Type", "application/atom+xml; charset=utf-8")
+        handler.send_header("Content-Length", str(len(body)))
+        handler.send_header("ETag", etag)
+        handler.send_header("Last-Modified", last_modified)
+        handler.end_headers()
+        try:
+            if self.drip_bytes:
+                for offset in range(0, len(body), self.drip_bytes):
+                    handler.wfile.write(body[offset:offset + self.drip_bytes])
+                    handler.wfile.flush()
+                    time.sleep(self.drip_ms / 1000)
+            else:
+                handler.wfile.write(body)
+        except ConnectionError:
+            handler.close_connection = True
+            return  # the client gave up, e.g. timed out on a slow drip
+        self._count("ok")
+        self._count("bytes", len(body))
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            """Serves /feed/<n>.xml, /advance and /stats."""
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                """Route a GET to a feed, /advance or /stats."""
+                match = _FEED_PATH_RE.match(self.path.split("?", 1)[0])
+                if match:
+                    server._respond(self, int(match.group(1)))
+                elif self.path == "/advance":
+                    server.advance()
+                    self._send_json({"advanced": len(server.cursors)})
+                elif self.path == "/stats":
+                    with server.lock:
+                        self._send_json(dict(server.stats, feeds=len(server.feeds)))
+                else:
+                    self.send_error(404)
+
+            def _send_json(self, data):
+                body = json.dumps(data).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass  # one line per poll is noise; /stats has the counts
+
+        return Handler
+
+
+def main():
+    """Serve the archived feeds until interrupted."""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8046)
+    parser.add_argument("--glob", default=os.path.join("history", "*.xml"))
+    parser.add_argument("--store", default=HISTORY_DB)
+    parser.add_argument("--store-limit", type=int, default=200, help="bodies to take from the store (0 for none)")
+    parser.add_argument("--history-txt", default=HISTORY_TXT, help="legacy history file to rebuild feeds from")
+    parser.add_argument("--update-every", type=float, default=60.0, help="seconds per archived body (0: every request)")
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of requests that fail, 0-1")
+    parser.add_argument("--error-kind", choices=("503", "reset"), default="503")
+    parser.add_argument("--no-conditional", action="store_true", help="never answer 304")
+    parser.add_argument("--drip-bytes", type=int, default=0, help="send bodies in chunks of this many bytes")
+    parser.add_argument("--drip-ms", type=float, default=0.0, help="pause between drip chunks")
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args()
+
+    feeds = load_fixtures(args.glob, args.store, args.store_limit, args.history_txt)
+    if not feeds:
+        sys.exit(f"No feeds found in {args.glob}, {args.store} or {args.history_txt}")
+    server = ReplayServer(
+        feeds, port=args.port, update_every=args.update_every, latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms, error_rate=args.error_rate, error_kind=args.error_kind,
+        conditional=not args.no_conditional, drip_bytes=args.drip_bytes, drip_ms=args.drip_ms, seed=args.seed,
+    )
+    print(f"Replaying {len(feeds)} feeds at {server.url(0)}")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.httpd.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+"""
+Local state channel between the GUI process and a separate web process.
+
+The web process listens on a Unix socket (a localhost TCP port on
+Windows) and the GUI process connects and publishes every WeatherState
+change, plus its metrics and polling schedule every STATS_INTERVAL for
+/metrics and /debug/schedule. Messages are pickled dicts sent by
+multiprocessing.connection, authenticated with a shared key.
+"""
+
+import logging
+import os
+import queue
+import sys
+import tempfile
+import threading
+import time
+from multiprocessing.connection import Client, Listener
+
+RECONNECT_DELAY = 2.0  # seconds
+STATS_INTERVAL = 5.0  # seconds between stats messages
+
+
+def default_address(port):
+    """Channel address for the web server on `port`."""
+    if sys.platform == "win32":
+        return ("127.0.0.1", port + 1)
+    return os.path.join(tempfile.gettempdir(), f"weatherpeg-{port}.sock")
+
+
+def format_address(address):
+    """Address as a single command-line argument."""
+    if isinstance(address, tuple):
+        return f"{address[0]}:{address[1]}"
+    return address
+
+
+def parse_address(text):
+    """Inverse of format_address."""
+    host, sep, port = text.rpartition(":")
+    if sep and port.isdigit() and os.sep not in text:
+        return (host, int(port))
+    return text
+
+
+class StatePublisher:
+    """Send WeatherState changes to the web process. Runs its own sender thread.
+
+    The full snapshot is sent on every (re)connect and after that every
+    change, so a restarted web process catches up straight away. With a
+    `stats_provider`, what it returns is sent every STATS_INTERVAL too.
+    """
+
+    def __init__(self, state, address, authkey, stats_provider=None):
+        self.state = state
+        self.address = address
+        self.authkey = authkey
+        self.stats_provider = stats_provider
+        self._queue = queue.Queue()
+        self.state.subscribe(lambda delta, snapshot: self._queue.put(snapshot))
+        threading.Thread(target=self._run, name="weatherpeg-state-publisher", daemon=True).start()
+
+    def _run(self):
+        while True:
+            try:
+                conn = Client(self.address, authkey=self.authkey)
+            except (OSError, EOFError):
+                time.sleep(RECONNECT_DELAY)
+                continue
+            logging.info(f"Connected state channel {format_address(self.address)}")
+            try:
+                conn.send({"snapshot": self.state.snapshot()})
+                self._send_stats(conn)
+                next_stats = time.monotonic() + STATS_INTERVAL
+                while True:
+                    try:
+                        snapshot = self._queue.get(timeout=max(0.0, next_stats - time.monotonic()))
+                    except queue.Empty:
+                        self._send_stats(conn)
+                        next_stats = time.monotonic() + STATS_INTERVAL
+                        continue
+                    # only the newest snapshot matters if several queued up
+                    while not self._queue.empty():
+                        snapshot = self._queue.get_nowait()
+                    conn.send({"snapshot": snapshot})
+            except (OSError, EOFError):
+                logging.warning("State channel closed, reconnecting")
+            finally:
+                conn.close()
+            time.sleep(RECONNECT_DELAY)
+
+    def _send_stats(self, conn):
+        if self.stats_provider is None:
+            return
+        try:
+            stats = self.stats_provider()
+        except Exception:  # a broken report must not take the state channel down
+            logging.exception("Could not collect stats for the web process")
+            return
+        conn.send({"stats": stats})
+
+
+class StateSubscriber:
+    """Receive snapshots from the GUI process and load them into a local WeatherState.
+
+    The latest stats message is kept in `stats` (None until one arrives).
+    Blocking accepts and reads go through `run_blocking(function)`, which
+    under gevent or eventlet runs them on a real OS thread.
+    """
+
+    def __init__(self, state, address, authkey, run_blocking=None):
+        self.state = state
+        self.address = address
+        self.stats = None
+        self.run_blocking = run_blocking or (lambda function: function())
+        if isinstance(address, str) and os.path.exists(address):
+            os.remove(address)  # stale socket from a previous run
+        self.listener = Listener(address, authkey=authkey)
+
+    def start(self):
+        """Accept publishers on a background thread."""
+        threading.Thread(target=self._run, name="weatherpeg-state-subscriber", daemon=True).start()
+
+    def _run(self):
+        while True:
+            try:
+                conn = self.run_blocking(self.listener.accept)
+            except Exception:  # includes AuthenticationError from a client with the wrong key
+                logging.exception("State channel accept failed")
+                continue
+            logging.info("State publisher connected")
+            try:
+                while True:
+                    message = self.run_blocking(conn.recv)
+                    if "snapshot" in message:
+                        self.state.load(message["snapshot"])
+                    if "stats" in message:
+                        self.stats = message["stats"]
+            except (OSError, EOFError):
+                logging.info("State publisher disconnected")
+            finally:
+                conn.close()
+
+
+if __name__ == "__main__":
+    print("This is a module, and not meant to be run directly")
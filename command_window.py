@@ -1,7 +1,12 @@
 import tkinter as tk
 
-import radar_helper
+import metrics_helper
 from browser_helper import WebOpen
+from profiler_helper import DEFAULT_SECONDS, get_profiler
+
+HELP_FILE = "txt/help.txt"
+STATS_VIEW_INTERVAL = 1000  # ms between refreshes of the stats window
+PROFILE_CHECK_INTERVAL = 1000  # ms between checks for a finished profile
 
 class CommandWindow:
     """Class to create and manage the command window"""
@@ -10,13 +15,18 @@ class CommandWindow:
         self.refresh_func = refresh_func
         self.status_var = status_var
         self.gui = gui
+        self.stats_window = None
+        self.console = None
+        self.command_entry = None
         self.cmd_window = tk.Toplevel(root_window)
         self.cmd_window.title("WeatherPeg Commands")
         self.cmd_window.geometry("")
-        self.cmd_window.bind("<F2>", lambda event=None: radar_helper.open_radar(root_window=self.cmd_window, status_var=self.gui.status_var, event=event))
+        self.cmd_window.bind("<F2>", lambda event=None: self.gui.fullscreen_manager.open_radar())
+        self.cmd_window.bind("<F3>", lambda event=None: self.gui.fullscreen_manager.open_radar(loop=True))
         self.cmd_window.bind("<F4>", lambda event=None: WebOpen.opener(self, port=2046))
         self.cmd_window.bind("<F5>", lambda event=None: self.refresh_func())
         self.cmd_window.bind("<F6>", self.create_command_window)
+        self.cmd_window.bind("<F9>", self.open_stats_window)
         self.cmd_window.bind("<F11>", self.fullscreen_func)
 
     def create_command_window(self, event=None):
@@ -25,9 +35,18 @@ class CommandWindow:
             print("Main window has been destroyed!")
             return None
 
+        if self.command_entry is None:
+            self.create_console()
+
         radar_button = tk.Button(
             self.cmd_window, text="Open radar (F2)",
-            command=lambda event=None: radar_helper.open_radar(root_window=self.cmd_window, status_var=self.gui.status_var, event=event),
+            command=lambda: self.gui.fullscreen_manager.open_radar(),
+            bg="blue", fg="white", font=("VCR OSD Mono", 12)
+        )
+
+        radar_loop_button = tk.Button(
+            self.cmd_window, text="Open radar loop (F3)",
+            command=lambda: self.gui.fullscreen_manager.open_radar(loop=True),
             bg="blue", fg="white", font=("VCR OSD Mono", 12)
         )
 
@@ -53,7 +72,15 @@ class CommandWindow:
         )
         open_command_window_button.pack(pady=10)
 
+        stats_button = tk.Button(
+            self.cmd_window, text="Show Stats (F9)",
+            command=self.open_stats_window,
+            bg="green", fg="yellow", font=("VCR OSD Mono", 12)
+        )
+        stats_button.pack(pady=10)
+
         radar_button.pack(pady=5)
+        radar_loop_button.pack(pady=5)
         if self.fullscreen_func:
             fullscreen_button = tk.Button(
                 self.cmd_window, text="Toggle Fullscreen (F11)",
@@ -61,3 +88,108 @@ class CommandWindow:
                 bg="blue", fg="white", font=("VCR OSD Mono", 12)
             )
             fullscreen_button.pack(pady=5)
+
+    def open_stats_window(self, event=None):
+        """Open a window with the live counters and timers, refreshed every second."""
+        if self.stats_window is not None and self.stats_window.winfo_exists():
+            self.stats_window.lift()
+            return
+        self.stats_window = tk.Toplevel(self.cmd_window)
+        self.stats_window.title("WeatherPeg Stats")
+        self.stats_window.configure(bg="black")
+        stats_var = tk.StringVar()
+        # named after the window, so a stats view of another command window keeps its own timer
+        timer_name = f"stats_view{self.stats_window}"
+        tk.Label(
+            self.stats_window, textvariable=stats_var, justify=tk.LEFT, anchor="w",
+            bg="black", fg="lime", font=("Courier", 10)
+        ).pack(padx=10, pady=10, fill=tk.BOTH)
+
+        def refresh():
+            polling = self.gui.weather_fetcher.engine.stats()
+            lines = [f"Polls: {polling['polls']} ({polling['polls_last_hour']} in the last hour), "
+                     f"{polling['in_flight']} in flight, {polling['backing_off']} backing off"]
+            lines.extend(metrics_helper.REGISTRY.summary_lines() or ["Nothing recorded yet"])
+            stats_var.set("\n".join(lines))
+
+        def on_destroy(event):
+            if event.widget is self.stats_window:
+                self.gui.timers.cancel(timer_name)
+
+        refresh()
+        self.gui.timers.every(timer_name, STATS_VIEW_INTERVAL, refresh)
+        self.stats_window.bind("<Destroy>", on_destroy)
+
+    def create_console(self):
+        """Add the typed-command console: an output area and an entry line. Type "help" for the commands."""
+        self.console = tk.Text(
+            self.cmd_window, height=10, width=70, wrap=tk.WORD,
+            bg="black", fg="lime", font=("Courier", 10)
+        )
+        self.console.pack(padx=10, pady=5)
+        self.command_entry = tk.Entry(
+            self.cmd_window, width=70, bg="black", fg="lime", insertbackground="lime", font=("Courier", 10)
+        )
+        self.command_entry.pack(padx=10, pady=5)
+        self.command_entry.bind("<Return>", self.run_command)
+        self.write('Type "help" and press Enter for the commands.')
+
+    def write(self, text):
+        """Append a line to the console output."""
+        self.console.insert(tk.END, text + "\n")
+        self.console.see(tk.END)
+
+    def run_command(self, event=None):
+        """Run the command typed in the entry."""
+        command = self.command_entry.get().strip()
+        self.command_entry.delete(0, tk.END)
+        if not command:
+            return
+        self.write(f"> {command}")
+        words = command.lower().split()
+        if words == ["help"]:
+            try:
+                with open(HELP_FILE, "r", encoding="utf-8") as f:
+                    self.write(f.read())
+            except FileNotFoundError:
+                self.write(f"{HELP_FILE} not found")
+        elif words[0] == "profile" and len(words) >= 2:
+            self.profile_command(words[1:])
+        else:
+            self.write('Unknown command, type "help" for the list')
+
+    def profile_command(self, args):
+        """profile start [seconds] | profile stop | profile status"""
+        profiler = get_profiler()
+        if args[0] == "start":
+            try:
+                seconds = float(args[1]) if len(args) > 1 else DEFAULT_SECONDS
+            except ValueError:
+                self.write("Usage: profile start [seconds]")
+                return
+            if not profiler.start(seconds):
+                self.write("A profile is already running, use profile stop")
+                return
+            self.write(f"Profiling every thread for {profiler.status()['seconds_left']:.0f}s...")
+            self.gui.timers.every("profile_check", PROFILE_CHECK_INTERVAL, self._check_profile)
+        elif args[0] == "stop":
+            path = profiler.stop()
+            self.gui.timers.cancel("profile_check")
+            self.write(f"Profile written to {path}" if path else "No profile is running")
+        elif args[0] == "status":
+            status = profiler.status()
+            if status["running"]:
+                self.write(f"Profiling, {status['seconds_left']:.0f}s left, {status['samples']} samples so far")
+            else:
+                self.write(f"Not profiling. Last profile: {status['last_path'] or 'none'}")
+        else:
+            self.write("Usage: profile start [seconds] | profile stop | profile status")
+
+    def _check_profile(self):
+        """Report a profile that finished on its own. Runs from the "profile_check" timer."""
+        profiler = get_profiler()
+        if profiler.running:
+            return
+        self.gui.timers.cancel("profile_check")
+        if self.console is not None and self.console.winfo_exists():
+            self.write(f"Profile written to {profiler.last_path}")
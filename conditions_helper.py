@@ -0,0 +1,141 @@
+"""
+Parser for Environment Canada "Current Conditions" summaries.
+
+Turns the flat summary text, for example
+
+    Observed at: Winnipeg Richardson Int'l Airport 7:00 PM CDT Saturday 9 August 2025
+    Condition: Light Rainshower Temperature: 18.2°C Pressure / Tendency: 100.3 kPa rising
+    Visibility: 18 km Humidity: 89 % Dewpoint: 16.4°C Wind: SW 23 km/h gust 34 km/h
+    Air Quality Health Index: 2
+
+into a CurrentConditions record. All patterns are compiled once at import
+and results are memoized per summary string.
+"""
+
+import datetime
+import html
+import re
+from dataclasses import dataclass, asdict
+from functools import lru_cache
+from typing import Optional
+
+_TAG_RE = re.compile(r"<[^>]+>")
+_LABEL_RE = re.compile(
+    r"(Observed at|Condition|Temperature|Pressure / Tendency|Pressure|Visibility|"
+    r"Humidity|Wind Chill|Humidex|Dewpoint|Wind|Air Quality Health Index):"
+)
+_NUMBER_RE = re.compile(r"-?\d+(?:\.\d+)?")
+_OBSERVED_RE = re.compile(
+    r"^(?P<station>.*?)\s*(?P<time>\d{1,2}:\d{2} [AP]M) (?P<tz>[A-Z]{2,4}) "
+    r"\w+ (?P<date>\d{1,2} \w+ \d{4})$"
+)
+_PRESSURE_RE = re.compile(r"(?P<value>\d+(?:\.\d+)?) kPa\s*(?P<tendency>[a-z]+)?")
+_WIND_RE = re.compile(
+    r"(?P<direction>[NSEW]{1,3})?\s*(?P<speed>\d+) km/h(?:\s*gust\s*(?P<gust>\d+) km/h)?"
+)
+
+
+@dataclass(frozen=True)
+class CurrentConditions:
+    """Typed view of one Current Conditions summary. Missing fields are None."""
+    observed_at: Optional[datetime.datetime] = None
+    observed_tz: Optional[str] = None
+    station: Optional[str] = None
+    condition: Optional[str] = None
+    temperature: Optional[float] = None
+    pressure: Optional[float] = None
+    pressure_tendency: Optional[str] = None
+    visibility: Optional[float] = None
+    humidity: Optional[float] = None
+    dewpoint: Optional[float] = None
+    wind_chill: Optional[float] = None
+    humidex: Optional[float] = None
+    wind_direction: Optional[str] = None
+    wind_speed: Optional[float] = None
+    wind_gust: Optional[float] = None
+    aqhi: Optional[float] = None
+
+    def to_dict(self):
+        """Return the record as a plain dict, with observed_at as ISO text."""
+        data = asdict(self)
+        if self.observed_at is not None:
+            data["observed_at"] = self.observed_at.isoformat()
+        return data
+
+
+def clean_summary(raw_summary):
+    """Decode HTML entities and strip tags from a feed summary."""
+    return _TAG_RE.sub("", html.unescape(raw_summary or ""))
+
+
+def _number(value):
+    if value is None:
+        return None
+    match = _NUMBER_RE.search(value)
+    return float(match.group()) if match else None
+
+
+def _split_labels(summary):
+    """Split the summary into a {label: value} dict in a single pass."""
+    fields = {}
+    matches = list(_LABEL_RE.finditer(summary))
+    for index, match in enumerate(matches):
+        end = matches[index + 1].start() if index + 1 < len(matches) else len(summary)
+        fields[match.group(1)] = summary[match.end():end].strip()
+    return fields
+
+
+@lru_cache(maxsize=512)
+def parse_summary(summary):
+    """Parse a cleaned Current Conditions summary into a CurrentConditions record.
+
+    Identical summaries return the same cached record.
+    """
+    fields = _split_labels(summary or "")
+    record = {}
+
+    observed = fields.get("Observed at")
+    if observed:
+        match = _OBSERVED_RE.match(observed)
+        if match:
+            record["station"] = match.group("station") or None
+            record["observed_tz"] = match.group("tz")
+            try:
+                record["observed_at"] = datetime.datetime.strptime(
+                    f"{match.group('date')} {match.group('time')}", "%d %B %Y %I:%M %p")
+            except ValueError:
+                pass
+        else:
+            record["station"] = observed
+
+    record["condition"] = fields.get("Condition") or None
+    record["temperature"] = _number(fields.get("Temperature"))
+    record["visibility"] = _number(fields.get("Visibility"))
+    record["humidity"] = _number(fields.get("Humidity"))
+    record["dewpoint"] = _number(fields.get("Dewpoint"))
+    record["wind_chill"] = _number(fields.get("Wind Chill"))
+    record["humidex"] = _number(fields.get("Humidex"))
+    record["aqhi"] = _number(fields.get("Air Quality Health Index"))
+
+    pressure = fields.get("Pressure / Tendency") or fields.get("Pressure")
+    if pressure:
+        match = _PRESSURE_RE.search(pressure)
+        if match:
+            record["pressure"] = float(match.group("value"))
+            record["pressure_tendency"] = match.group("tendency")
+
+    wind = fields.get("Wind")
+    if wind:
+        match = _WIND_RE.search(wind)
+        if match:
+            record["wind_direction"] = match.group("direction")
+            record["wind_speed"] = float(match.group("speed"))
+            record["wind_gust"] = _number(match.group("gust"))
+        elif wind.lower() == "calm":
+            record["wind_speed"] = 0.0
+
+    return CurrentConditions(**record)
+
+
+if __name__ == "__main__":
+    print("This is a module, and not meant to be run directly")
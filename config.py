@@ -1,63 +1,119 @@
 import logging
+import os
+import threading
+
+CONFIG_FILE = "txt/config.txt"
+CONFIG_CHECK_INTERVAL = 2000  # ms between checks of the config file for changes
+
+
+def _parse_value(value):
+    """Convert a raw config value to int or float where possible."""
+    if value.isdigit():
+        return int(value)
+    try:
+        return float(value)  # handles decimal numbers
+    except ValueError:
+        return value  # fallback to raw string
+
 
 class Config():
-    """Configuration management for WeatherPeg."""
-    def get_config_bool(self, key):
-        """Read a boolean configuration value from the config file."""
-        configfilename = "txt/config.txt"
+    """Configuration management for WeatherPeg.
+
+    The config file is parsed once into a typed dict and cached. Every
+    lookup only stats the file and re-reads it when its mtime or size
+    changed. `check_for_changes` tells subscribers which keys changed.
+    """
+    _lock = threading.Lock()
+    _values = {}
+    _signature = None
+    _notified = None
+    _subscribers = []
+
+    @classmethod
+    def load(cls):
+        """Return the cached config dict, re-reading the file if it changed on disk."""
         try:
-            with open(configfilename, "r", encoding="utf-8") as f:
-                for line in f:
-                    line = line.strip()
-                    if line.startswith(f"{key}:"):
-                        value = line.split(":", 1)[1].strip()
-                        # Convert to boolean (0 = False, 1 = True)
-                        return value == "1"
+            stat = os.stat(CONFIG_FILE)
+            signature = (stat.st_mtime_ns, stat.st_size)
         except FileNotFoundError:
-            logging.error(f"File {configfilename} not found")
-            return False
-        return False  # Default to False if not found
+            signature = None
+        with cls._lock:
+            if signature != cls._signature:
+                cls._values = cls._read(signature)
+                cls._signature = signature
+            return cls._values
 
-    def get_config_port(self):
-        """Read the port number from the config file."""
-        configfilename = "txt/config.txt"
+    @staticmethod
+    def _read(signature):
+        values = {}
+        if signature is None:
+            logging.error(f"File {CONFIG_FILE} not found")
+            return values
         try:
-            with open(configfilename, "r", encoding="utf-8") as f:
+            with open(CONFIG_FILE, "r", encoding="utf-8") as f:
                 for line in f:
                     line = line.strip()
-                    if line.lower().startswith("port:"):
-                        value = line.split(":", 1)[1].strip()
-                        try:
-                            return int(value)  # return as integer
-                        except ValueError:
-                            logging.error(f"Invalid port value: {value}")
-                            return None
+                    if ":" not in line:
+                        continue
+                    key, value = line.split(":", 1)
+                    values.setdefault(key.strip(), _parse_value(value.strip()))
         except FileNotFoundError:
-            logging.error(f"File {configfilename} not found")
-            return None
+            logging.error(f"File {CONFIG_FILE} not found")
+        logging.info(f"Loaded {len(values)} settings from {CONFIG_FILE}")
+        return values
+
+    @classmethod
+    def subscribe(cls, callback):
+        """Call `callback(changed)` with a {key: new value} dict whenever settings change."""
+        cls._subscribers.append(callback)
 
+    @classmethod
+    def unsubscribe(cls, callback):
+        """Stop notifying `callback` about changes."""
+        if callback in cls._subscribers:
+            cls._subscribers.remove(callback)
+
+    @classmethod
+    def check_for_changes(cls):
+        """Reload the file if needed and notify subscribers of changed keys.
+
+        Subscribers run on the calling thread, so GUI code should call
+        this from the Tk main loop.
+        """
+        values = cls.load()
+        previous = cls._notified
+        cls._notified = values
+        if previous is None or previous is values:
+            return {}
+        changed = {key: values.get(key) for key in set(previous) | set(values)
+                   if previous.get(key) != values.get(key)}
+        if changed:
+            logging.info(f"Config changed: {changed}")
+            for callback in list(cls._subscribers):
+                try:
+                    callback(changed)
+                except Exception:
+                    logging.exception("Error in config subscriber")
+        return changed
+
+    def get_config_bool(self, key):
+        """Read a boolean configuration value from the config file."""
+        # Convert to boolean (0 = False, 1 = True)
+        return Config.load().get(key) == 1
+
+    def get_config_port(self):
+        """Read the port number from the config file."""
+        for key, value in Config.load().items():
+            if key.lower() == "port":
+                if isinstance(value, int):
+                    return value
+                logging.error(f"Invalid port value: {value}")
+                return None
         return None  # Default if "port:" not found
 
     def get_config_value(self, key, default=None):
         """Read a configuration value from the config file."""
-        configfilename = "txt/config.txt"
-        try:
-            with open(configfilename, "r", encoding="utf-8") as f:
-                for line in f:
-                    line = line.strip()
-                    if line.startswith(f"{key}:"):
-                        value = line.split(":", 1)[1].strip()
-                        # Try to convert to int if possible
-                        if value.isdigit():
-                            return int(value)
-                        try:
-                            return float(value)  # handles decimal numbers
-                        except ValueError:
-                            return value  # fallback to raw string
-        except FileNotFoundError:
-            logging.error(f"File {configfilename} not found")
-            return default
-        return default
-    
+        return Config.load().get(key, default)
+
 if __name__ == "__main__":
-    print("This is a module, and not meant to be run directly")
\ No newline at end of file
+    print("This is a module, and not meant to be run directly")
@@ -0,0 +1,168 @@
+import calendar
+import email.utils
+import hashlib
+import logging
+import queue
+import re
+import time
+from dataclasses import dataclass
+from typing import Any, Optional
+
+import metrics_helper
+
+FETCH_SECONDS = metrics_helper.timer("weatherpeg_fetch_seconds", "HTTP GET of a feed, including retries")
+HTTP_RETRIES = metrics_helper.counter("weatherpeg_http_retries_total", "Feed requests retried by the HTTP adapter")
+PARSE_SECONDS = metrics_helper.timer("weatherpeg_parse_seconds", "Parsing a changed feed body")
+APPLY_SECONDS = metrics_helper.timer("weatherpeg_apply_seconds", "Applying one poll result to the weather on display")
+POLLS = {status: metrics_helper.counter("weatherpeg_polls_total", "Successful feed polls by outcome",
+                                        {"status": status})
+         for status in ("not_modified", "unchanged", "parsed")}
+
+
+@dataclass
+class FeedResult:
+    """Outcome of one conditional poll of the RSS feed.
+
+    `status` is "not_modified" (HTTP 304), "unchanged" (200 with the same
+    body as last time) or "parsed" (new body, `feed` is filled in).
+    """
+    status: str
+    content: Optional[bytes] = None
+    feed: Any = None
+    updated: Optional[float] = None  # epoch seconds the feed says it was last updated
+    max_age: Optional[float] = None  # seconds the server says the response stays fresh
+    validators: Optional[tuple] = None  # (ETag, Last-Modified, body hash) for ConditionalFetcher.commit
+
+
+_MAX_AGE_RE = re.compile(r"max-age=(\d+)")
+
+
+def _http_date(value):
+    """Epoch seconds of an HTTP date header, or None."""
+    if not value:
+        return None
+    try:
+        return email.utils.parsedate_to_datetime(value).timestamp()
+    except (TypeError, ValueError):
+        return None
+
+
+def response_max_age(headers):
+    """Freshness lifetime from Cache-Control max-age or Expires, in seconds, or None."""
+    match = _MAX_AGE_RE.search(headers.get("Cache-Control", ""))
+    if match:
+        return float(match.group(1))
+    expires = _http_date(headers.get("Expires"))
+    if expires is not None:
+        return max(0.0, expires - time.time())
+    return None
+
+
+def feed_updated(feed, headers=None):
+    """Epoch seconds of the feed's own `updated` time, falling back to Last-Modified."""
+    parsed = getattr(feed, "feed", {}).get("updated_parsed") if feed is not None else None
+    if parsed:
+        return float(calendar.timegm(parsed))
+    return _http_date((headers or {}).get("Last-Modified"))
+
+
+class ConditionalFetcher:
+    """Poll a URL with If-None-Match/If-Modified-Since and skip unchanged bodies.
+
+    A 200 response's validators are only kept once the caller has processed
+    the result and calls `commit`, so a body that failed to parse or apply
+    is fetched and parsed again on the next poll.
+    """
+
+    def __init__(self, networking, parse):
+        self.networking = networking
+        self.parse = parse
+        self.etag = None
+        self.last_modified = None
+        self.body_hash = None
+        self.stats = {"not_modified": 0, "unchanged": 0, "parsed": 0}
+
+    def fetch(self, url):
+        """Fetch `url` and return a FeedResult. Only parses when the body changed."""
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        started = time.perf_counter()
+        response = self.networking.http_get(url, headers=headers)
+        FETCH_SECONDS.since(started)
+        retries = getattr(getattr(response, "raw", None), "retries", None)
+        if retries is not None and retries.history:
+            HTTP_RETRIES.inc(len(retries.history))
+        if response.status_code == 304:
+            self.stats["not_modified"] += 1
+            POLLS["not_modified"].inc()
+            return FeedResult("not_modified", max_age=response_max_age(response.headers))
+        response.raise_for_status()
+
+        content = response.content
+        body_hash = hashlib.sha256(content).hexdigest()
+        validators = (response.headers.get("ETag", self.etag),
+                      response.headers.get("Last-Modified", self.last_modified), body_hash)
+        if body_hash == self.body_hash:
+            self.stats["unchanged"] += 1
+            POLLS["unchanged"].inc()
+            return FeedResult("unchanged", content=content, max_age=response_max_age(response.headers),
+                              validators=validators)
+
+        started = time.perf_counter()
+        feed = self.parse(content)
+        PARSE_SECONDS.since(started)
+        self.stats["parsed"] += 1
+        POLLS["parsed"].inc()
+        return FeedResult("parsed", content=content, feed=feed, updated=feed_updated(feed, response.headers),
+                          max_age=response_max_age(response.headers), validators=validators)
+
+    def commit(self, result):
+        """Keep the validators of a result that was processed, so the next poll is conditional on it."""
+        if result is not None and result.validators is not None:
+            self.etag, self.last_modified, self.body_hash = result.validators
+
+
+class FetchWorker:
+    """Hand results from background fetch threads back to Tk.
+
+    Fetch threads put their results on a thread-safe queue. The Tk main
+    loop drains that queue from a "fetch_drain" timer in the GUI's
+    TimerRegistry, so callbacks that touch widgets always run on the Tk
+    thread.
+    """
+
+    def __init__(self, timers, drain_interval=100):
+        self.drain_interval = drain_interval
+        self.results = queue.Queue()
+        self.ui_block = APPLY_SECONDS
+        timers.every("fetch_drain", self.drain_interval, self._drain)
+
+    def post(self, on_result, result, error=None):
+        """Queue `on_result(result, error)` to run on the Tk thread. Safe from any thread."""
+        self.results.put((on_result, result, error))
+
+    def call_soon(self, function, *args):
+        """Queue `function(*args)` to run on the Tk thread. Safe from any thread."""
+        self.post(lambda result, error: function(*args), None)
+
+    def _drain(self):
+        """Apply any finished results."""
+        while True:
+            try:
+                on_result, result, error = self.results.get_nowait()
+            except queue.Empty:
+                break
+            started = time.perf_counter()
+            try:
+                on_result(result, error)
+            except Exception:
+                logging.exception("Error applying fetch result")
+            self.ui_block.since(started)
+            logging.info(self.ui_block.summary())
+
+
+if __name__ == "__main__":
+    print("This is a module, and not meant to be run directly")
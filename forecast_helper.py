@@ -0,0 +1,106 @@
+"""
+Parser for Environment Canada "Weather Forecasts" entries.
+
+Each forecast period is one feed entry whose title reads like
+
+    Saturday night: Showers. Low 15. POP 60%
+    Monday: A mix of sun and cloud. High plus 2.
+
+The title is turned into a ForecastPeriod. Patterns are compiled once and
+titles are memoized, since most of a forecast repeats between polls.
+"""
+
+import re
+from dataclasses import dataclass, asdict
+from functools import lru_cache
+from typing import Optional
+
+from conditions_helper import clean_summary
+
+FORECAST_CATEGORY = "Weather Forecasts"
+
+_PERIOD_RE = re.compile(r"^(?P<period>[^:]+):\s*(?P<rest>.*)$")
+_TEMPERATURE_RE = re.compile(
+    r"\b(?P<kind>High|Low|Temperature steady near)\s+(?P<sign>minus|plus)?\s*(?P<value>\d+|zero)\b",
+    re.IGNORECASE,
+)
+_POP_RE = re.compile(r"\bPOP\s+(\d+)\s*%")
+
+
+@dataclass(frozen=True)
+class ForecastPeriod:
+    """One forecast period. Missing fields are None."""
+    period: str
+    condition: Optional[str] = None
+    high: Optional[float] = None
+    low: Optional[float] = None
+    pop: Optional[int] = None
+    summary: str = ""
+
+    def to_dict(self):
+        """The period as a plain dict, for JSON and the state snapshot."""
+        return asdict(self)
+
+
+def _temperature(match):
+    value = 0.0 if match.group("value").lower() == "zero" else float(match.group("value"))
+    return -value if (match.group("sign") or "").lower() == "minus" else value
+
+
+@lru_cache(maxsize=256)
+def parse_forecast_title(title, summary=""):
+    """Parse one forecast entry title (and its summary text) into a ForecastPeriod."""
+    match = _PERIOD_RE.match(title.strip())
+    if not match:
+        return ForecastPeriod(period=title.strip(), summary=summary)
+    rest = match.group("rest")
+    sentences = [sentence.strip() for sentence in rest.split(". ") if sentence.strip()]
+    condition = None
+    if sentences and not _TEMPERATURE_RE.match(sentences[0]) and not _POP_RE.match(sentences[0]):
+        condition = sentences[0].rstrip(".")
+
+    period = match.group("period").strip()
+    high = low = None
+    for temperature in _TEMPERATURE_RE.finditer(rest):
+        kind = temperature.group("kind").lower()
+        # "temperature steady near" is the night's low or the day's high
+        if kind == "low" or (kind != "high" and period.lower().endswith("night")):
+            low = _temperature(temperature)
+        else:
+            high = _temperature(temperature)
+    pop = _POP_RE.search(rest)
+    return ForecastPeriod(
+        period=period,
+        condition=condition,
+        high=high,
+        low=low,
+        pop=int(pop.group(1)) if pop else None,
+        summary=summary,
+    )
+
+
+def parse_forecast(entries):
+    """ForecastPeriods for the forecast entries among parsed feed `entries`, in feed order."""
+    return [parse_forecast_title(entry.title, clean_summary(entry.summary).strip()) for entry in entries
+            if entry.category == FORECAST_CATEGORY]
+
+
+def format_forecast(periods, limit=6):
+    """Compact multi-line text for the GUI forecast panel, from ForecastPeriod dicts."""
+    lines = []
+    for period in periods[:limit]:
+        parts = [f"{period['period']}:"]
+        if period["condition"]:
+            parts.append(period["condition"])
+        if period["high"] is not None:
+            parts.append(f"H {period['high']:g}")
+        if period["low"] is not None:
+            parts.append(f"L {period['low']:g}")
+        if period["pop"] is not None:
+            parts.append(f"POP {period['pop']}%")
+        lines.append(" ".join(parts))
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    print("This is a module, and not meant to be run directly")
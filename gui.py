@@ -0,0 +1,284 @@
+import tkinter as tk
+import logging
+import time
+import datetime
+import command_window
+from config import Config, CONFIG_CHECK_INTERVAL
+from scrolling_text_widget import ScrollingTextWidget, CanvasScrollingText
+from browser_helper import WebOpen
+from view_helper import WeatherView
+from scheduler_helper import TimerRegistry, DEBUG_LOG_INTERVAL, schedule_report
+from snapshot_helper import format_age
+from weather_fetcher import WeatherFetcher
+
+PROG = "WeatherPeg"
+DESIGNED_BY = "Designed by Diode-exe"
+
+class GUI:
+    """Graphical User Interface setup."""
+    def __init__(self, started=None):
+        self.started = time.perf_counter() if started is None else started
+        self.first_paint_ms = None
+        self._after_paint = []
+        self.root = tk.Tk()
+        self.root.title(PROG)
+        self.root.configure(bg="black")
+        self.root.geometry("800x600")
+        self.timers = TimerRegistry(self.root)
+        self.title_var = tk.StringVar(value="Loading weather data...")
+        self.title_label = tk.Label(self.root, textvariable=self.title_var, fg="lime", bg="black",
+                            font=("VCR OSD Mono", 16, "bold"), justify="left",
+                            padx=10, pady=10, wraplength=750)
+        self.title_label.pack()
+
+        self.summary_var = tk.StringVar(value="Loading weather data...")
+        # optional scrolling summary (placed under title)
+        self.scrolling_summary = None
+        self.set_scroller_visible(Config.get_config_bool(self, key="show_scroller"))
+
+        self.link_var = tk.StringVar(value="")
+        self.link_label = tk.Label(
+            self.root, textvariable=self.link_var,
+            fg="cyan", bg="black",
+            font=("VCR OSD Mono", 10), justify="left",
+            padx=10, pady=10
+        )
+        if Config.get_config_bool(self, key="show_link"):
+            logging.info("Showing link")
+            self.link_label.pack()
+        else:
+            logging.info("Not showing link")
+
+        self.current_warning_title_var = tk.StringVar(value="No warnings")
+        self.current_warning_summary_var = tk.StringVar(value="No warnings in effect.")
+        self.current_warning_title_label = tk.Label(
+                self.root, textvariable=self.current_warning_title_var,
+                fg="lime", bg="black",
+                font=("VCR OSD Mono", 16, "bold"), justify="left",
+                padx=10, pady=10, wraplength=750
+        )
+        self.current_warning_title_label.pack()
+
+        self.current_warning_summary = tk.Label(
+            self.root, textvariable=self.current_warning_summary_var,
+            fg="lime", bg="black",
+            font=("VCR OSD Mono", 16, "bold"), justify="left",
+            padx=10, pady=10, wraplength=750
+        )
+        self.current_warning_summary.pack()
+
+        self.forecast_var = tk.StringVar(value="")
+        self.forecast_label = tk.Label(
+            self.root, textvariable=self.forecast_var,
+            fg="lime", bg="black",
+            font=("VCR OSD Mono", 12), justify="left",
+            padx=10, pady=10, wraplength=750
+        )
+        if Config.get_config_bool(self, key="show_forecast"):
+            self.forecast_label.pack()
+
+        self.status_var = tk.StringVar(value="")
+        self.status_label = tk.Label(
+            self.root, textvariable=self.status_var,
+            fg="lime", bg="black",
+            font=("Courier", 10)
+        )
+        self.status_label.pack(side=tk.BOTTOM, pady=10)
+
+        self.designed_by_label = tk.Label(
+            self.root, text=DESIGNED_BY,
+            fg="cyan", bg="black",
+            font=("Courier", 10), justify="left"
+        )
+        self.designed_by_label.pack(side=tk.BOTTOM, pady=10, padx=10)
+
+        self.timestamp_var = tk.StringVar()
+        self.timestamp_label = tk.Label(
+            self.root, textvariable=self.timestamp_var,
+            fg="lime", bg="black",
+            font=("Courier", 10)
+        )
+        self.timestamp_label.pack(side=tk.BOTTOM, pady=10)
+
+        self.root.bind("<F4>", lambda event=None: WebOpen.opener(self, port=2046))
+        self.root.bind("<F6>", self.open_command_window)
+        self.command_window = None
+        self.current_title = None
+        self.current_summary = None
+        self.current_link = None
+        self.view = WeatherView(self)
+        self.fullscreen_manager = ScreenState(self)
+        self.weather_fetcher = WeatherFetcher(self)
+        if self.weather_fetcher.source_problems:
+            self.status_var.set(" / ".join(self.weather_fetcher.source_problems))
+        self.root.bind("<Map>", self._on_map, add="+")
+        self.update_timestamp()
+        self.timers.every("timestamp", 1000, self.update_timestamp)
+        Config.check_for_changes()
+        Config.subscribe(self.apply_config_changes)
+        self.timers.every("config", CONFIG_CHECK_INTERVAL, self.check_config)
+        self.timers.every("schedule_log", DEBUG_LOG_INTERVAL, self.log_schedule)
+
+    def _on_map(self, event):
+        if event.widget is self.root and self.first_paint_ms is None:
+            # idle callbacks run once Tk has drawn the newly mapped window
+            self.root.after_idle(self._first_paint)
+
+    def _first_paint(self):
+        if self.first_paint_ms is None:
+            self.first_paint_ms = (time.perf_counter() - self.started) * 1000
+            print(f"First paint {self.first_paint_ms:.0f}ms after start", flush=True)
+            for callback in self._after_paint:
+                callback()
+            self._after_paint = []
+
+    def after_first_paint(self, callback):
+        """Run `callback()` once the window has been drawn, to keep slow startup work off the first paint."""
+        if self.first_paint_ms is not None:
+            callback()
+        else:
+            self._after_paint.append(callback)
+
+    def open_command_window(self, event=None):
+        """Open the command window"""
+        if self.command_window is None or not self.command_window.cmd_window.winfo_exists():
+            self.command_window = command_window.CommandWindow(
+                self.root,
+                fullscreen_func=self.fullscreen_manager.toggle_fullscreen,
+                refresh_func=self.weather_fetcher.get_weather,
+                status_var=self.status_var,
+                gui=self
+            )
+            self.command_window.create_command_window()
+            self.command_window.cmd_window.lift()
+
+    def set_scroller_visible(self, visible):
+        """Create or remove the scrolling summary under the title."""
+        if visible and self.scrolling_summary is None:
+            try:
+                text = self.summary_var.get()
+                if Config.get_config_value(self, key="scroller_renderer", default="label") == "canvas":
+                    self.scrolling_summary = CanvasScrollingText(
+                        self.root, self.timers, text, width=80,
+                        fps=int(Config.get_config_value(self, key="scroller_fps", default=30)),
+                        speed=Config.get_config_value(self, key="scroller_speed", default=60),
+                    )
+                else:
+                    self.scrolling_summary = ScrollingTextWidget(self.root, self.timers, text, width=80, speed=150)
+                self.scrolling_summary.label.pack_configure(after=self.title_label)
+            except Exception:
+                self.scrolling_summary = None
+        elif not visible and self.scrolling_summary is not None:
+            self.scrolling_summary.destroy()
+            self.scrolling_summary = None
+
+    def apply_config_changes(self, changed):
+        """Apply settings that changed in the config file without a restart."""
+        if "show_scroller" in changed:
+            self.set_scroller_visible(changed["show_scroller"] == 1)
+        elif {"scroller_renderer", "scroller_fps", "scroller_speed"} & set(changed):
+            if self.scrolling_summary is not None:
+                # rebuild the scroller with the new settings
+                self.set_scroller_visible(False)
+                self.set_scroller_visible(True)
+        if "show_link" in changed:
+            if changed["show_link"] == 1:
+                self.link_label.pack(after=self.title_label if self.scrolling_summary is None
+                                     else self.scrolling_summary.label)
+            else:
+                self.link_label.pack_forget()
+        if "show_forecast" in changed:
+            if changed["show_forecast"] == 1:
+                self.forecast_label.pack(after=self.current_warning_summary)
+            else:
+                self.forecast_label.pack_forget()
+        if {"refresh_delay", "warning_refresh_delay", "adaptive_polling"} & set(changed):
+            self.weather_fetcher.schedule_refresh()
+
+    def check_config(self):
+        """Poll the config file for changes."""
+        Config.check_for_changes()
+
+    def schedule_report(self):
+        """Active timer chains, polling rate and view counters. Safe to call from the web server thread."""
+        return dict(schedule_report(self.timers, self.weather_fetcher), view=self.view.stats())
+
+    def log_schedule(self):
+        """Log the active timer chains and polling rate, to confirm neither grows over time."""
+        logging.info(f"Schedule: {self.schedule_report()}")
+
+    def update_timestamp(self):
+        """Update the timestamp (every second, from the "timestamp" timer)."""
+        text = f"Current time is {datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"
+        stale_age = self.weather_fetcher.stale_age()
+        if stale_age is not None:
+            text += f"  (showing saved weather from {format_age(stale_age)} ago)"
+        self.timestamp_var.set(text)
+
+
+class ScreenState():
+    """Manage screen state such as fullscreen toggling."""
+    def __init__(self, gui):
+        self.gui = gui
+        self.root = gui.root
+        self.fullscreen = False
+        self.last_flash = None
+        self.root.bind("<F2>", lambda event=None: self.open_radar())
+        self.root.bind("<F3>", lambda event=None: self.open_radar(loop=True))
+        self.root.bind("<F11>", self.toggle_fullscreen)
+
+    def open_radar(self, loop=False):
+        """Show the radar frame (or loop) for the location on screen."""
+        import radar_helper  # env_canada and PIL are only loaded the first time radar is used
+        radar_helper.open_radar(self.gui, coordinates=self.radar_coordinates(), loop=loop)
+
+    def radar_coordinates(self):
+        """Coordinates of the location currently on screen, for the radar."""
+        weather_fetcher = getattr(self.gui, "weather_fetcher", None)
+        if weather_fetcher is not None:
+            return weather_fetcher.sources[weather_fetcher.active].coordinates
+        return None
+
+    def toggle_fullscreen(self, event=None):
+        """Toggle fullscreen mode"""
+        current_fullscreen = self.root.attributes("-fullscreen")
+        self.root.attributes("-fullscreen", not current_fullscreen)
+
+    def _flash_labels(self):
+        return [
+            (self.gui.title_label, "lime"),
+            (self.gui.current_warning_title_label, "lime"),
+            (self.gui.current_warning_summary, "lime"),
+            (self.gui.forecast_label, "lime"),
+            (self.gui.status_label, "lime"),
+            (self.gui.timestamp_label, "lime"),
+            (self.gui.designed_by_label, "cyan"),
+        ]
+
+    def display_flash_off(self):
+        """Make the screen flash off, at most once every `flash_delay` ms.
+
+        Returns how many widgets the whole flash (off and back on) reconfigures.
+        """
+        flash_delay = Config.get_config_value(self, key="flash_delay", default=0)
+        now = time.monotonic()
+        if self.last_flash is not None and (now - self.last_flash) * 1000 < flash_delay:
+            return 0
+        self.last_flash = now
+        labels = self._flash_labels()
+        for label, _ in labels:
+            label.config(fg="black", bg="black")
+        widgets = len(labels)
+        if self.gui.scrolling_summary is not None:
+            self.gui.scrolling_summary.flash_black()
+            widgets += 1
+        self.gui.timers.once("flash_on", 250, self.display_flash_on)
+        return widgets * 2
+
+    def display_flash_on(self):
+        """Make the screen flash on."""
+        for label, colour in self._flash_labels():
+            label.config(fg=colour, bg="black")
+
+if __name__ == "__main__":
+    print("This is a module, and not meant to be run directly")
@@ -0,0 +1,282 @@
+import argparse
+import datetime
+import hashlib
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+import zlib
+import metrics_helper
+from conditions_helper import parse_summary
+
+HISTORY_DB = "history/weatherpeg.db"
+HISTORY_TXT = "txt/history.txt"
+COMPACT_INTERVAL = 24 * 60 * 60  # seconds between automatic compactions
+
+WRITE_SECONDS = metrics_helper.timer("weatherpeg_history_write_seconds", "Writing one observation to the history store")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS feed_bodies (
+    hash TEXT PRIMARY KEY,
+    body BLOB NOT NULL,
+    first_seen REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS observations (
+    id INTEGER PRIMARY KEY,
+    logged_at REAL NOT NULL,
+    title TEXT,
+    summary TEXT,
+    link TEXT,
+    temperature REAL,
+    pressure REAL,
+    pressure_tendency TEXT,
+    humidity REAL,
+    wind_direction TEXT,
+    wind_speed REAL,
+    wind_gust REAL,
+    warning TEXT,
+    body_hash TEXT REFERENCES feed_bodies(hash),
+    source TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_observations_logged_at ON observations(logged_at);
+"""
+
+_OBSERVATION_COLUMNS = (
+    "logged_at", "title", "summary", "link", "temperature", "pressure",
+    "pressure_tendency", "humidity", "wind_direction", "wind_speed",
+    "wind_gust", "warning", "body_hash", "source",
+)
+
+_LOGGED_TIME_RE = re.compile(r"(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2})")
+_PARSED_FIELDS = (
+    "temperature", "pressure", "pressure_tendency", "humidity",
+    "wind_direction", "wind_speed", "wind_gust",
+)
+
+
+def _extract_fields(summary):
+    """Pull the observation fields stored as columns out of a Current Conditions summary."""
+    conditions = parse_summary(summary or "")
+    return {field: getattr(conditions, field) for field in _PARSED_FIELDS}
+
+
+class HistoryStore:
+    """SQLite-backed store for parsed observations and deduplicated raw feed bodies.
+
+    Observations are indexed on `logged_at`, so time-range queries are an
+    index range scan. Raw feed bodies are stored once per distinct sha256
+    and zlib-compressed.
+    """
+
+    def __init__(self, path=HISTORY_DB, retention_days=0):
+        self.path = path
+        self.retention_days = retention_days
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        with self._lock, self._conn:
+            self._conn.executescript(_SCHEMA)
+            columns = {row["name"] for row in self._conn.execute("PRAGMA table_info(observations)")}
+            if "source" not in columns:
+                self._conn.execute("ALTER TABLE observations ADD COLUMN source TEXT")
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_observations_source_logged_at ON observations(source, logged_at)"
+            )
+        # the first compaction is a full interval after start, not on the first record() of every run
+        self._last_compact = time.time()
+        self._revision = 0
+
+    @property
+    def revision(self):
+        """Changes whenever the data changes, in this process or another, so readers can cache query results."""
+        with self._lock:
+            data_version = self._conn.execute("PRAGMA data_version").fetchone()[0]
+        return (self._revision, data_version)
+
+    def record(self, title, summary, link, warning, content=None, logged_at=None, source=None):
+        """Store one observation and, if given, the raw feed body it came from."""
+        started = time.perf_counter()
+        logged_at = time.time() if logged_at is None else logged_at
+        body_hash = None
+        with self._lock, self._conn:
+            if content is not None:
+                body_hash = hashlib.sha256(content).hexdigest()
+                self._conn.execute(
+                    "INSERT OR IGNORE INTO feed_bodies (hash, body, first_seen) VALUES (?, ?, ?)",
+                    (body_hash, zlib.compress(content), logged_at),
+                )
+            self._insert_observation(logged_at, title, summary, link, warning, body_hash, source)
+            self._revision += 1
+        WRITE_SECONDS.since(started)
+        if self.retention_days and time.time() - self._last_compact > COMPACT_INTERVAL:
+            # DELETE + VACUUM can take seconds, so never on the caller's thread
+            self._last_compact = time.time()
+            threading.Thread(target=self.compact, name="weatherpeg-history-compact", daemon=True).start()
+
+    def _insert_observation(self, logged_at, title, summary, link, warning, body_hash, source=None):
+        row = {
+            "logged_at": logged_at,
+            "title": title,
+            "summary": summary,
+            "link": link,
+            "warning": warning,
+            "body_hash": body_hash,
+            "source": source,
+        }
+        row.update(_extract_fields(summary))
+        self._conn.execute(
+            f"INSERT INTO observations ({', '.join(_OBSERVATION_COLUMNS)}) "
+            f"VALUES ({', '.join('?' for _ in _OBSERVATION_COLUMNS)})",
+            tuple(row[column] for column in _OBSERVATION_COLUMNS),
+        )
+
+    def query(self, start=None, end=None, limit=None, source=None, newest=False):
+        """Return observations with start <= logged_at < end, oldest first, optionally for one source.
+
+        With a `limit`, the oldest rows in the range are kept, or the newest
+        ones if `newest` is true.
+        """
+        sql = f"SELECT {', '.join(_OBSERVATION_COLUMNS)} FROM observations WHERE logged_at >= ? AND logged_at < ?"
+        params = [start if start is not None else float("-inf"), end if end is not None else float("inf")]
+        if source is not None:
+            sql += " AND source = ?"
+            params.append(source)
+        sql += " ORDER BY logged_at DESC" if newest else " ORDER BY logged_at"
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(int(limit))
+        with self._lock:
+            rows = [dict(row) for row in self._conn.execute(sql, params)]
+        if newest:
+            rows.reverse()
+        return rows
+
+    def latest(self):
+        """Return the most recent observation, or None if the store is empty."""
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT {', '.join(_OBSERVATION_COLUMNS)} FROM observations ORDER BY logged_at DESC LIMIT 1"
+            ).fetchone()
+        return dict(row) if row else None
+
+    def get_body(self, body_hash):
+        """Return the raw feed body stored under `body_hash`, or None."""
+        with self._lock:
+            row = self._conn.execute("SELECT body FROM feed_bodies WHERE hash = ?", (body_hash,)).fetchone()
+        return zlib.decompress(row["body"]) if row else None
+
+    def iter_bodies(self, limit=None):
+        """Yield stored raw feed bodies, newest first."""
+        sql = "SELECT hash FROM feed_bodies ORDER BY first_seen DESC"
+        params = ()
+        if limit is not None:
+            sql += " LIMIT ?"
+            params = (int(limit),)
+        with self._lock:
+            hashes = [row["hash"] for row in self._conn.execute(sql, params)]
+        for body_hash in hashes:
+            body = self.get_body(body_hash)
+            if body is not None:
+                yield body
+
+    def compact(self, retention_days=None):
+        """Drop observations past retention and feed bodies nothing refers to."""
+        retention_days = self.retention_days if retention_days is None else retention_days
+        with self._lock:
+            with self._conn:
+                if retention_days:
+                    cutoff = time.time() - retention_days * 24 * 60 * 60
+                    self._conn.execute("DELETE FROM observations WHERE logged_at < ?", (cutoff,))
+                self._conn.execute(
+                    "DELETE FROM feed_bodies WHERE hash NOT IN "
+                    "(SELECT body_hash FROM observations WHERE body_hash IS NOT NULL)"
+                )
+            self._conn.execute("VACUUM")
+            self._revision += 1
+        self._last_compact = time.time()
+        logging.info(f"Compacted history store {self.path}")
+
+    def import_history_txt(self, filename=HISTORY_TXT):
+        """Import the legacy free-form history.txt log. Returns the number of rows added."""
+        added = 0
+        with self._lock, self._conn:
+            for block in read_history_txt(filename):
+                exists = self._conn.execute(
+                    "SELECT 1 FROM observations WHERE logged_at = ? AND summary IS ?",
+                    (block["logged_at"], block["summary"]),
+                ).fetchone()
+                if exists:
+                    continue
+                self._insert_observation(block["logged_at"], block["title"], block["summary"],
+                                         block["link"], block["warning"], None)
+                added += 1
+            self._revision += 1
+        logging.info(f"Imported {added} observations from {filename}")
+        return added
+
+    def close(self):
+        """Close the database connection."""
+        with self._lock:
+            self._conn.close()
+
+
+def _decode_line(raw):
+    # history.txt has been written with both UTF-8 and Latin-1 over time
+    try:
+        return raw.decode("utf-8")
+    except UnicodeDecodeError:
+        return raw.decode("latin-1")
+
+
+def read_history_txt(filename):
+    """Yield one dict per entry in the legacy history.txt format."""
+    block = {}
+    with open(filename, "rb") as f:
+        for raw in f:
+            line = _decode_line(raw).strip()
+            if line.startswith("-----"):
+                if block.get("logged_at") is not None:
+                    yield {
+                        "logged_at": block["logged_at"],
+                        "title": block.get("title"),
+                        "summary": block.get("summary"),
+                        "link": block.get("link"),
+                        "warning": block.get("warning"),
+                    }
+                block = {}
+            elif line.startswith("Summary:"):
+                block["summary"] = line.split(":", 1)[1].strip()
+            elif line.lower().startswith("coords/link:"):
+                block["link"] = line.split(":", 1)[1].strip()
+            elif line.startswith("Current warning:"):
+                block["warning"] = line.split(":", 1)[1].strip() or None
+            elif line.startswith("Title:"):
+                block["title"] = line.split(":", 1)[1].strip()
+            elif line.startswith("Current Conditions"):
+                block["title"] = line
+            elif "Current time" in line:
+                match = _LOGGED_TIME_RE.search(line)
+                if match:
+                    logged = datetime.datetime.strptime(match.group(1), "%Y-%m-%d %H:%M:%S")
+                    block["logged_at"] = logged.timestamp()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Manage the WeatherPeg history store")
+    parser.add_argument("command", choices=("import", "compact"))
+    parser.add_argument("--db", default=HISTORY_DB)
+    parser.add_argument("--source", default=HISTORY_TXT, help="history.txt to import")
+    parser.add_argument("--retention-days", type=float, default=0)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    store = HistoryStore(args.db, retention_days=args.retention_days)
+    if args.command == "import":
+        print(f"Imported {store.import_history_txt(args.source)} observations")
+    else:
+        store.compact()
+    store.close()
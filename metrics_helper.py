@@ -0,0 +1,185 @@
+"""
+Counters and timers for WeatherPeg's hot paths.
+
+Metrics are created once at import time by the module that records them:
+
+    FETCH_SECONDS = metrics_helper.timer("weatherpeg_fetch_seconds", "HTTP GET of a feed")
+    ...
+    started = time.perf_counter()
+    response = http_get(url)
+    FETCH_SECONDS.since(started)
+
+Recording takes no lock, so it costs a few hundred nanoseconds and can
+stay on all the time. Under the GIL an update can only be lost if two
+threads record into the same metric at the same instant, which is an
+acceptable error for monitoring. REGISTRY renders everything in the
+Prometheus text format for /metrics and as plain lines for the stats view
+in the command window.
+"""
+
+import threading
+import time
+from bisect import bisect_left
+
+# histogram bucket upper bounds in seconds, as in the Prometheus client defaults
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _label_text(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{value}"' for key, value in sorted(labels.items())) + "}"
+
+
+class Counter:
+    """Monotonic count of events. By Prometheus convention the name ends in _total."""
+    __slots__ = ("name", "description", "labels", "value")
+    kind = "counter"
+
+    def __init__(self, name, description="", labels=None):
+        self.name = name
+        self.description = description
+        self.labels = labels or {}
+        self.value = 0
+
+    def inc(self, amount=1):
+        """Add `amount` to the count."""
+        self.value += amount
+
+    def samples(self):
+        """Yield (name, labels, value) for the Prometheus exposition."""
+        yield self.name, self.labels, self.value
+
+    def summary(self):
+        """One line: the name, labels and count."""
+        return f"{self.name}{_label_text(self.labels)}: {self.value}"
+
+
+class Timer:
+    """Histogram of durations in seconds, with their sum and maximum."""
+    __slots__ = ("name", "description", "labels", "counts", "total", "max")
+    kind = "histogram"
+
+    def __init__(self, name, description="", labels=None):
+        self.name = name
+        self.description = description
+        self.labels = labels or {}
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, seconds):
+        """Add one duration."""
+        self.counts[bisect_left(BUCKETS, seconds)] += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def since(self, started):
+        """Record the time since `started`, a time.perf_counter() value, and return it."""
+        seconds = time.perf_counter() - started
+        self.record(seconds)
+        return seconds
+
+    @property
+    def count(self):
+        """Number of durations recorded."""
+        return sum(self.counts)
+
+    def samples(self):
+        """Yield the cumulative buckets, sum and count as (name, labels, value)."""
+        cumulative = 0
+        for bound, count in zip(BUCKETS, self.counts):
+            cumulative += count
+            yield self.name + "_bucket", dict(self.labels, le=repr(bound)), cumulative
+        yield self.name + "_bucket", dict(self.labels, le="+Inf"), cumulative + self.counts[-1]
+        yield self.name + "_sum", self.labels, self.total
+        yield self.name + "_count", self.labels, cumulative + self.counts[-1]
+
+    def summary(self):
+        """One line: count, mean, max and the rough 99th percentile, in milliseconds."""
+        counts = list(self.counts)
+        count = sum(counts)
+        if not count:
+            return f"{self.name}{_label_text(self.labels)}: no samples"
+        rank = 0.99 * count
+        running = 0
+        p99 = None
+        for bound, bucket in zip(BUCKETS, counts):
+            running += bucket
+            if running >= rank:
+                p99 = f"<={bound * 1000:g}ms"
+                break
+        return (f"{self.name}{_label_text(self.labels)}: n={count} mean={self.total / count * 1000:.2f}ms "
+                f"max={self.max * 1000:.2f}ms p99{p99 or f'>{BUCKETS[-1] * 1000:g}ms'}")
+
+
+class Registry:
+    """Every metric in the process, in creation order."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics = {}  # (name, sorted label items) -> metric
+
+    def counter(self, name, description="", labels=None):
+        """Return the counter `name` with `labels`, creating it the first time."""
+        return self._get(Counter, name, description, labels)
+
+    def timer(self, name, description="", labels=None):
+        """Return the timer `name` with `labels`, creating it the first time."""
+        return self._get(Timer, name, description, labels)
+
+    def _get(self, cls, name, description, labels):
+        key = (name, tuple(sorted((labels or {}).items())))
+        with self._lock:
+            metric = self._metrics.get(key)
+            if metric is None:
+                metric = self._metrics[key] = cls(name, description, labels)
+            elif not isinstance(metric, cls):
+                raise ValueError(f"metric {name} already exists as a {metric.kind}")
+            return metric
+
+    def metrics(self):
+        """Every metric, in creation order."""
+        with self._lock:
+            return list(self._metrics.values())
+
+    def recorded(self):
+        """The metrics that have recorded anything."""
+        return [metric for metric in self.metrics()
+                if (metric.value if metric.kind == "counter" else any(metric.counts))]
+
+    def render_prometheus(self, metrics=None):
+        """All metrics (or just `metrics`) in the Prometheus text exposition format (version 0.0.4)."""
+        lines = []
+        described = set()
+        for metric in sorted(self.metrics() if metrics is None else metrics, key=lambda metric: metric.name):
+            if metric.name not in described:
+                described.add(metric.name)
+                if metric.description:
+                    lines.append(f"# HELP {metric.name} {metric.description}")
+                lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for name, labels, value in metric.samples():
+                lines.append(f"{name}{_label_text(labels)} {value}")
+        return "\n".join(lines) + "\n"
+
+    def summary_lines(self):
+        """One readable line per metric that has recorded anything."""
+        return [metric.summary() for metric in self.recorded()]
+
+
+REGISTRY = Registry()
+
+
+def counter(name, description="", labels=None):
+    """Counter in the process-wide REGISTRY."""
+    return REGISTRY.counter(name, description, labels)
+
+
+def timer(name, description="", labels=None):
+    """Timer in the process-wide REGISTRY."""
+    return REGISTRY.timer(name, description, labels)
+
+
+if __name__ == "__main__":
+    print("This is a module, and not meant to be run directly")
@@ -0,0 +1,295 @@
+import heapq
+import logging
+import random
+import statistics
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import metrics_helper
+from fetch_helper import ConditionalFetcher
+
+DEFAULT_WORKERS = 8
+BACKOFF_BASE = 15.0  # seconds, doubled for each consecutive failure
+MAX_BACKOFF = 30 * 60.0  # seconds
+RATE_WINDOW = 60 * 60.0  # seconds of poll history behind polls_last_hour
+DENSE_POLL = 60.0  # seconds between polls around a feed's expected update
+CADENCE_SAMPLES = 8  # upstream update intervals kept per feed
+JITTER = 0.1  # +/- fraction added to every adaptive delay
+
+POLL_FAILURES = metrics_helper.counter("weatherpeg_poll_failures_total", "Feed polls that raised an error")
+POLL_RETRIES = metrics_helper.counter("weatherpeg_poll_retries_total", "Feed polls made while backing off from a failure")
+
+
+class FeedCadence:
+    """How often one feed changes upstream, learned from its `updated` timestamps.
+
+    The median gap between updates predicts the next one. Far from it the
+    feed is polled at the engine interval as usual, close to it (and for a
+    while after) every DENSE_POLL. The cadence only ever polls sooner than
+    the interval, never later, so a feed that changes hourly is still
+    checked every refresh_delay. A Cache-Control max-age or Expires header
+    delays the next poll until the feed is stale, but never past the interval.
+    """
+
+    def __init__(self):
+        self.last_updated = None  # epoch seconds of the newest upstream update seen
+        self.gaps = deque(maxlen=CADENCE_SAMPLES)
+        self.fresh_until = 0.0
+
+    def observe(self, updated, max_age, now):
+        """Record what one successful poll said about the feed, at wall clock time `now`."""
+        if max_age is not None:
+            self.fresh_until = now + max_age
+        if updated is None:
+            return
+        if self.last_updated is not None and updated > self.last_updated:
+            self.gaps.append(updated - self.last_updated)
+        if self.last_updated is None or updated > self.last_updated:
+            self.last_updated = updated
+
+    @property
+    def period(self):
+        """Median seconds between upstream updates, or None until two gaps are known."""
+        if len(self.gaps) < 2:
+            return None
+        return statistics.median(self.gaps)
+
+    def next_delay(self, now, interval):
+        """Seconds from `now` (wall clock) until the next poll, at most the engine `interval`."""
+        delay = interval
+        period = self.period
+        if period is not None:
+            until = self.last_updated + period - now
+            if until > DENSE_POLL:
+                delay = min(until, interval)
+            elif until > -period / 2:
+                delay = min(DENSE_POLL, interval)
+        delay = delay * random.uniform(1 - JITTER, 1 + JITTER)
+        return min(interval, max(delay, self.fresh_until - now))
+
+
+class SourceState:
+    """Polling state for one feed: conditional GET cache, schedule and backoff."""
+
+    def __init__(self, index, source, fetcher):
+        self.index = index
+        self.source = source
+        self.fetcher = fetcher
+        self.next_due = 0.0
+        self.failures = 0
+        self.in_flight = False
+        self.last_polled = None
+        self.interval = None  # overrides the engine interval, e.g. while a warning is active
+        self.cadence = FeedCadence()
+        self.recent = deque()  # monotonic times of this feed's polls within RATE_WINDOW
+
+
+class PollingEngine:
+    """Poll many feeds concurrently from one scheduler thread.
+
+    Feeds are kept in a heap ordered by their next due time. When a feed is
+    due, the scheduler hands it to a small thread pool that shares the
+    pooled HTTP session. Start times are spread evenly over the interval,
+    with jitter, so N feeds never fire at once. A feed that fails backs off
+    exponentially, with jitter, without affecting the others. With
+    `adaptive` on, each feed's next poll follows its learned FeedCadence
+    instead of the fixed interval. Each result is passed to
+    `deliver(index, result, error)` on the worker thread.
+    """
+
+    def __init__(self, sources, networking, parse, deliver, interval, max_workers=DEFAULT_WORKERS, adaptive=False):
+        self.sources = sources
+        self.deliver = deliver
+        self.interval = interval
+        self.adaptive = adaptive
+        self.states = [SourceState(index, source, ConditionalFetcher(networking, parse))
+                       for index, source in enumerate(sources)]
+        self.executor = ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(sources))),
+                                           thread_name_prefix="weatherpeg-poll")
+        self._heap = []
+        self._cond = threading.Condition()
+        self._thread = None
+        self._stopped = False
+        self._polls = 0
+        self._recent = deque()  # monotonic times of polls within RATE_WINDOW
+
+    @property
+    def started(self):
+        """Whether `start` has been called."""
+        return self._thread is not None
+
+    def start(self):
+        """Schedule every feed and start the scheduler thread."""
+        if self._thread is not None:
+            return
+        now = time.monotonic()
+        count = len(self.states)
+        with self._cond:
+            for state in self.states:
+                # the first feed is polled right away, the rest are staggered over one interval
+                offset = 0.0
+                if state.index:
+                    offset = (state.index + random.uniform(-0.5, 0.5)) * self.interval / count
+                state.next_due = now + offset
+                heapq.heappush(self._heap, (state.next_due, state.index))
+        self._thread = threading.Thread(target=self._run, name="weatherpeg-scheduler", daemon=True)
+        self._thread.start()
+
+    def refresh(self, index=None):
+        """Poll one feed (or all feeds) as soon as possible."""
+        now = time.monotonic()
+        with self._cond:
+            targets = self.states if index is None else [self.states[index]]
+            for state in targets:
+                state.next_due = now
+                heapq.heappush(self._heap, (now, state.index))
+            self._cond.notify()
+
+    def set_interval(self, interval):
+        """Change the poll interval and reschedule feeds from their last poll."""
+        with self._cond:
+            self.interval = interval
+            for state in self.states:
+                if state.interval is None and state.last_polled is not None and not state.failures \
+                        and not state.in_flight:
+                    self._schedule(state)
+            self._cond.notify()
+
+    def set_adaptive(self, adaptive):
+        """Turn cadence-following on or off and reschedule."""
+        with self._cond:
+            self.adaptive = adaptive
+        self.set_interval(self.interval)
+
+    def set_source_interval(self, index, interval):
+        """Poll feed `index` every `interval` seconds instead of the engine interval (None to reset)."""
+        with self._cond:
+            state = self.states[index]
+            if state.interval == interval:
+                return
+            state.interval = interval
+            if state.last_polled is not None and not state.failures and not state.in_flight:
+                self._schedule(state)
+            self._cond.notify()
+
+    def stop(self):
+        """Stop scheduling new polls."""
+        with self._cond:
+            self._stopped = True
+            self._cond.notify()
+        self.executor.shutdown(wait=False)
+
+    def stats(self):
+        """Return poll counts, the polling rate over the last hour and each feed's schedule."""
+        now = time.monotonic()
+        wall = time.time()
+        with self._cond:
+            self._trim(now)
+            sources = []
+            for state in self.states:
+                self._trim_source(state, now)
+                cadence = state.cadence
+                sources.append({
+                    "url": state.source.url,
+                    "polls_last_hour": len(state.recent),
+                    "next_poll_s": round(max(0.0, state.next_due - now), 1),
+                    "failures": state.failures,
+                    "upstream_period_s": cadence.period,
+                    "upstream_age_s": None if cadence.last_updated is None
+                    else round(wall - cadence.last_updated, 1),
+                })
+            return {
+                "feeds": len(self.states),
+                "interval_s": self.interval,
+                "in_flight": sum(state.in_flight for state in self.states),
+                "backing_off": sum(bool(state.failures) for state in self.states),
+                "tightened": sum(state.interval is not None for state in self.states),
+                "polls": self._polls,
+                "polls_last_hour": len(self._recent),
+                "heap_entries": len(self._heap),
+                "adaptive": self.adaptive,
+                "sources": sources,
+            }
+
+    def _trim(self, now):
+        while self._recent and self._recent[0] < now - RATE_WINDOW:
+            self._recent.popleft()
+
+    @staticmethod
+    def _trim_source(state, now):
+        while state.recent and state.recent[0] < now - RATE_WINDOW:
+            state.recent.popleft()
+
+    def _schedule(self, state):
+        """Set the next poll after a successful one. Call with the condition held."""
+        if state.interval is not None or not self.adaptive:
+            state.next_due = state.last_polled + (state.interval or self.interval)
+        else:
+            # the cadence delay is measured from now; time since the last poll already counts
+            elapsed = time.monotonic() - state.last_polled
+            state.next_due = state.last_polled + max(elapsed, state.cadence.next_delay(time.time(), self.interval))
+        heapq.heappush(self._heap, (state.next_due, state.index))
+
+    def _run(self):
+        with self._cond:
+            while not self._stopped:
+                if not self._heap:
+                    self._cond.wait()
+                    continue
+                due, index = self._heap[0]
+                state = self.states[index]
+                if due != state.next_due:
+                    heapq.heappop(self._heap)  # stale entry left behind by a reschedule
+                    continue
+                delay = due - time.monotonic()
+                if delay > 0:
+                    self._cond.wait(delay)
+                    continue
+                heapq.heappop(self._heap)
+                if state.in_flight:
+                    continue  # _poll reschedules it when the running poll finishes
+                state.in_flight = True
+                try:
+                    self.executor.submit(self._poll, state)
+                except RuntimeError:
+                    break  # executor shut down, interpreter is exiting
+
+    def _poll(self, state):
+        if state.failures:
+            POLL_RETRIES.inc()
+        try:
+            result, error = state.fetcher.fetch(state.source.url), None
+        except Exception as e:
+            result, error = None, e
+        now = time.monotonic()
+        with self._cond:
+            state.in_flight = False
+            state.last_polled = now
+            self._polls += 1
+            self._recent.append(now)
+            self._trim(now)
+            state.recent.append(now)
+            self._trim_source(state, now)
+            if error is None:
+                state.failures = 0
+                state.cadence.observe(result.updated, result.max_age, time.time())
+                self._schedule(state)
+            else:
+                state.failures += 1
+                POLL_FAILURES.inc()
+                backoff = min(MAX_BACKOFF, BACKOFF_BASE * 2 ** (state.failures - 1))
+                state.next_due = now + backoff * random.uniform(0.5, 1.0)
+                logging.warning(f"Polling {state.source.url} failed ({state.failures} in a row), "
+                                f"retrying in {state.next_due - now:.0f}s: {error}")
+                heapq.heappush(self._heap, (state.next_due, state.index))
+            self._cond.notify()
+        try:
+            self.deliver(state.index, result, error)
+        except Exception:
+            logging.exception("Error delivering poll result")
+
+
+if __name__ == "__main__":
+    print("This is a module, and not meant to be run directly")
@@ -0,0 +1,137 @@
+"""
+On-demand sampling profiler for a running WeatherPeg.
+
+While running, a background thread reads the current stack of every
+other thread (Tk, web server, polling, radar) with sys._current_frames()
+every SAMPLE_INTERVAL. Nothing is traced between samples, so the app
+runs at normal speed apart from the sampling itself. After the requested
+number of seconds, or on `stop`, the counts are written to
+profiles/weatherpeg-<time>.collapsed in the collapsed-stack format
+("thread;outer;...;inner count" per line), which flamegraph.pl and
+https://www.speedscope.app read directly.
+
+Started and stopped with "profile start [seconds]" / "profile stop" in
+the command window, or /profile/start?seconds=N and /profile/stop on the
+web server (localhost only, and not with web_mode: process).
+"""
+
+import datetime
+import logging
+import os
+import sys
+import threading
+import time
+from collections import Counter
+
+PROFILE_DIR = "profiles"
+SAMPLE_INTERVAL = 0.01  # seconds between samples (100 Hz)
+DEFAULT_SECONDS = 30
+MAX_SECONDS = 600
+
+
+def _frame_label(frame):
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class SamplingProfiler:
+    """Samples every thread's stack for a while and writes collapsed stacks to `directory`."""
+
+    def __init__(self, directory=PROFILE_DIR, interval=SAMPLE_INTERVAL):
+        self.directory = directory
+        self.interval = interval
+        self.last_path = None
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stop = threading.Event()
+        self._stacks = Counter()
+        self._samples = 0
+        self._deadline = 0.0
+
+    @property
+    def running(self):
+        """Whether a profile is being taken right now."""
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, seconds=DEFAULT_SECONDS):
+        """Start sampling for `seconds` (capped at MAX_SECONDS). Returns False if already running."""
+        with self._lock:
+            if self.running:
+                return False
+            seconds = max(1.0, min(float(seconds), MAX_SECONDS))
+            self._stacks = Counter()
+            self._samples = 0
+            self._stop.clear()
+            self._deadline = time.monotonic() + seconds
+            self._thread = threading.Thread(target=self._run, name="weatherpeg-profiler", daemon=True)
+            self._thread.start()
+        logging.info(f"Profiling every thread for {seconds:.0f}s")
+        return True
+
+    def stop(self):
+        """Stop sampling early and return the path of the written profile, or None if none was running."""
+        with self._lock:
+            thread = self._thread
+            if thread is None or not thread.is_alive():
+                return None
+            self._stop.set()
+        thread.join()
+        return self.last_path
+
+    def status(self):
+        """Whether a profile is running, its progress and the last file written."""
+        running = self.running
+        return {
+            "running": running,
+            "seconds_left": round(max(0.0, self._deadline - time.monotonic()), 1) if running else 0,
+            "samples": self._samples,
+            "last_path": self.last_path,
+        }
+
+    def _run(self):
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval) and time.monotonic() < self._deadline:
+            self._sample(own)
+        try:
+            self.last_path = self._write()
+            logging.info(f"Profile of {self._samples} samples written to {self.last_path}")
+        except OSError as e:
+            logging.error(f"Could not write the profile: {e}")
+
+    def _sample(self, own):
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        for ident, frame in sys._current_frames().items():
+            if ident == own:
+                continue
+            stack = []
+            while frame is not None:
+                stack.append(_frame_label(frame))
+                frame = frame.f_back
+            stack.append(names.get(ident, f"thread-{ident}"))
+            self._stacks[";".join(reversed(stack))] += 1
+        self._samples += 1
+
+    def _write(self):
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, f"weatherpeg-{datetime.datetime.now():%Y%m%d-%H%M%S}.collapsed")
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, count in sorted(self._stacks.items()):
+                f.write(f"{stack} {count}\n")
+        return path
+
+
+_PROFILER = None
+_PROFILER_LOCK = threading.Lock()
+
+
+def get_profiler():
+    """The process-wide SamplingProfiler, shared by the command window and the web server."""
+    global _PROFILER
+    with _PROFILER_LOCK:
+        if _PROFILER is None:
+            _PROFILER = SamplingProfiler()
+        return _PROFILER
+
+
+if __name__ == "__main__":
+    print("This is a module, and not meant to be run directly")
@@ -1,74 +1,322 @@
 import os
 import asyncio
+import hashlib
 import threading
 import logging
+import time
+from collections import OrderedDict
 from env_canada import ECRadar
-from PIL import Image
+import metrics_helper
 import source_helper
+import radar_window
+from config import Config
 
+RADAR_CACHE_DIR = "images/radar_cache"
+RADAR_FRAME_SECONDS = 360  # new radar composites are published every 6 minutes
+FRAME_TIME_TTL = 60  # seconds the newest observation time is trusted before asking again
+DEFAULT_CACHE_MB = 50
+DEFAULT_LOOP_FRAMES = 12  # frames in a radar loop, also what the prefetcher keeps cached; 0 for all
+MEMORY_ITEMS = 8  # most recently used images also kept in memory
 
-async def fetch_radar(root_window=None, status_var=None):
-    """Fetch the latest radar image and save it with a unique filename.
+FETCH_SECONDS = metrics_helper.timer("weatherpeg_radar_fetch_seconds", "Downloading a radar frame or loop")
+CACHE_HITS = metrics_helper.counter("weatherpeg_radar_cache_hits_total", "Radar requests served from the cache")
 
-    Optional `root_window` and `status_var` are used to update UI status
-    without blocking the main thread.
+_RADARS = {}
+_RADARS_LOCK = threading.Lock()
+_FRAME_TIMES = {}  # coordinates -> (time.monotonic() checked, newest observation), radar loop thread only
+_PROBES = {}  # coordinates -> ECRadar used only to ask for the newest time, radar loop thread only
+
+
+def get_radar(coordinates):
+    """Return the shared ECRadar for `coordinates`, so its basemap and legend are downloaded once.
+
+    Loops are radar_loop_frames frames long.
     """
-    try:
-        if status_var is not None and root_window is not None:
-            root_window.after(0, lambda: status_var.set("Fetching radar image..."))
+    with _RADARS_LOCK:
+        radar = _RADARS.get(coordinates)
+        if radar is None:
+            frames = int(Config.get_config_value(None, key="radar_loop_frames", default=DEFAULT_LOOP_FRAMES))
+            # ECRadar counts back loop_minutes from the newest frame; 0 means every frame it has
+            loop_minutes = max(1, (frames - 1) * RADAR_FRAME_SECONDS // 60) if frames > 0 else 0
+            radar = ECRadar(coordinates=coordinates, loop_minutes=loop_minutes)
+            _RADARS[coordinates] = radar
+        return radar
+
+
+async def latest_frame_time(coordinates):
+    """ISO time of the newest radar observation for `coordinates`, as the radar server reports it."""
+    checked = _FRAME_TIMES.get(coordinates)
+    if checked is not None and time.monotonic() - checked[0] < FRAME_TIME_TTL:
+        return checked[1]
+    # The time-range query is one small request, no images. It resets the loop state of the
+    # ECRadar it runs on, so it runs on a probe that never renders, not on the shared get_radar one.
+    probe = _PROBES.get(coordinates)
+    if probe is None:
+        probe = _PROBES[coordinates] = ECRadar(coordinates=coordinates)
+    if not await probe._get_dimensions() or probe.timestamp is None:
+        raise RuntimeError("the radar server reported no observation times")
+    frame_time = probe.timestamp
+    _FRAME_TIMES[coordinates] = (time.monotonic(), frame_time)
+    return frame_time
+
+
+def frame_key(kind, coordinates, frame_time):
+    """Cache key for the radar frame (or loop ending with the frame) observed at `frame_time`."""
+    return (kind, coordinates, frame_time)
+
+
+class RadarCache:
+    """Radar images on disk, keyed by observation time and deduplicated by content hash.
+
+    Files are named after the sha256 of their bytes, so identical frames are
+    stored once. When the directory grows past `max_bytes`, the least
+    recently used files are deleted.
+    """
+
+    def __init__(self, directory=RADAR_CACHE_DIR, max_bytes=DEFAULT_CACHE_MB * 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._keys = {}  # frame key -> content hash
+        self._files = OrderedDict()  # content hash -> (path, size), least recently used first
+        self._memory = OrderedDict()  # content hash -> bytes of the most recently used images
+        os.makedirs(directory, exist_ok=True)
+        existing = []
+        for name in os.listdir(directory):
+            path = os.path.join(directory, name)
+            if os.path.isfile(path):
+                existing.append((os.path.getmtime(path), os.path.splitext(name)[0], path))
+        for _, content_hash, path in sorted(existing):
+            self._files[content_hash] = (path, os.path.getsize(path))
+        self._total = sum(size for _, size in self._files.values())
 
-        radar = ECRadar(coordinates=source_helper.COORDINATES)
-        latest_png = await radar.get_latest_frame()
+    def get(self, key):
+        """Return (content hash, bytes) cached for `key`, or None."""
+        with self._lock:
+            content_hash = self._keys.get(key)
+            if content_hash is None or content_hash not in self._files:
+                return None
+            self._files.move_to_end(content_hash)
+            data = self._memory.get(content_hash)
+            if data is None:
+                with open(self._files[content_hash][0], "rb") as f:
+                    data = f.read()
+            self._remember(content_hash, data)
+            return content_hash, data
 
-        os.makedirs("images", exist_ok=True)
-        filename = "images/radar_img.png"
-        base, ext = os.path.splitext(filename)
-        counter = 1
-        new_filename = filename
+    def put(self, key, data, ext):
+        """Store `data` under `key` and return its content hash. Identical bytes share one file."""
+        content_hash = hashlib.sha256(data).hexdigest()
+        with self._lock:
+            if content_hash not in self._files:
+                path = os.path.join(self.directory, content_hash + ext)
+                with open(path, "wb") as f:
+                    f.write(data)
+                self._files[content_hash] = (path, len(data))
+                self._total += len(data)
+            self._files.move_to_end(content_hash)
+            self._keys[key] = content_hash
+            self._remember(content_hash, data)
+            self._evict()
+            return content_hash
 
-        # Find a unique filename
-        while os.path.exists(new_filename):
-            new_filename = f"{base}_{counter}{ext}"
-            counter += 1
+    def _remember(self, content_hash, data):
+        self._memory[content_hash] = data
+        self._memory.move_to_end(content_hash)
+        while len(self._memory) > MEMORY_ITEMS:
+            self._memory.popitem(last=False)
 
-        # Write the radar image
-        with open(new_filename, "wb") as f:
-            f.write(latest_png)
+    def _evict(self):
+        # never evict the newest file, even if it alone exceeds the budget
+        while self._total > self.max_bytes and len(self._files) > 1:
+            content_hash, (path, size) = self._files.popitem(last=False)
+            self._memory.pop(content_hash, None)
+            self._total -= size
+            try:
+                os.remove(path)
+            except OSError:
+                logging.warning(f"Could not remove cached radar image {path}")
+        live = set(self._files)
+        for key in [key for key, content_hash in self._keys.items() if content_hash not in live]:
+            del self._keys[key]
 
-        if status_var is not None and root_window is not None:
-            root_window.after(0, lambda: status_var.set("Radar image fetched successfully."))
-            root_window.after(2000, lambda: status_var.set(""))
 
+_DOWNLOADS = {}  # frame key -> running download task, only touched on the radar loop thread
+_CACHE = None
+_CACHE_LOCK = threading.Lock()
 
-        return new_filename
+
+def get_cache():
+    """Return the process-wide radar cache, sized from radar_cache_mb in the config."""
+    global _CACHE
+    with _CACHE_LOCK:
+        if _CACHE is None:
+            cache_mb = Config.get_config_value(None, key="radar_cache_mb", default=DEFAULT_CACHE_MB)
+            _CACHE = RadarCache(max_bytes=int(cache_mb * 1024 * 1024))
+        return _CACHE
+
+
+async def fetch_radar(coordinates=None, loop=False, status=None):
+    """Return (content hash, bytes) of the current radar frame or loop, downloading it only if not cached.
+
+    Progress is reported through the optional `status(text, clear_ms=None)`,
+    which must be safe to call from the radar loop thread.
+    """
+    try:
+        coordinates = coordinates or source_helper.default_coordinates()
+        key = frame_key("loop" if loop else "frame", coordinates, await latest_frame_time(coordinates))
+        cache = get_cache()
+        cached = cache.get(key)
+        if cached is not None:
+            logging.info(f"Radar cache hit {key}")
+            CACHE_HITS.inc()
+            return cached
+
+        if status is not None:
+            status("Fetching radar image...")
+
+        # a download for the same frame may already be running, e.g. from the prefetcher
+        download = _DOWNLOADS.get(key)
+        if download is None:
+            radar = get_radar(coordinates)
+            download = asyncio.ensure_future(radar.get_loop() if loop else radar.get_latest_frame())
+            _DOWNLOADS[key] = download
+            download.add_done_callback(lambda _, key=key: _DOWNLOADS.pop(key, None))
+        started = time.perf_counter()
+        data = await asyncio.shield(download)
+        FETCH_SECONDS.since(started)
+        content_hash = cache.put(key, data, ".gif" if loop else ".png")
+
+        if status is not None:
+            status("Radar image fetched successfully.", clear_ms=2000)
+
+        return content_hash, data
     except Exception:
         logging.exception("Error in fetch_radar")
         raise
 
 
-def open_radar(root_window=None, status_var=None, event=None):
-    """Open the latest radar image without blocking the Tk mainloop.
+async def prefetch_radar(coordinates=None):
+    """Download the current frame and loop into the cache if they are not there yet."""
+    await fetch_radar(coordinates=coordinates)
+    await fetch_radar(coordinates=coordinates, loop=True)
+
+
+class RadarLoop:
+    """One long-lived asyncio event loop thread that runs every radar request.
 
-    If `event` is a Tk event, this function will try to extract the
-    top-level root from `event.widget` to optionally update a status
-    variable inside the async fetch.
+    Requests are submitted with `run_coroutine_threadsafe`. A request for a
+    key that is already being fetched returns the in-flight future instead
+    of starting a second download.
     """
 
-    def _fetch_and_show():
-        root_w = root_window
-        status_v = status_var
-        try:
-            if event is not None and hasattr(event, "widget"):
-                try:
-                    root_w = event.widget.winfo_toplevel()
-                except Exception:
-                    root_w = None
-
-            new_filename = asyncio.run(fetch_radar(root_window=root_w, status_var=status_v))
-            if new_filename and os.path.exists(new_filename):
-                img = Image.open(new_filename)
-                img.show()
-        except Exception:
-            logging.exception("Failed to fetch or show radar image")
-
-    threading.Thread(target=_fetch_and_show, daemon=True).start()
+    def __init__(self):
+        self.loop = None
+        self.startup_ms = None
+        self._thread = None
+        self._lock = threading.Lock()
+        self._in_flight = {}
+
+    def _ensure_started(self):
+        if self._thread is not None:
+            return
+        started = time.perf_counter()
+        ready = threading.Event()
+
+        def _run():
+            self.loop = asyncio.new_event_loop()
+            asyncio.set_event_loop(self.loop)
+            ready.set()
+            self.loop.run_forever()
+
+        self._thread = threading.Thread(target=_run, name="weatherpeg-radar-loop", daemon=True)
+        self._thread.start()
+        ready.wait()
+        self.startup_ms = (time.perf_counter() - started) * 1000
+        logging.info(f"Radar event loop started in {self.startup_ms:.1f}ms")
+
+    def submit(self, key, coro_factory):
+        """Run `coro_factory()` on the loop, or join the request already running for `key`."""
+        with self._lock:
+            self._ensure_started()
+            future = self._in_flight.get(key)
+            if future is not None and not future.done():
+                logging.info(f"Joining in-flight radar request {key}")
+                return future
+            future = asyncio.run_coroutine_threadsafe(coro_factory(), self.loop)
+            self._in_flight[key] = future
+            future.add_done_callback(lambda done, key=key: self._forget(key, done))
+            return future
+
+    def _forget(self, key, future):
+        with self._lock:
+            if self._in_flight.get(key) is future:
+                del self._in_flight[key]
+
+
+RADAR_LOOP = RadarLoop()
+
+
+def start_prefetch(coordinates_provider=None):
+    """Keep the latest frame and loop cached in the background when radar_prefetch is on.
+
+    `coordinates_provider` is asked before every round, so the prefetcher
+    follows the location on screen.
+    """
+    if not Config.get_config_bool(None, key="radar_prefetch"):
+        return
+
+    def _prefetch_forever():
+        while True:
+            coordinates = coordinates_provider() if coordinates_provider is not None else None
+            try:
+                RADAR_LOOP.submit(("prefetch", coordinates), lambda: prefetch_radar(coordinates)).result()
+            except Exception:
+                logging.exception("Radar prefetch failed")
+            # wake just after the next frame should have been published
+            time.sleep(RADAR_FRAME_SECONDS - time.time() % RADAR_FRAME_SECONDS + 5)
+
+    threading.Thread(target=_prefetch_forever, name="weatherpeg-radar-prefetch", daemon=True).start()
+
+
+async def _fetch_and_show(gui, status, coordinates, loop):
+    started = time.perf_counter()
+    content_hash, data = await fetch_radar(coordinates=coordinates, loop=loop, status=status)
+    fetched = time.perf_counter()
+    await asyncio.get_running_loop().run_in_executor(None, radar_window.decode_radar, content_hash, data)
+    decoded = time.perf_counter()
+    logging.info(
+        f"Radar timing: loop startup {RADAR_LOOP.startup_ms:.1f}ms (once), "
+        f"fetch {(fetched - started) * 1000:.1f}ms, decode {(decoded - fetched) * 1000:.1f}ms"
+    )
+    gui.weather_fetcher.fetch_worker.call_soon(radar_window.show_radar, gui, content_hash, data)
+
+
+def _show_status(gui, text, clear_ms=None):
+    """Set the GUI status line, clearing it after `clear_ms`. Call on the Tk thread."""
+    gui.status_var.set(text)
+    if clear_ms is not None:
+        gui.timers.once("status_clear", clear_ms, lambda: gui.status_var.set(""))
+
+
+def open_radar(gui, coordinates=None, loop=False):
+    """Show the latest radar image in the radar window without blocking the Tk mainloop. Call on the Tk thread.
+
+    Status updates and the finished image reach the Tk thread through the
+    GUI's FetchWorker queue. Repeated presses while a fetch is running
+    share that fetch.
+    """
+    worker = gui.weather_fetcher.fetch_worker
+
+    def status(text, clear_ms=None):
+        worker.call_soon(_show_status, gui, text, clear_ms)
+
+    key = ("show", "loop" if loop else "frame", coordinates or source_helper.default_coordinates())
+    future = RADAR_LOOP.submit(key, lambda: _fetch_and_show(gui, status, coordinates, loop))
+
+    def _log_failure(done):
+        if not done.cancelled() and done.exception() is not None:
+            logging.error("Failed to fetch or show radar image", exc_info=done.exception())
+            status("Radar image could not be fetched.")
+
+    future.add_done_callback(_log_failure)
@@ -0,0 +1,194 @@
+"""
+Radar viewer that renders inside WeatherPeg instead of an external image viewer.
+
+Images arrive as bytes and are decoded in memory with PIL. Decoding and
+scaling to the window size run on a worker thread, whose results come back
+through the GUI's FetchWorker queue; the Tk thread only turns each scaled
+frame into a PhotoImage the first time it is shown. Animation and resize
+timers run on the GUI's TimerRegistry.
+Decoded frames are kept per image, up to MAX_DECODED_MB, and scaled frames
+per (image, window size), so showing the same image again, or resizing
+back to a previous size, does not decode or resize again.
+"""
+
+import io
+import logging
+import threading
+import tkinter as tk
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from PIL import Image, ImageSequence, ImageTk
+
+MAX_DECODED_MB = 64  # decoded RGBA frames kept, shared by every window
+MAX_RENDERED = 16  # (image, size) pairs whose scaled frames are kept per window
+DEFAULT_FRAME_MS = 200
+RESIZE_DEBOUNCE_MS = 100
+
+_DECODED = OrderedDict()  # content hash -> [(PIL frame, duration ms)], shared by every window
+_DECODED_BYTES = {}  # content hash -> bytes held by its decoded frames
+_DECODED_LOCK = threading.Lock()
+_FIT_EXECUTOR = ThreadPoolExecutor(max_workers=1, thread_name_prefix="weatherpeg-radar-fit")
+
+
+def decode_radar(content_hash, data):
+    """Decode PNG/GIF bytes into PIL frames and cache them. Safe to call off the Tk thread."""
+    with _DECODED_LOCK:
+        frames = _DECODED.get(content_hash)
+        if frames is not None:
+            _DECODED.move_to_end(content_hash)
+            return frames
+    image = Image.open(io.BytesIO(data))
+    frames = [(frame.convert("RGBA"), frame.info.get("duration") or DEFAULT_FRAME_MS)
+              for frame in ImageSequence.Iterator(image)]
+    with _DECODED_LOCK:
+        _DECODED[content_hash] = frames
+        _DECODED_BYTES[content_hash] = sum(frame.width * frame.height * 4 for frame, _ in frames)
+        # always keep the image just decoded, even if it alone is over the limit
+        while len(_DECODED) > 1 and sum(_DECODED_BYTES.values()) > MAX_DECODED_MB * 1024 * 1024:
+            evicted, _ = _DECODED.popitem(last=False)
+            del _DECODED_BYTES[evicted]
+    return frames
+
+
+def fit_radar(content_hash, data, size):
+    """Decode the image and scale its frames to fit `size`, keeping the aspect ratio. Safe off the Tk thread.
+
+    Returns [[scaled PIL frame, duration ms, None]]; the None is filled with
+    the PhotoImage when the frame is first shown.
+    """
+    width, height = size
+    fitted = []
+    for image, duration in decode_radar(content_hash, data):
+        scale = min(width / image.width, height / image.height)
+        frame_size = (max(1, int(image.width * scale)), max(1, int(image.height * scale)))
+        if frame_size != image.size:
+            image = image.resize(frame_size, Image.Resampling.LANCZOS)
+        fitted.append([image, duration, None])
+    return fitted
+
+
+class RadarWindow:
+    """A Toplevel that shows a radar frame or animates a radar loop."""
+
+    def __init__(self, gui):
+        self.gui = gui
+        self.window = tk.Toplevel(gui.root)
+        self.window.title("WeatherPeg Radar")
+        self.window.configure(bg="black")
+        self.window.geometry("600x600")
+        self.label = tk.Label(self.window, bg="black")
+        self.label.pack(fill=tk.BOTH, expand=True)
+        self.window.bind("<Configure>", self._on_configure)
+        self.window.bind("<Escape>", lambda event=None: self.window.destroy())
+        self.window.bind("<Destroy>", self._on_destroy)
+        # timers named after the window, cancelled when it is destroyed
+        self.frame_timer = f"radar_frame{self.window}"
+        self.resize_timer = f"radar_resize{self.window}"
+
+        self._rendered = OrderedDict()  # (content hash, width, height) -> fit_radar() frames
+        self.content_hash = None
+        self._data = None
+        self._wanted = None  # key of the frames being scaled on the worker thread
+        self._frames = []
+        self._frame_index = 0
+        self._size = None
+
+    def exists(self):
+        """Return True while the window is open."""
+        try:
+            return bool(self.window.winfo_exists())
+        except tk.TclError:
+            return False
+
+    def show(self, content_hash, data):
+        """Display the image `data` (PNG or GIF bytes) identified by `content_hash`."""
+        self.content_hash = content_hash
+        self._data = data
+        self.window.deiconify()
+        self.window.lift()
+        self._render()
+
+    def _target_size(self):
+        width = max(self.label.winfo_width(), 1)
+        height = max(self.label.winfo_height(), 1)
+        if width <= 1 or height <= 1:
+            # not laid out yet, use the requested geometry
+            width, height = 600, 600
+        return width, height
+
+    def _render(self):
+        if self.content_hash is None:
+            return
+        size = self._target_size()
+        key = (self.content_hash, *size)
+        self._size = size
+        if key in self._rendered:
+            self._rendered.move_to_end(key)
+            self._play(self._rendered[key])
+            return
+        # the current image keeps playing until the scaled frames arrive
+        self._wanted = key
+        future = _FIT_EXECUTOR.submit(fit_radar, self.content_hash, self._data, size)
+        worker = self.gui.weather_fetcher.fetch_worker
+        future.add_done_callback(lambda done: worker.call_soon(self._fitted, key, done))
+
+    def _fitted(self, key, future):
+        if future.exception() is not None:
+            logging.error("Could not decode the radar image", exc_info=future.exception())
+            return
+        self._rendered[key] = future.result()
+        while len(self._rendered) > MAX_RENDERED:
+            self._rendered.popitem(last=False)
+        if key == self._wanted and self.exists():
+            self._play(self._rendered[key])
+
+    def _play(self, frames):
+        self._wanted = None
+        self._frames = frames
+        self._frame_index = 0
+        self.gui.timers.cancel(self.frame_timer)
+        self._show_frame()
+
+    def _show_frame(self):
+        if not self._frames or not self.exists():
+            return
+        frame = self._frames[self._frame_index]
+        if frame[2] is None:
+            frame[2] = ImageTk.PhotoImage(frame[0], master=self.window)
+            frame[0] = None  # only the PhotoImage is needed from now on
+        photo, duration = frame[2], frame[1]
+        self.label.config(image=photo)
+        if len(self._frames) > 1:
+            self._frame_index = (self._frame_index + 1) % len(self._frames)
+            self.gui.timers.once(self.frame_timer, duration, self._show_frame)
+
+    def _on_configure(self, event):
+        if event.widget is not self.window:
+            return
+        # replacing the pending one-shot debounces a burst of Configure events
+        self.gui.timers.once(self.resize_timer, RESIZE_DEBOUNCE_MS, self._resize)
+
+    def _on_destroy(self, event):
+        if event.widget is self.window:
+            self.gui.timers.cancel(self.frame_timer)
+            self.gui.timers.cancel(self.resize_timer)
+
+    def _resize(self):
+        if self._target_size() != self._size:
+            self._render()
+
+
+_WINDOW = None
+
+
+def show_radar(gui, content_hash, data):
+    """Show radar bytes in the shared radar window, creating it if needed. Call on the Tk thread."""
+    global _WINDOW
+    if _WINDOW is None or not _WINDOW.exists():
+        _WINDOW = RadarWindow(gui)
+    _WINDOW.show(content_hash, data)
+
+
+if __name__ == "__main__":
+    print("This is a module, and not meant to be run directly")
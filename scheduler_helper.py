@@ -0,0 +1,82 @@
+import logging
+import threading
+import time
+
+DEBUG_LOG_INTERVAL = 15 * 60 * 1000  # ms between "active timers" log lines
+
+
+class TimerRegistry:
+    """Every Tk `after` timer the GUI runs, by name.
+
+    A name has at most one pending callback. Starting a chain or a one-shot
+    under a name that is already pending cancels the old one first, so
+    calling `every` twice never doubles a chain, and repeated one-shots such
+    as "clear the status line" simply push the deadline back. Call only on
+    the Tk thread. `active` may be read from any thread.
+    """
+
+    def __init__(self, root):
+        self.root = root
+        self._lock = threading.Lock()
+        self._timers = {}  # name -> {"after_id", "interval_ms", "repeat", "runs", "started"}
+
+    def every(self, name, interval_ms, callback):
+        """Run `callback()` every `interval_ms`, replacing any timer called `name`."""
+        self._start(name, interval_ms, callback, repeat=True)
+
+    def once(self, name, delay_ms, callback):
+        """Run `callback()` once after `delay_ms`, replacing any timer called `name`."""
+        self._start(name, delay_ms, callback, repeat=False)
+
+    def cancel(self, name):
+        """Cancel the timer called `name`, if any."""
+        with self._lock:
+            timer = self._timers.pop(name, None)
+        if timer is not None:
+            self.root.after_cancel(timer["after_id"])
+
+    def active(self):
+        """Return {name: {interval_ms, repeat, runs, age_s}} for every pending timer."""
+        now = time.monotonic()
+        with self._lock:
+            return {name: {"interval_ms": timer["interval_ms"], "repeat": timer["repeat"],
+                           "runs": timer["runs"], "age_s": round(now - timer["started"], 1)}
+                    for name, timer in self._timers.items()}
+
+    def _start(self, name, interval_ms, callback, repeat):
+        self.cancel(name)
+        timer = {"after_id": None, "interval_ms": interval_ms, "repeat": repeat,
+                 "runs": 0, "started": time.monotonic()}
+        with self._lock:
+            self._timers[name] = timer
+        timer["after_id"] = self.root.after(interval_ms, lambda: self._fire(name, timer, callback))
+
+    def _fire(self, name, timer, callback):
+        with self._lock:
+            if self._timers.get(name) is not timer:
+                return  # replaced or cancelled after Tk had already queued it
+            timer["runs"] += 1
+            if not timer["repeat"]:
+                del self._timers[name]
+        try:
+            callback()
+        except Exception:
+            logging.exception(f"Error in timer {name}")
+        if timer["repeat"]:
+            with self._lock:
+                if self._timers.get(name) is not timer:
+                    return  # the callback replaced or cancelled its own chain
+            timer["after_id"] = self.root.after(timer["interval_ms"], lambda: self._fire(name, timer, callback))
+
+
+def schedule_report(timers, weather_fetcher):
+    """Active timer chains, polling rate and freshness lag, for the debug log line and /debug/schedule."""
+    return {
+        "timers": timers.active() if timers is not None else {},
+        "polling": weather_fetcher.engine.stats(),
+        "freshness_lag_s": {index: round(lag, 1) for index, lag in weather_fetcher.freshness_lag.items()},
+    }
+
+
+if __name__ == "__main__":
+    print("This is a module, and not meant to be run directly")
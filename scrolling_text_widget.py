@@ -5,8 +5,15 @@ A clean, maintainable implementation of scrolling text for WeatherPeg.
 Replaces the problematic ScrollingSummary class with a much better solution.
 """
 
+import logging
+import time
 import tkinter as tk
-from typing import Optional
+import tkinter.font as tkfont
+
+from metrics_helper import Timer
+
+LOOP_SEPARATOR = "   ***   "
+STATS_INTERVAL = 60.0  # seconds between frame-time log lines
 
 
 class ScrollingTextWidget:
@@ -21,17 +28,19 @@ class ScrollingTextWidget:
     - Thread-safe GUI updates
     """
 
-    def __init__(self, parent, text: str = "", width: int = 80, speed: int = 150):
+    def __init__(self, parent, timers, text: str = "", width: int = 80, speed: int = 150):
         """
         Initialize the scrolling text widget.
 
         Args:
             parent: Parent tkinter widget
+            timers: The GUI's TimerRegistry, which runs the scrolling and the flash
             text: Initial text to display
             width: Maximum width in characters
             speed: Scroll speed in milliseconds per character
         """
         self.parent = parent
+        self.timers = timers
         self.width = width
         self.speed = speed
         self.original_text = text
@@ -48,11 +57,14 @@ class ScrollingTextWidget:
             pady=10
         )
         self.label.pack()
+        # timers named after the label, cancelled when it is destroyed
+        self.timer_name = f"scroller{self.label}"
+        self.flash_timer_name = f"scroller_flash{self.label}"
+        self.label.bind("<Destroy>", lambda event: self._cancel_timers())
 
         # Scrolling state
         self.position = 0
         self.is_scrolling = False
-        self.after_id: Optional[str] = None
         self.scroll_id = 0
 
         # Update with initial text
@@ -69,10 +81,8 @@ class ScrollingTextWidget:
         self.scroll_id += 1
         self.is_scrolling = False
 
-        # Cancel any pending after callbacks
-        if self.after_id:
-            self.parent.after_cancel(self.after_id)
-            self.after_id = None
+        # Cancel any pending scroll step
+        self.timers.cancel(self.timer_name)
 
         self.original_text = new_text
         self.position = 0
@@ -90,14 +100,14 @@ class ScrollingTextWidget:
     def _scroll_text(self, scroll_id: int) -> None:
         """
         Internal method that handles the scrolling animation.
-        Uses tkinter's after() method for smooth GUI updates.
+        Each step schedules the next on the scroller's timer.
         """
         # Check if this scroll session is still valid
         if scroll_id != self.scroll_id or not self.is_scrolling or not self.original_text:
             return
 
         # Create extended text for smooth looping
-        extended_text = self.original_text + "   ***   "
+        extended_text = self.original_text + LOOP_SEPARATOR
 
         # Calculate visible portion
         start = self.position % len(extended_text)
@@ -110,29 +120,170 @@ class ScrollingTextWidget:
         self.position += 1
 
         # Schedule next update
-        self.after_id = self.parent.after(self.speed, lambda: self._scroll_text(scroll_id))
+        self.timers.once(self.timer_name, self.speed, lambda: self._scroll_text(scroll_id))
 
     def flash_black(self) -> None:
         """
         Flash the text black for refresh indication.
         """
         self.label.config(fg="black")
-        self.parent.after(750, lambda: self.label.config(fg="lime"))
+        self.timers.once(self.flash_timer_name, 750, lambda: self.label.config(fg="lime"))
 
     def stop_scrolling(self) -> None:
         """
         Stop the scrolling animation.
         """
         self.is_scrolling = False
-        if self.after_id:
-            self.parent.after_cancel(self.after_id)
-            self.after_id = None
+        self.timers.cancel(self.timer_name)
+
+    def _cancel_timers(self) -> None:
+        self.stop_scrolling()
+        self.timers.cancel(self.flash_timer_name)
+
+    def destroy(self) -> None:
+        """
+        Clean up resources when the widget is destroyed.
+        """
+        self.stop_scrolling()
+        self.label.destroy()
+
+
+class CanvasScrollingText:
+    """
+    Pixel-smooth scroller drawn on a Canvas.
+
+    The loop text is built once per `update_text` and drawn as two copies
+    side by side. Each frame only moves both items left with `canvas.move`,
+    so Tk never re-measures text or re-lays out a widget. The offset follows
+    the real elapsed time, so a late frame does not slow the text down.
+    Frames run on a TimerRegistry timer, which is cancelled when the canvas
+    is destroyed. Frame work time and frame interval are logged every
+    STATS_INTERVAL.
+    """
+
+    def __init__(self, parent, timers, text: str = "", width: int = 80, fps: int = 30, speed: int = 60):
+        """
+        Initialize the canvas scroller.
+
+        Args:
+            parent: Parent tkinter widget
+            timers: The GUI's TimerRegistry, which runs the frames
+            text: Initial text to display
+            width: Visible width in characters
+            fps: Target frames per second
+            speed: Scroll speed in pixels per second
+        """
+        self.parent = parent
+        self.timers = timers
+        self.width = width
+        self.fps = max(1, fps)
+        self.speed = speed
+        self.original_text = text
+        self.font = tkfont.Font(family="VCR OSD Mono", size=12)
+        self.canvas = tk.Canvas(
+            parent,
+            width=self.font.measure("0") * width,
+            height=self.font.metrics("linespace") + 20,
+            bg="black",
+            highlightthickness=0,
+        )
+        self.canvas.pack(padx=10)
+        # same attribute name as ScrollingTextWidget, so callers can pack either renderer
+        self.label = self.canvas
+        # timers named after the canvas, cancelled when it is destroyed
+        self.timer_name = f"scroller{self.canvas}"
+        self.flash_timer_name = f"scroller_flash{self.canvas}"
+        self.canvas.bind("<Destroy>", lambda event: self._cancel_timers())
+
+        self.loop_width = 0
+        self.offset = 0.0
+        self.last_frame = None
+        self.frame_work = Timer("Scroller frame work")
+        self.frame_interval = Timer("Scroller frame interval")
+        self.frames = 0
+        self.stats_started = time.perf_counter()
+
+        self.update_text(text)
+
+    def update_text(self, new_text: str) -> None:
+        """
+        Replace the text. The loop text and its width are computed here, once.
+
+        Args:
+            new_text: New text to display
+        """
+        self.stop_scrolling()
+        self.original_text = new_text
+        self.canvas.delete("scroll")
+        y = int(self.canvas["height"]) // 2
+        view_width = int(self.canvas["width"])
+        if self.font.measure(new_text) <= view_width:
+            self.canvas.create_text(0, y, text=new_text, anchor="w", fill="lime",
+                                    font=self.font, tags=("scroll",))
+            return
+
+        loop_text = new_text + LOOP_SEPARATOR
+        self.loop_width = self.font.measure(loop_text)
+        for x in (0, self.loop_width):
+            self.canvas.create_text(x, y, text=loop_text, anchor="w", fill="lime",
+                                    font=self.font, tags=("scroll",))
+        self.offset = 0.0
+        self.last_frame = time.perf_counter()
+        self.timers.every(self.timer_name, max(1, 1000 // self.fps), self._frame)
+
+    def _frame(self) -> None:
+        started = time.perf_counter()
+        self.frame_interval.record(started - self.last_frame)
+        # move by whole pixels and keep the remainder, so the speed stays exact
+        step = self.speed * (started - self.last_frame)
+        self.last_frame = started
+        new_offset = self.offset + step
+        dx = int(new_offset) - int(self.offset)
+        self.offset = new_offset
+        if self.offset >= self.loop_width:
+            # the first copy has scrolled out of view: jump back one loop, which looks identical
+            self.offset -= self.loop_width
+            dx -= self.loop_width
+        if dx:
+            self.canvas.move("scroll", -dx, 0)
+
+        self.frames += 1
+        self.frame_work.since(started)
+        if started - self.stats_started >= STATS_INTERVAL:
+            self._log_stats(started)
+
+    def _log_stats(self, now: float) -> None:
+        fps = self.frames / (now - self.stats_started)
+        logging.info(f"Scroller {fps:.1f} fps (target {self.fps}); "
+                     f"{self.frame_work.summary()}; {self.frame_interval.summary()}")
+        self.frames = 0
+        self.stats_started = now
+        self.frame_work = Timer("Scroller frame work")
+        self.frame_interval = Timer("Scroller frame interval")
+
+    def flash_black(self) -> None:
+        """
+        Flash the text black for refresh indication.
+        """
+        self.canvas.itemconfigure("scroll", fill="black")
+        self.timers.once(self.flash_timer_name, 750, lambda: self.canvas.itemconfigure("scroll", fill="lime"))
+
+    def stop_scrolling(self) -> None:
+        """
+        Stop the scrolling animation.
+        """
+        self.timers.cancel(self.timer_name)
+
+    def _cancel_timers(self) -> None:
+        self.stop_scrolling()
+        self.timers.cancel(self.flash_timer_name)
 
     def destroy(self) -> None:
         """
         Clean up resources when the widget is destroyed.
         """
         self.stop_scrolling()
+        self.canvas.destroy()
 
 
 # Backward compatibility alias
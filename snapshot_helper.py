@@ -0,0 +1,139 @@
+"""
+Last-known-good weather snapshot.
+
+After every successful refresh the weather on display is written to
+history/last_good.json. On the next start it is loaded before the first
+poll, so the window and /weather show real (if old) data straight away
+instead of "Loading weather data...", and keep showing it while the feed
+is unreachable. Loaded data is marked stale until a fresh poll replaces it.
+
+The file is replaced atomically: written to a temporary file in the same
+directory, flushed to disk, then renamed over the old one, so a crash or
+power cut mid-write leaves the previous snapshot intact.
+"""
+
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+
+SNAPSHOT_PATH = "history/last_good.json"
+SNAPSHOT_FORMAT = 1
+SAVE_INTERVAL = 30.0  # seconds; at most one write per interval, always of the newest snapshot
+
+# state fields worth keeping; everything else is rebuilt at runtime
+PERSISTED_FIELDS = (
+    "title", "summary", "link", "warning_title", "warning_summary",
+    "conditions", "alerts", "forecast", "location", "last_updated", "fetched_at",
+)
+
+
+def save_snapshot(snapshot, source, path=SNAPSHOT_PATH):
+    """Atomically write the persisted fields of a state snapshot, fetched from feed `source`."""
+    data = {key: snapshot.get(key) for key in PERSISTED_FIELDS}
+    data["source"] = source
+    data["format"] = SNAPSHOT_FORMAT
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(prefix=".last_good-", suffix=".tmp", dir=directory)
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, path)
+    except BaseException:
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+        raise
+
+
+class SnapshotWriter:
+    """Saves snapshots on a background thread, at most once per `interval`.
+
+    `submit` only records the newest snapshot, so callers on the Tk thread
+    never wait for the disk, and a burst of updates is one write.
+    """
+
+    def __init__(self, path=SNAPSHOT_PATH, interval=SAVE_INTERVAL):
+        self.path = path
+        self.interval = interval
+        self._cond = threading.Condition()
+        self._pending = None  # (snapshot, source) not written yet
+        self._thread = None
+
+    def submit(self, snapshot, source):
+        """Queue `snapshot` from feed `source` for writing, replacing any not written yet."""
+        with self._cond:
+            self._pending = (snapshot, source)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="weatherpeg-snapshot", daemon=True)
+                self._thread.start()
+            self._cond.notify()
+
+    def flush(self):
+        """Write the pending snapshot now, e.g. at exit."""
+        with self._cond:
+            pending, self._pending = self._pending, None
+        if pending is not None:
+            self._write(*pending)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while self._pending is None:
+                    self._cond.wait()
+                pending, self._pending = self._pending, None
+            self._write(*pending)
+            time.sleep(self.interval)
+
+    def _write(self, snapshot, source):
+        try:
+            save_snapshot(snapshot, source, self.path)
+        except OSError as e:
+            logging.error(f"Could not save the weather snapshot: {e}")
+
+
+def load_snapshot(path=SNAPSHOT_PATH):
+    """Return the saved snapshot dict (with its "source" URL), or None if there is no usable one."""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as e:
+        logging.warning(f"Ignoring unreadable weather snapshot {path}: {e}")
+        return None
+    if not isinstance(data, dict) or data.get("format") != SNAPSHOT_FORMAT or not data.get("fetched_at"):
+        logging.warning(f"Ignoring weather snapshot {path} in an unknown format")
+        return None
+    return data
+
+
+def format_age(seconds):
+    """Human-readable age such as "45 s", "12 min" or "3 h 5 min"."""
+    seconds = max(0, int(seconds))
+    if seconds < 60:
+        return f"{seconds} s"
+    if seconds < 3600:
+        return f"{seconds // 60} min"
+    hours, minutes = divmod(seconds // 60, 60)
+    if hours < 48:
+        return f"{hours} h {minutes} min" if minutes else f"{hours} h"
+    return f"{hours // 24} days"
+
+
+def snapshot_age(snapshot, now=None):
+    """Seconds since the snapshot's data was fetched, or None if unknown."""
+    fetched_at = snapshot.get("fetched_at")
+    if fetched_at is None:
+        return None
+    return (time.time() if now is None else now) - fetched_at
+
+
+if __name__ == "__main__":
+    print("This is a module, and not meant to be run directly")
@@ -1,30 +1,63 @@
-SOURCE = "txt/source.txt"
-try:
-    with open(SOURCE, "r", encoding="utf-8") as RSS:
-        RSS_URL = RSS.read().strip()
-except FileNotFoundError:
-    print(f"[WARN] {SOURCE} not found!")
-    print("You need a file called source.txt with a URL pointing towards an XML file so the software knows")
-    print("where to get the information from!!")
-    input("Press Enter to continue...")
+from dataclasses import dataclass
+from typing import Optional, Tuple
 
+SOURCE = "txt/source.txt"
 COORD_SOURCE = "txt/coord_source.txt"
+DEFAULT_URL = "https://weather.gc.ca/rss/weather/49.895_-97.135_e.xml"
+
+
+@dataclass(frozen=True)
+class FeedSource:
+    """One location: its RSS feed URL and optional radar coordinates."""
+    url: str
+    coordinates: Optional[Tuple[float, float]] = None
+
+
+def _read_lines(filename):
+    """Return the non-empty, non-comment lines of a text file."""
+    with open(filename, "r", encoding="utf-8") as f:
+        return [line.strip() for line in f if line.strip() and not line.startswith("#")]
+
+
+def _parse_coordinates(line):
+    lat_str, lon_str = line.split(",")
+    return (float(lat_str), float(lon_str))  # tuple of floats
+
+
+def load_sources():
+    """Read every feed URL in source.txt, paired line-by-line with coord_source.txt.
+
+    Never blocks or raises for missing or bad files. Returns (sources,
+    problems): problems are messages to show the user, and when source.txt
+    has no usable URL the Winnipeg feed is used so the display still works.
+    """
+    problems = []
+    try:
+        urls = _read_lines(SOURCE)
+    except FileNotFoundError:
+        urls = []
+        problems.append(f"{SOURCE} not found, it should list the RSS feed URL(s) to show")
+    if not urls:
+        if not problems:
+            problems.append(f"{SOURCE} has no feed URL")
+        problems[-1] += f"; using {DEFAULT_URL}"
+        urls = [DEFAULT_URL]
+
+    coords = []
+    try:
+        coords = [_parse_coordinates(line) for line in _read_lines(COORD_SOURCE)]
+    except FileNotFoundError:
+        problems.append(f"{COORD_SOURCE} not found, the radar needs coordinates")
+    except ValueError as e:
+        problems.append(f"{COORD_SOURCE} is invalid: {e}")
+    return [FeedSource(url, coords[i] if i < len(coords) else None) for i, url in enumerate(urls)], problems
+
+
+def default_coordinates():
+    """Coordinates of the first location that has them, for the radar, or None."""
+    sources, _ = load_sources()
+    return next((source.coordinates for source in sources if source.coordinates), None)
+
 
-try:
-    with open(COORD_SOURCE, "r", encoding="utf-8") as f:
-        line = f.read().strip()
-        if not line:
-            raise ValueError("Coordinate file is empty")
-        lat_str, lon_str = line.split(",")
-        COORDINATES = (float(lat_str), float(lon_str))  # tuple of floats
-except FileNotFoundError:
-    print(f"[WARN] {COORD_SOURCE} not found!")
-    print("You need a file called coord_source.txt with coords in it so the radar has a location")
-    input("Press Enter to continue...")
-    COORDINATES = None
-except ValueError as e:
-    print(f"[WARN] {COORD_SOURCE} is invalid: {e}")
-    input("Press Enter to continue...")
-    COORDINATES = None
-
-print("Coordinates:", COORDINATES)
+if __name__ == "__main__":
+    print("This is a module, and not meant to be run directly")
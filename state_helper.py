@@ -0,0 +1,90 @@
+import datetime
+import logging
+import threading
+
+DEFAULT_STATE = {
+    "title": "Loading weather data...",
+    "summary": "Loading weather data...",
+    "link": "",
+    "warning_title": "No warnings",
+    "warning_summary": "No warnings in effect.",
+    "conditions": None,
+    "alerts": [],
+    "forecast": [],
+    "location": 0,
+    "last_updated": None,
+    "fetched_at": None,  # epoch seconds the data on display was fetched
+    "stale": False,  # True while showing the saved snapshot from a previous run
+}
+
+
+class WeatherState:
+    """Lock-protected snapshot of the weather currently on display.
+
+    The fetcher writes with `update`. Readers such as the web server call
+    `snapshot`, which returns the current dict without copying. Every
+    update replaces the dict instead of changing it, so a snapshot never
+    changes after it is handed out. Subscribers get only the fields that
+    actually changed.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._snapshot = dict(DEFAULT_STATE, version=0)
+        self._subscribers = []
+
+    def snapshot(self):
+        """Return the current state. Treat it as read-only."""
+        return self._snapshot
+
+    @property
+    def version(self):
+        """Number of updates that changed something, starting at 0."""
+        return self._snapshot["version"]
+
+    def subscribe(self, callback):
+        """Call `callback(delta, snapshot)` after every update that changed something."""
+        self._subscribers.append(callback)
+
+    def update(self, **fields):
+        """Set `fields` and return the {field: value} delta, which is empty if nothing changed."""
+        with self._lock:
+            current = self._snapshot
+            delta = {key: value for key, value in fields.items() if current.get(key) != value}
+            if not delta:
+                return {}
+            delta["last_updated"] = datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+            delta["version"] = current["version"] + 1
+            self._snapshot = dict(current, **delta)
+            snapshot = self._snapshot
+        self._notify(delta, snapshot)
+        return delta
+
+    def load(self, snapshot):
+        """Replace the state with a snapshot published by another process.
+
+        The version keeps counting locally, so it still only moves forward
+        when the publishing process restarts.
+        """
+        with self._lock:
+            current = self._snapshot
+            delta = {key: value for key, value in snapshot.items()
+                     if key != "version" and current.get(key) != value}
+            if not delta:
+                return {}
+            delta["version"] = current["version"] + 1
+            self._snapshot = dict(current, **delta)
+            snapshot = self._snapshot
+        self._notify(delta, snapshot)
+        return delta
+
+    def _notify(self, delta, snapshot):
+        for callback in list(self._subscribers):
+            try:
+                callback(delta, snapshot)
+            except Exception:
+                logging.exception("Error in weather state subscriber")
+
+
+if __name__ == "__main__":
+    print("This is a module, and not meant to be run directly")
@@ -0,0 +1,65 @@
+import feedparser
+
+from atom_helper import parse, parse_atom
+from conditions_helper import clean_summary
+
+FEED = b"""<?xml version="1.0" encoding="UTF-8"?>
+<feed xmlns="http://www.w3.org/2005/Atom" xml:lang="en-ca">
+  <title>Winnipeg - Weather - Environment Canada</title>
+  <updated>2024-01-15T18:00:00Z</updated>
+  <entry>
+    <title>No watches or warnings in effect, Winnipeg</title>
+    <link type="text/html" href="https://weather.gc.ca/warnings/mb-38_e.html"/>
+    <updated>2024-01-15T17:45:00Z</updated>
+    <category term="Warnings and Watches"/>
+    <summary type="html">No watches or warnings in effect.</summary>
+  </entry>
+  <entry>
+    <title>Current Conditions: -21.4&#xB0;C</title>
+    <link type="text/html" href="https://weather.gc.ca/city/pages/mb-38_metric_e.html"/>
+    <updated>2024-01-15T18:00:00Z</updated>
+    <category term="Current Conditions"/>
+    <summary type="html">&lt;b&gt;Condition:&lt;/b&gt; Light Snow &lt;br/&gt;</summary>
+  </entry>
+  <entry>
+    <title>Monday night: Periods of snow. Low minus 25.</title>
+    <link type="text/html" href="https://weather.gc.ca/city/pages/mb-38_metric_e.html"/>
+    <updated>2024-01-15T15:30:00Z</updated>
+    <category term="Weather Forecasts"/>
+    <summary type="html">Periods of snow. Low minus 25.</summary>
+  </entry>
+  <entry>
+    <title>Sunrise and sunset</title>
+    <link type="text/html" href="https://weather.gc.ca/city/pages/mb-38_metric_e.html"/>
+    <updated>2024-01-15T15:30:00Z</updated>
+    <category term="Astronomy"/>
+    <summary type="html">Sunrise 8:20. Sunset 16:54.</summary>
+  </entry>
+</feed>
+"""
+
+FIELDS = ("title", "link", "category", "updated_parsed")
+
+
+def test_matches_feedparser_for_the_fields_used():
+    fast = parse_atom(FEED)
+    slow = feedparser.parse(FEED)
+    assert fast.feed.updated_parsed == slow.feed.updated_parsed
+    slow_entries = [entry for entry in slow.entries if entry.category != "Astronomy"]
+    assert len(fast.entries) == len(slow_entries) == 3
+    for fast_entry, slow_entry in zip(fast.entries, slow_entries):
+        for field in FIELDS:
+            assert getattr(fast_entry, field) == getattr(slow_entry, field), field
+        # feedparser normalises the HTML markup; the text WeatherPeg shows is the same
+        assert clean_summary(fast_entry.summary) == clean_summary(slow_entry.summary)
+
+
+def test_only_wanted_categories_are_built():
+    feed = parse_atom(FEED, categories={"Current Conditions"})
+    assert [entry.category for entry in feed.entries] == ["Current Conditions"]
+
+
+def test_malformed_feed_falls_back_to_feedparser():
+    feed = parse(FEED[:-20])
+    assert isinstance(feed, feedparser.FeedParserDict)
+    assert feed.bozo
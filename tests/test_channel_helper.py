@@ -0,0 +1,45 @@
+import time
+
+from channel_helper import StatePublisher, StateSubscriber, format_address, parse_address
+from state_helper import WeatherState
+
+AUTHKEY = b"test-key"
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+def test_address_round_trip(tmp_path):
+    assert parse_address(format_address(("127.0.0.1", 2047))) == ("127.0.0.1", 2047)
+    assert parse_address(format_address(str(tmp_path / "weatherpeg.sock"))) == str(tmp_path / "weatherpeg.sock")
+
+
+def test_snapshots_and_stats_reach_the_subscriber(tmp_path):
+    address = str(tmp_path / "weatherpeg.sock")
+    blocking_calls = []
+
+    def run_blocking(function):
+        blocking_calls.append(function)
+        return function()
+
+    remote = WeatherState()
+    subscriber = StateSubscriber(remote, address, AUTHKEY, run_blocking=run_blocking)
+    subscriber.start()
+
+    local = WeatherState()
+    local.update(title="Winnipeg", summary="-21.4C")
+    StatePublisher(local, address, AUTHKEY, stats_provider=lambda: {"polls": 3})
+
+    # the snapshot taken on connect
+    assert wait_for(lambda: remote.snapshot()["title"] == "Winnipeg")
+    assert wait_for(lambda: subscriber.stats == {"polls": 3})
+    # and every change after it
+    local.update(summary="-25.0C")
+    assert wait_for(lambda: remote.snapshot()["summary"] == "-25.0C")
+    assert blocking_calls
@@ -0,0 +1,63 @@
+import pytest
+
+from fetch_helper import ConditionalFetcher
+
+
+class FakeResponse:
+    def __init__(self, status_code=200, content=b"", headers=None):
+        self.status_code = status_code
+        self.content = content
+        self.headers = headers or {}
+
+    def raise_for_status(self):
+        pass
+
+
+class FakeNetworking:
+    def __init__(self, *responses):
+        self.responses = list(responses)
+        self.requests = []
+
+    def http_get(self, url, headers=None):
+        self.requests.append(headers)
+        return self.responses.pop(0)
+
+
+def feed_response(body=b"<feed/>", etag='"v1"'):
+    return FakeResponse(content=body, headers={"ETag": etag})
+
+
+def test_validators_are_sent_only_after_commit():
+    networking = FakeNetworking(feed_response(), feed_response())
+    fetcher = ConditionalFetcher(networking, parse=lambda content: object())
+    result = fetcher.fetch("url")
+    fetcher.fetch("url")
+    assert networking.requests[1] == {}
+    fetcher.commit(result)
+    assert fetcher.etag == '"v1"'
+
+
+def test_uncommitted_body_is_parsed_again():
+    networking = FakeNetworking(feed_response(), feed_response())
+    fetcher = ConditionalFetcher(networking, parse=lambda content: object())
+    assert fetcher.fetch("url").status == "parsed"
+    assert fetcher.fetch("url").status == "parsed"
+
+
+def test_committed_body_is_unchanged():
+    networking = FakeNetworking(feed_response(), feed_response(), FakeResponse(status_code=304))
+    fetcher = ConditionalFetcher(networking, parse=lambda content: object())
+    fetcher.commit(fetcher.fetch("url"))
+    assert fetcher.fetch("url").status == "unchanged"
+    assert fetcher.fetch("url").status == "not_modified"
+    assert networking.requests[2] == {"If-None-Match": '"v1"'}
+
+
+def test_parse_failure_keeps_the_old_validators():
+    def parse(content):
+        raise ValueError("bad feed")
+
+    fetcher = ConditionalFetcher(FakeNetworking(feed_response()), parse)
+    with pytest.raises(ValueError):
+        fetcher.fetch("url")
+    assert fetcher.etag is None and fetcher.body_hash is None
@@ -0,0 +1,55 @@
+import time
+
+import pytest
+
+from history_helper import HistoryStore
+
+SUMMARY = "<b>Temperature:</b> -21.4&deg;C <br/><b>Humidity:</b> 80 % <br/>"
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = HistoryStore(str(tmp_path / "history.db"))
+    yield store
+    store.close()
+
+
+def test_query_returns_the_range_oldest_first(store):
+    for logged_at in (30, 10, 20, 40):
+        store.record("Current Conditions", SUMMARY, "link", "", logged_at=logged_at)
+    assert [row["logged_at"] for row in store.query(10, 40)] == [10, 20, 30]
+    assert [row["logged_at"] for row in store.query(limit=2)] == [10, 20]
+    assert [row["logged_at"] for row in store.query(limit=2, newest=True)] == [30, 40]
+
+
+def test_summary_fields_are_stored_as_columns(store):
+    store.record("Current Conditions", SUMMARY, "link", "", logged_at=1)
+    row = store.latest()
+    assert row["temperature"] == pytest.approx(-21.4)
+    assert row["humidity"] == pytest.approx(80)
+
+
+def test_query_by_source(store):
+    store.record("A", SUMMARY, "link", "", logged_at=1, source="a")
+    store.record("B", SUMMARY, "link", "", logged_at=2, source="b")
+    assert [row["title"] for row in store.query(source="b")] == ["B"]
+
+
+def test_identical_bodies_are_stored_once(store):
+    store.record("A", SUMMARY, "link", "", content=b"<feed/>", logged_at=1)
+    store.record("A", SUMMARY, "link", "", content=b"<feed/>", logged_at=2)
+    hashes = {row["body_hash"] for row in store.query()}
+    assert len(hashes) == 1
+    assert store.get_body(hashes.pop()) == b"<feed/>"
+    assert list(store.iter_bodies()) == [b"<feed/>"]
+
+
+def test_compact_drops_old_rows_and_their_bodies(store):
+    now = time.time()
+    store.record("old", SUMMARY, "link", "", content=b"old", logged_at=now - 10 * 24 * 60 * 60)
+    store.record("new", SUMMARY, "link", "", content=b"new", logged_at=now)
+    revision = store.revision
+    store.compact(retention_days=7)
+    assert [row["title"] for row in store.query()] == ["new"]
+    assert list(store.iter_bodies()) == [b"new"]
+    assert store.revision != revision
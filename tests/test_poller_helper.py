@@ -0,0 +1,109 @@
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from fetch_helper import FeedResult
+from poller_helper import BACKOFF_BASE, DENSE_POLL, JITTER, FeedCadence, PollingEngine
+
+
+def hourly_cadence():
+    cadence = FeedCadence()
+    for updated in (0, 3600, 7200):
+        cadence.observe(updated, None, updated)
+    return cadence
+
+
+def test_period_needs_two_gaps():
+    cadence = FeedCadence()
+    cadence.observe(0, None, 0)
+    cadence.observe(3600, None, 3600)
+    assert cadence.period is None
+    cadence.observe(7200, None, 7200)
+    assert cadence.period == 3600
+
+
+def test_far_from_the_next_update_waits_at_most_the_interval():
+    assert hourly_cadence().next_delay(now=7300, interval=300) <= 300
+
+
+def test_polls_densely_around_the_expected_update():
+    delay = hourly_cadence().next_delay(now=10790, interval=300)
+    assert DENSE_POLL * (1 - JITTER) <= delay <= DENSE_POLL * (1 + JITTER)
+
+
+def test_without_a_cadence_the_interval_applies():
+    delay = FeedCadence().next_delay(now=0, interval=300)
+    assert 300 * (1 - JITTER) <= delay <= 300
+
+
+def test_max_age_delays_the_next_poll():
+    cadence = hourly_cadence()
+    cadence.observe(None, 200, 10790)
+    assert cadence.next_delay(now=10790, interval=300) == pytest.approx(200)
+
+
+def test_max_age_longer_than_the_interval_is_capped():
+    cadence = FeedCadence()
+    cadence.observe(None, 3600, 0)
+    assert cadence.next_delay(now=0, interval=300) == 300
+
+
+class FakeFetcher:
+    def __init__(self, *outcomes):
+        self.outcomes = list(outcomes)
+
+    def fetch(self, url):
+        outcome = self.outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+
+def make_engine(*outcomes, interval=300):
+    delivered = []
+    engine = PollingEngine([SimpleNamespace(url="feed")], networking=None, parse=None,
+                           deliver=lambda index, result, error: delivered.append((result, error)),
+                           interval=interval)
+    engine.states[0].fetcher = FakeFetcher(*outcomes)
+    return engine, engine.states[0], delivered
+
+
+def test_failures_back_off_exponentially():
+    engine, state, delivered = make_engine(OSError("down"), OSError("down"))
+    for failures in (1, 2):
+        before = time.monotonic()
+        engine._poll(state)
+        backoff = BACKOFF_BASE * 2 ** (failures - 1)
+        assert state.failures == failures
+        assert before + backoff * 0.5 <= state.next_due <= time.monotonic() + backoff
+    assert [type(error) for _, error in delivered] == [OSError, OSError]
+    engine.stop()
+
+
+def test_success_resets_the_backoff_and_polls_after_the_interval():
+    engine, state, delivered = make_engine(OSError("down"), FeedResult("not_modified"))
+    engine._poll(state)
+    engine._poll(state)
+    assert state.failures == 0
+    assert state.next_due == state.last_polled + 300
+    assert delivered[-1][1] is None
+    engine.stop()
+
+
+def test_source_interval_reschedules_from_the_last_poll():
+    engine, state, _ = make_engine(FeedResult("not_modified"))
+    engine._poll(state)
+    engine.set_source_interval(0, 60)
+    assert state.next_due == state.last_polled + 60
+    assert min(engine._heap) == (state.next_due, 0)
+    engine.stop()
+
+
+def test_stats_report_backing_off_feeds():
+    engine, state, _ = make_engine(OSError("down"))
+    engine._poll(state)
+    stats = engine.stats()
+    assert stats["backing_off"] == 1
+    assert stats["sources"][0]["failures"] == 1
+    engine.stop()
@@ -0,0 +1,49 @@
+import os
+
+from radar_helper import RadarCache, frame_key
+
+
+def key(minute):
+    return frame_key("frame", (49.9, -97.1), f"2024-01-15T18:{minute:02d}:00Z")
+
+
+def test_put_then_get(tmp_path):
+    cache = RadarCache(str(tmp_path), max_bytes=1024)
+    content_hash = cache.put(key(0), b"frame", ".png")
+    assert cache.get(key(0)) == (content_hash, b"frame")
+    assert cache.get(key(6)) is None
+
+
+def test_identical_frames_share_one_file(tmp_path):
+    cache = RadarCache(str(tmp_path), max_bytes=1024)
+    assert cache.put(key(0), b"frame", ".png") == cache.put(key(6), b"frame", ".png")
+    assert len(os.listdir(tmp_path)) == 1
+
+
+def test_least_recently_used_is_evicted(tmp_path):
+    cache = RadarCache(str(tmp_path), max_bytes=20)
+    cache.put(key(0), b"a" * 10, ".png")
+    cache.put(key(6), b"b" * 10, ".png")
+    cache.get(key(0))  # now the most recently used
+    cache.put(key(12), b"c" * 10, ".png")
+    assert cache.get(key(6)) is None
+    assert cache.get(key(0)) is not None
+    assert cache.get(key(12)) is not None
+    assert len(os.listdir(tmp_path)) == 2
+
+
+def test_newest_file_is_kept_even_over_budget(tmp_path):
+    cache = RadarCache(str(tmp_path), max_bytes=5)
+    cache.put(key(0), b"a" * 10, ".png")
+    assert cache.get(key(0)) is not None
+
+
+def test_files_on_disk_are_read_back_after_a_restart(tmp_path):
+    cache = RadarCache(str(tmp_path), max_bytes=1024)
+    cache.put(key(0), b"frame", ".png")
+    reopened = RadarCache(str(tmp_path), max_bytes=1024)
+    assert reopened._total == len(b"frame")
+    # keys live only in memory, so a restarted cache is empty until frames are stored again
+    assert reopened.get(key(0)) is None
+    assert reopened.put(key(0), b"frame", ".png") == cache.get(key(0))[0]
+    assert len(os.listdir(tmp_path)) == 1
@@ -0,0 +1,78 @@
+import gzip
+import urllib.parse
+
+import pytest
+
+import webserver_helper
+from history_helper import HistoryStore
+from webserver_helper import RenderedResponse, ResponseCache, _history_page, app
+
+BODY = b'{"temperature": -21.4}'
+
+
+def respond(rendered, **headers):
+    with app.test_request_context(headers=headers):
+        return rendered.to_response()
+
+
+def test_gzip_is_served_when_accepted():
+    response = respond(RenderedResponse(BODY, "application/json"), **{"Accept-Encoding": "gzip, deflate"})
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert gzip.decompress(response.get_data()) == BODY
+    assert response.headers["Vary"] == "Accept-Encoding"
+
+
+@pytest.mark.parametrize("header", ["", "gzip;q=0", "identity", "*;q=0"])
+def test_identity_unless_gzip_is_acceptable(header):
+    response = respond(RenderedResponse(BODY, "application/json"), **{"Accept-Encoding": header})
+    assert "Content-Encoding" not in response.headers
+    assert response.get_data() == BODY
+
+
+def test_matching_etag_is_not_modified():
+    rendered = RenderedResponse(BODY, "application/json")
+    etag = respond(rendered).headers["ETag"]
+    assert respond(rendered, **{"If-None-Match": etag}).status_code == 304
+    # any variant's tag validates, whichever encoding this request would get
+    assert respond(rendered, **{"If-None-Match": etag, "Accept-Encoding": "gzip"}).status_code == 304
+    assert respond(rendered, **{"If-None-Match": '"other"'}).status_code == 200
+
+
+def test_etag_follows_the_body():
+    first = respond(RenderedResponse(BODY, "application/json")).headers["ETag"]
+    second = respond(RenderedResponse(b"{}", "application/json")).headers["ETag"]
+    assert first != second
+
+
+def test_cache_renders_again_only_for_a_new_version():
+    cache = ResponseCache()
+    renders = []
+
+    def render():
+        renders.append(1)
+        return BODY
+
+    first = cache.get("current", 1, render, "application/json")
+    assert cache.get("current", 1, render, "application/json") is first
+    assert cache.get("current", 2, render, "application/json") is not first
+    assert len(renders) == 2
+
+
+def test_history_pages_from_the_newest_rows(tmp_path, monkeypatch):
+    monkeypatch.setattr(webserver_helper, "HISTORY_ROW_LIMIT", 3)
+    store = HistoryStore(str(tmp_path / "history.db"))
+    for logged_at in range(1, 8):
+        store.record("Current Conditions", "", "link", "", logged_at=float(logged_at))
+
+    page = _history_page(store, None, None)
+    assert [row["logged_at"] for row in page["observations"]] == [5.0, 6.0, 7.0]
+    assert page["truncated"]
+    params = dict(urllib.parse.parse_qsl(urllib.parse.urlparse(page["next"]).query))
+
+    page = _history_page(store, None, float(params["to"]))
+    assert [row["logged_at"] for row in page["observations"]] == [2.0, 3.0, 4.0]
+
+    page = _history_page(store, None, 2.0)
+    assert [row["logged_at"] for row in page["observations"]] == [1.0]
+    assert not page["truncated"] and page["next"] is None
+    store.close()
@@ -0,0 +1,93 @@
+import logging
+import time
+
+import metrics_helper
+
+APPLY_SECONDS = metrics_helper.timer("weatherpeg_view_apply_seconds", "Updating the widgets for one batch of changes")
+
+
+class WeatherView:
+    """What the GUI is showing, and the only code that writes the weather widgets.
+
+    `show` only records the wanted values. One idle callback then compares
+    them with what is on screen, sets just the StringVars that differ, and
+    flashes the screen only if something visible actually changed. Each
+    widget reconfiguration is counted, flashes included, so a refresh that
+    changed nothing should cost 0.
+    """
+
+    def __init__(self, gui):
+        self.gui = gui
+        self.fields = {
+            "title": gui.title_var,
+            "summary": gui.summary_var,
+            "link": gui.link_var,
+            "warning_title": gui.current_warning_title_var,
+            "warning_summary": gui.current_warning_summary_var,
+            "forecast": gui.forecast_var,
+        }
+        self.displayed = {name: var.get() for name, var in self.fields.items()}
+        self._pending = {}
+        self._flash = False
+        self._idle_id = None
+        self.refreshes = 0
+        self.unchanged = 0
+        self.reconfigurations = 0  # running total
+        self.last_reconfigurations = 0
+
+    def show(self, flash=True, **fields):
+        """Queue new values for the weather widgets. Applied together on the next idle."""
+        self._pending.update(fields)
+        self._flash = self._flash or flash
+        if self._idle_id is None:
+            self._idle_id = self.gui.root.after_idle(self._apply)
+
+    def count(self, widgets):
+        """Add `widgets` reconfigurations made outside `_apply`, such as by the flash, to this refresh."""
+        self.reconfigurations += widgets
+        self.last_reconfigurations += widgets
+
+    def _apply(self):
+        started = time.perf_counter()
+        try:
+            self._apply_pending()
+        finally:
+            APPLY_SECONDS.since(started)
+
+    def _apply_pending(self):
+        self._idle_id = None
+        pending, flash = self._pending, self._flash
+        self._pending, self._flash = {}, False
+        changed = {name: value for name, value in pending.items() if self.displayed.get(name) != value}
+        self.refreshes += 1
+        self.last_reconfigurations = 0
+        if not changed:
+            self.unchanged += 1
+            logging.debug("View refresh: nothing changed")
+            return
+
+        for name, value in changed.items():
+            self.fields[name].set(value)
+            self.displayed[name] = value
+        self.count(len(changed))
+        scroller = self.gui.scrolling_summary
+        if "summary" in changed and scroller is not None:
+            scroller.update_text(changed["summary"])
+            self.count(1)
+        if flash:
+            self.count(self.gui.fullscreen_manager.display_flash_off())
+        logging.info(f"View refresh: {self.last_reconfigurations} widget reconfiguration(s) for "
+                     f"{sorted(changed)}; {self.unchanged}/{self.refreshes} refreshes changed nothing")
+
+    def stats(self):
+        """Refresh and reconfiguration counters."""
+        return {
+            "refreshes": self.refreshes,
+            "unchanged": self.unchanged,
+            "reconfigurations": self.reconfigurations,
+            "last_reconfigurations": self.last_reconfigurations,
+        }
+
+
+if __name__ == "__main__":
+    print("This is a module, and not meant to be run directly")
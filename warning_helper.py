@@ -0,0 +1,140 @@
+"""
+Warnings and watches from Environment Canada feeds, tracked as events.
+
+Every poll yields the set of alerts currently listed in a feed. Alerts
+are keyed by a stable ID built from their type and area, so a reissued
+alert (new time, new wording, new colour) is an update and not a new
+alert. Comparing the new set with the previous one gives "issued",
+"updated" and "ended" events in one pass over each set.
+"""
+
+import logging
+import re
+import threading
+from dataclasses import dataclass, asdict
+
+WARNING_CATEGORY = "Warnings and Watches"
+NO_WARNINGS = "No watches or warnings in effect."
+
+_ENDED_RE = re.compile(r"\bENDED\b", re.IGNORECASE)
+_KEY_NOISE_RE = re.compile(r"^(?:YELLOW|ORANGE|RED)\s+|\s+(?:IN EFFECT|ENDED)\b", re.IGNORECASE)
+_SPACE_RE = re.compile(r"\s+")
+
+
+@dataclass(frozen=True)
+class Alert:
+    """One active warning, watch, advisory or statement."""
+    id: str
+    title: str
+    summary: str
+    link: str = ""
+    updated: str = ""
+
+    def to_dict(self):
+        """The alert as a plain dict, for JSON and the state snapshot."""
+        return asdict(self)
+
+
+@dataclass(frozen=True)
+class AlertEvent:
+    """A change to one alert: `kind` is "issued", "updated" or "ended"."""
+    kind: str
+    alert: Alert
+    source: str = ""
+
+    def to_dict(self):
+        """The event as a plain dict, for the warning_event Socket.IO message."""
+        return {"kind": self.kind, "source": self.source, "alert": self.alert.to_dict()}
+
+
+def alert_id(title):
+    """Stable key for an alert title: type and area, without colour or "in effect"/"ended"."""
+    return _SPACE_RE.sub(" ", _KEY_NOISE_RE.sub("", title)).strip().lower()
+
+
+def read_alerts(entries):
+    """Return {id: Alert} for the alerts in force among parsed feed `entries`."""
+    alerts = {}
+    for entry in entries:
+        if getattr(entry, "category", None) != WARNING_CATEGORY:
+            continue
+        summary = getattr(entry, "summary", "")
+        title = getattr(entry, "title", "")
+        if summary == NO_WARNINGS or title.lower().startswith("no watches or warnings") or _ENDED_RE.search(title):
+            continue
+        alert = Alert(alert_id(title), title, summary, getattr(entry, "link", ""), getattr(entry, "updated", ""))
+        alerts[alert.id] = alert
+    return alerts
+
+
+def diff_alerts(previous, current, source=""):
+    """Events that turn `previous` ({id: Alert}) into `current`. O(len(previous) + len(current))."""
+    events = []
+    for key, alert in current.items():
+        old = previous.get(key)
+        if old is None:
+            events.append(AlertEvent("issued", alert, source))
+        elif old != alert:
+            events.append(AlertEvent("updated", alert, source))
+    for key, alert in previous.items():
+        if key not in current:
+            events.append(AlertEvent("ended", alert, source))
+    return events
+
+
+def headline(alerts, default_title="No warnings", default_summary=NO_WARNINGS):
+    """(title, summary) for the warning labels: every active title, and the newest alert's text."""
+    if not alerts:
+        return default_title, default_summary
+    ordered = sorted(alerts, key=lambda alert: alert.updated, reverse=True)
+    return " / ".join(alert.title for alert in ordered), ordered[0].summary
+
+
+class WarningEngine:
+    """The active alerts of every source, and the events between polls.
+
+    `update` replaces a source's alert set and returns the events. Each
+    subscriber is called with the list of events after every poll that
+    produced any. Events are also logged.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._active = {}  # source -> {id: Alert}
+        self._subscribers = []
+
+    def subscribe(self, callback):
+        """Call `callback(events)` after every update that produced events."""
+        self._subscribers.append(callback)
+
+    def update(self, source, alerts):
+        """Set the alerts now in force for `source` and return the events since the last update."""
+        with self._lock:
+            events = diff_alerts(self._active.get(source, {}), alerts, source)
+            self._active[source] = alerts
+        if not events:
+            return events
+        for event in events:
+            log = logging.info if event.kind == "ended" else logging.warning
+            log(f"Alert {event.kind}: {event.alert.title} ({source})")
+        for callback in list(self._subscribers):
+            try:
+                callback(events)
+            except Exception:
+                logging.exception("Error in warning event subscriber")
+        return events
+
+    def active(self, source):
+        """Alerts in force for `source`, newest first."""
+        with self._lock:
+            alerts = list(self._active.get(source, {}).values())
+        return sorted(alerts, key=lambda alert: alert.updated, reverse=True)
+
+    def has_alerts(self, source):
+        """Whether feed `source` has any alert in effect."""
+        with self._lock:
+            return bool(self._active.get(source))
+
+
+if __name__ == "__main__":
+    print("This is a module, and not meant to be run directly")
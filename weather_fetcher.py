@@ -0,0 +1,391 @@
+import atexit
+import calendar
+import logging
+import threading
+import time
+import atom_helper
+import source_helper
+from config import Config
+from fetch_helper import APPLY_SECONDS, FetchWorker
+from poller_helper import PollingEngine, DEFAULT_WORKERS
+from history_helper import HistoryStore
+from conditions_helper import clean_summary, parse_summary
+from state_helper import WeatherState
+from warning_helper import WarningEngine, read_alerts, headline, WARNING_CATEGORY
+from forecast_helper import parse_forecast, format_forecast, FORECAST_CATEGORY
+from snapshot_helper import PERSISTED_FIELDS, SnapshotWriter, load_snapshot, snapshot_age
+
+DEFAULT_REFRESH_DELAY = 120000  # ms
+DEFAULT_WARNING_REFRESH_DELAY = 30000  # ms, used for a feed while it has an active warning
+POOL_SIZE = 32  # pooled HTTP connections shared by every polling thread
+
+def feed_parser():
+    """The feed parse function: the fast Atom parser, or feedparser when fast_parser is off."""
+    if Config.get_config_bool(None, key="fast_parser"):
+        return atom_helper.parse
+    import feedparser
+    return feedparser.parse
+
+
+class Networking:
+    """Networking utilities with retry logic."""
+    _HTTP_SESSION = None
+    _SESSION_LOCK = threading.Lock()
+
+    @staticmethod
+    def _create_http_session():
+        # requests is imported here, on the first poll, so it stays off the startup path
+        import requests
+        from requests.adapters import HTTPAdapter, Retry
+
+        session = requests.Session()
+        retry = Retry(
+            total=3,
+            connect=3,
+            read=3,
+            backoff_factor=0.5,
+            status_forcelist=(429, 500, 502, 503, 504),
+            allowed_methods=("GET", "POST"),
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(max_retries=retry, pool_connections=POOL_SIZE, pool_maxsize=POOL_SIZE)
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        return session
+
+    def http_get(self, url, **kwargs):
+        """Perform an HTTP GET request with retries and timeout."""
+        timeout = kwargs.pop("timeout", 10)
+        with Networking._SESSION_LOCK:
+            if Networking._HTTP_SESSION is None:
+                Networking._HTTP_SESSION = self._create_http_session()
+        return Networking._HTTP_SESSION.get(url, timeout=timeout, **kwargs)
+
+
+class WeatherFetcher:
+    """Fetch and process weather data from RSS feed.
+
+    With `gui=None` (headless mode) nothing here touches Tk: poll results
+    are applied straight away on the polling threads, one at a time.
+    `sources` replaces the FeedSources from source.txt, e.g. to poll the
+    offline replay server in benchmarks/.
+    """
+    def __init__(self, gui=None, sources=None):
+        self.gui = gui
+        self.networking = Networking()
+        self.warning_title = "No warnings"
+        self.warning_summary = "No warnings in effect."
+        self.current_title = "none"
+        self.current_summary = "none"
+        self.current_link = "none"
+        self.current_conditions = None
+        self.scrolling_summary = None
+        self.history_store = None
+        self._history_lock = threading.Lock()  # polling workers and the web server open the store
+        if sources is None:
+            self.sources, self.source_problems = source_helper.load_sources()
+        else:
+            self.sources, self.source_problems = list(sources), []
+        for problem in self.source_problems:
+            print(f"[WARN] {problem}")
+        self.locations = [None] * len(self.sources)
+        self.state = WeatherState()
+        self.warnings = WarningEngine()
+        self.warnings.subscribe(self._on_alert_events)
+        self.active = 0
+        self.screen_state = None
+        self.fetch_worker = None
+        self._apply_lock = threading.Lock()
+        if gui is not None:
+            self.screen_state = gui.fullscreen_manager
+            self.fetch_worker = FetchWorker(gui.timers)
+        self.engine = PollingEngine(
+            self.sources, self.networking, feed_parser(),
+            deliver=self._deliver, interval=self.refresh_interval(),
+            max_workers=Config.get_config_value(self, key="poll_workers", default=DEFAULT_WORKERS),
+            adaptive=Config.get_config_bool(self, key="adaptive_polling"),
+        )
+        self.freshness_lag = {}  # location index -> seconds from observation to display
+        self.restore_snapshot()
+        self.snapshot_writer = SnapshotWriter()
+        atexit.register(self.snapshot_writer.flush)
+        self.state.subscribe(self._save_snapshot)
+        if gui is not None:
+            self.gui.root.bind("<F5>", lambda event=None: self.get_weather())
+            self.gui.root.bind("<F7>", lambda event=None: self.switch_location(-1))
+            self.gui.root.bind("<F8>", lambda event=None: self.switch_location(1))
+
+    def refresh_interval(self):
+        """Return the configured refresh interval in seconds."""
+        return Config.get_config_value(self, key="refresh_delay", default=DEFAULT_REFRESH_DELAY) / 1000
+
+    def get_weather(self):
+        """Start polling if needed and refresh the displayed location now."""
+        if not self.engine.started:
+            self.engine.start()
+        else:
+            self.engine.refresh(self.active)
+
+    def warning_interval(self):
+        """Return the refresh interval in seconds for a feed with an active warning."""
+        return Config.get_config_value(self, key="warning_refresh_delay",
+                                       default=DEFAULT_WARNING_REFRESH_DELAY) / 1000
+
+    def schedule_refresh(self):
+        """Apply a changed refresh_delay, warning_refresh_delay or adaptive_polling to the polling schedule."""
+        self.engine.set_adaptive(Config.get_config_bool(self, key="adaptive_polling"))
+        self.engine.set_interval(self.refresh_interval())
+        for index, source in enumerate(self.sources):
+            self._tighten_polling(index, self.warnings.has_alerts(source.url))
+
+    def _tighten_polling(self, index, alerts_active):
+        """Poll a feed faster while it has an active warning, so new alerts show up sooner."""
+        interval = min(self.warning_interval(), self.refresh_interval()) if alerts_active else None
+        self.engine.set_source_interval(index, interval)
+
+    def _deliver(self, index, result, error):
+        """Process a poll result here, then display it on the Tk thread (or here when headless).
+
+        Runs on a polling thread, so parsing the entries, diffing warnings
+        and writing history never block the Tk thread, whichever location
+        the feed is for. Only the finished location dict is posted to Tk.
+        The fetcher's validators are committed only once processing succeeded.
+        """
+        location = None
+        if error is None:
+            try:
+                location = self._process_feed(index, result)
+            except Exception as e:
+                print(f"Error fetching weather data: {e}")
+                return
+            self.engine.states[index].fetcher.commit(result)
+        if self.fetch_worker is None:
+            with self._apply_lock:
+                started = time.perf_counter()
+                self._apply_location(index, location, error)
+                APPLY_SECONDS.since(started)
+            return
+        self.fetch_worker.post(lambda location, error: self._apply_location(index, location, error), location, error)
+
+    def _process_feed(self, index, result):
+        """Read a poll result, update the warnings and log it. Returns the new location dict or None.
+
+        Runs on a polling thread.
+        """
+        source = self.sources[index]
+        logging.info(f"Feed poll {source.url}: {result.status} {self.engine.states[index].fetcher.stats}")
+        if result.status != "parsed":
+            return None
+        location, alerts = self._read_feed(result.feed)
+        self.warnings.update(source.url, alerts)
+        self._tighten_polling(index, bool(alerts))
+        if location is None:
+            return None
+        location["fetched_at"] = time.time()
+        self.logger(source, location, result.content)
+        return location
+
+    def _apply_location(self, index, location, error):
+        """Store a processed location and show it if it is the displayed one. Runs on the Tk thread."""
+        if error is not None:
+            print(f"Error fetching weather data from {self.sources[index].url}: {error}")
+            if index == self.active and self.screen_state is not None:
+                self.screen_state.display_flash_off()
+            return
+        if location is None:
+            return
+        self.locations[index] = location
+        if index == self.active:
+            self.show_location(index)
+
+    def _read_feed(self, feed):
+        """Pull the current conditions and warnings for one location out of a parsed feed.
+
+        Returns (location dict or None, {id: Alert} in force).
+        """
+        # one pass over the entries, sorting out the categories used below
+        warning_entries = []
+        forecast_entries = []
+        conditions_entry = None
+        for entry in feed.entries:
+            if entry.category == WARNING_CATEGORY:
+                warning_entries.append(entry)
+            elif entry.category == FORECAST_CATEGORY:
+                forecast_entries.append(entry)
+            elif entry.category == "Current Conditions":
+                conditions_entry = entry
+
+        alerts = read_alerts(warning_entries)
+        # with nothing in force, show the feed's own "no warnings" entry
+        default_title = warning_entries[0].title if warning_entries else "No warnings"
+        warning_title, warning_summary = headline(alerts.values(), default_title)
+
+        location = None
+        if conditions_entry is not None:
+            # Decode HTML entities and clean text
+            summary = clean_summary(conditions_entry.summary)
+            updated = conditions_entry.get("updated_parsed")
+            location = {
+                "title": conditions_entry.title,
+                "summary": summary,
+                "link": conditions_entry.link,
+                "conditions": parse_summary(summary),
+                "observed": calendar.timegm(updated) if updated else None,
+                "warning_title": warning_title,
+                "warning_summary": warning_summary,
+                "alerts": [alert.to_dict() for alert in sorted(
+                    alerts.values(), key=lambda alert: alert.updated, reverse=True)],
+                "forecast": [period.to_dict() for period in parse_forecast(forecast_entries)],
+            }
+        return location, alerts
+
+    def show_location(self, index):
+        """Display the stored weather for one location."""
+        location = self.locations[index]
+        if location.get("observed") is not None:
+            self.freshness_lag[index] = time.time() - location["observed"]
+            logging.info(f"Freshness lag for location {index + 1}: {self.freshness_lag[index]:.0f}s "
+                         f"from observation to display")
+        self.current_title = location["title"]
+        self.current_summary = location["summary"]
+        self.current_link = location["link"]
+        self.current_conditions = location["conditions"]
+        self.warning_title = location["warning_title"]
+        self.warning_summary = location["warning_summary"]
+
+        print("Current Conditions Updated:")
+        print("Entry title:", self.current_title)
+        print("Entry summary:", self.current_summary)
+        print("Entry link:", self.current_link)
+        print("-" * 50)
+        self.state.update(
+            title=self.current_title,
+            summary=self.current_summary,
+            link=self.current_link,
+            warning_title=self.warning_title,
+            warning_summary=self.warning_summary,
+            conditions=self.current_conditions.to_dict(),
+            alerts=location["alerts"],
+            forecast=location["forecast"],
+            location=index,
+            fetched_at=location["fetched_at"],
+            stale=False,
+        )
+        if self.gui is None:
+            return
+        self.gui.view.show(
+            title=self.current_title,
+            summary=self.current_summary,
+            link=self.current_link,
+            warning_title=self.warning_title,
+            warning_summary=self.warning_summary,
+            forecast=format_forecast(location["forecast"],
+                                     Config.get_config_value(self, key="forecast_periods", default=6)),
+        )
+
+    def restore_snapshot(self):
+        """Show the last-known-good snapshot from the previous run, marked stale, until a poll lands.
+
+        Skipped when snapshots are off or the saved feed is no longer in sources.txt.
+        """
+        if not Config.get_config_bool(self, key="last_good_snapshot"):
+            return
+        snapshot = load_snapshot()
+        if snapshot is None:
+            return
+        index = snapshot.get("location")
+        if not isinstance(index, int) or not 0 <= index < len(self.sources) \
+                or self.sources[index].url != snapshot.get("source"):
+            logging.info("Saved weather snapshot is for a feed no longer in the sources, not showing it")
+            return
+        self.active = index
+        self.state.load(dict({key: snapshot.get(key) for key in PERSISTED_FIELDS}, stale=True))
+        snapshot = self.state.snapshot()
+        print(f"Showing saved weather from {snapshot['last_updated']} until the first refresh")
+        if self.gui is None:
+            return
+        self.gui.view.show(
+            flash=False,
+            title=snapshot["title"],
+            summary=snapshot["summary"],
+            link=snapshot["link"],
+            warning_title=snapshot["warning_title"],
+            warning_summary=snapshot["warning_summary"],
+            forecast=format_forecast(snapshot["forecast"],
+                                     Config.get_config_value(self, key="forecast_periods", default=6)),
+        )
+
+    def stale_age(self):
+        """Seconds since the saved snapshot on display was fetched, or None if the data is fresh."""
+        snapshot = self.state.snapshot()
+        return snapshot_age(snapshot) if snapshot["stale"] else None
+
+    def _save_snapshot(self, delta, snapshot):
+        """Queue freshly fetched weather to be saved as the last-known-good snapshot. State subscriber.
+
+        The write happens on the snapshot writer's thread, at most every SAVE_INTERVAL.
+        """
+        if snapshot["stale"] or snapshot["fetched_at"] is None \
+                or not Config.get_config_bool(self, key="last_good_snapshot"):
+            return
+        self.snapshot_writer.submit(snapshot, self.sources[snapshot["location"]].url)
+
+    def _on_alert_events(self, events):
+        """Announce new and changed alerts on the status line. Runs on a polling thread."""
+        if self.gui is None:
+            return
+        self.fetch_worker.post(lambda events, error: self._announce_alerts(events), events)
+
+    def _announce_alerts(self, events):
+        """Show the first issued or updated alert on the status line. Runs on the Tk thread."""
+        issued = [event for event in events if event.kind != "ended"]
+        if issued:
+            event = issued[0]
+            self.gui.status_var.set(f"Alert {event.kind}: {event.alert.title}")
+            self.gui.timers.once("status_clear", 15000, lambda: self.gui.status_var.set(""))
+
+    def switch_location(self, step):
+        """Show the next (step=1) or previous (step=-1) location from the cached results."""
+        if len(self.sources) < 2:
+            return
+        self.active = (self.active + step) % len(self.sources)
+        self.gui.status_var.set(f"Location {self.active + 1}/{len(self.sources)}: {self.sources[self.active].url}")
+        self.gui.timers.once("status_clear", 3000, lambda: self.gui.status_var.set(""))
+        if self.locations[self.active] is not None:
+            self.show_location(self.active)
+        else:
+            self.gui.view.show(flash=False, title="Loading weather data...")
+
+    def location_data(self, index):
+        """Return the cached weather for location `index`, or None. Used by the web server."""
+        if 0 <= index < len(self.locations):
+            return self.locations[index]
+        return None
+
+    def get_history_store(self):
+        """Open the history store on first use. Returns None if write_log is off. Thread-safe."""
+        with self._history_lock:
+            if self.history_store is None and Config.get_config_bool(self, key="write_log"):
+                retention_days = Config.get_config_value(self, key="history_retention_days", default=0)
+                self.history_store = HistoryStore(retention_days=retention_days)
+            return self.history_store
+
+    def logger(self, source, location, content):
+        """Record weather data in the history store if enabled in config."""
+        if Config.get_config_bool(self, key="write_log"):
+            self.get_history_store().record(
+                title=location["title"],
+                summary=location["summary"],
+                link=location["link"],
+                warning=location["warning_summary"],
+                content=content,
+                source=source.url,
+            )
+            logging.info(f"Logged current weather to {self.history_store.path}")
+        else:
+            logging.info("Not writing to log")
+
+
+
+if __name__ == "__main__":
+    print("This is a module, and not meant to be run directly")
@@ -0,0 +1,179 @@
+"""
+Run the WeatherPeg web tier in its own process.
+
+With `web_mode: process` in txt/config.txt the GUI starts this script
+instead of serving Flask on a thread. The web process:
+
+- serves /weather, the JSON API and Socket.IO with gevent or eventlet
+  when one is installed (falling back to threading),
+- receives state from the GUI process over a local channel
+  (see channel_helper.py),
+- reads history straight from the SQLite history store,
+- serves /metrics (the GUI process's metrics followed by its own) and
+  /debug/schedule from the stats the GUI process sends over the channel.
+
+/profile is refused here: it could only sample this process. Profile the
+app with "profile start" in its command window instead.
+
+It can also be started by hand:
+
+    WEATHERPEG_CHANNEL_KEY=secret python web_service.py --channel /tmp/weatherpeg-2046.sock
+"""
+
+import sys
+from importlib.util import find_spec
+
+
+def pick_async_mode(requested="auto"):
+    """Return `requested`, or for "auto" the best Socket.IO async mode that is installed."""
+    if requested != "auto":
+        return requested
+    for mode in ("gevent", "eventlet"):
+        if find_spec(mode) is not None:
+            return mode
+    return "threading"
+
+
+def _requested_async_mode(argv):
+    """--async-mode from the command line, read before argparse so patching comes first."""
+    for index, arg in enumerate(argv):
+        if arg.startswith("--async-mode="):
+            return arg.split("=", 1)[1]
+        if arg == "--async-mode" and index + 1 < len(argv):
+            return argv[index + 1]
+    return "auto"
+
+
+if __name__ == "__main__":
+    # patch the standard library before anything else imports socket, threading or subprocess
+    ASYNC_MODE = pick_async_mode(_requested_async_mode(sys.argv[1:]))
+    if ASYNC_MODE == "gevent":
+        from gevent import monkey
+        monkey.patch_all()
+    elif ASYNC_MODE == "eventlet":
+        import eventlet
+        eventlet.monkey_patch()
+
+import argparse  # noqa: E402
+import logging  # noqa: E402
+import os  # noqa: E402
+import secrets  # noqa: E402
+import signal  # noqa: E402
+import subprocess  # noqa: E402
+import threading  # noqa: E402
+import time  # noqa: E402
+
+CHANNEL_KEY_ENV = "WEATHERPEG_CHANNEL_KEY"
+PARENT_CHECK_INTERVAL = 2.0  # seconds between checks that the GUI process is still alive
+
+
+def blocking_runner(async_mode):
+    """How to call a blocking function without stalling the event loop of `async_mode`.
+
+    multiprocessing's Connection reads with an os.read bound before
+    monkey-patching, so under gevent or eventlet a recv() would block every
+    greenlet. Those modes run it on a real OS thread from their pool.
+    """
+    if async_mode == "gevent":
+        import gevent
+        return lambda function: gevent.get_hub().threadpool.apply(function)
+    if async_mode == "eventlet":
+        from eventlet import tpool
+        return tpool.execute
+    return None
+
+
+def app_stats(schedule_provider=None):
+    """Metrics and polling schedule of this (the GUI) process, sent to the web process."""
+    import metrics_helper
+
+    recorded = metrics_helper.REGISTRY.recorded()
+    return {
+        "metrics": metrics_helper.REGISTRY.render_prometheus(recorded),
+        "metric_names": sorted({metric.name for metric in recorded}),
+        "schedule": schedule_provider() if schedule_provider is not None else None,
+    }
+
+
+def combined_metrics(stats):
+    """The GUI process's metrics from `stats`, followed by this process's other metrics."""
+    import metrics_helper
+
+    stats = stats or {}
+    names = set(stats.get("metric_names", ()))
+    own = [metric for metric in metrics_helper.REGISTRY.metrics() if metric.name not in names]
+    return stats.get("metrics", "") + metrics_helper.REGISTRY.render_prometheus(own)
+
+
+def start_web_process(state, port, schedule_provider=None):
+    """Start web_service.py as a child process and publish `state` to it. Called by the GUI."""
+    from channel_helper import StatePublisher, default_address, format_address
+
+    address = default_address(port)
+    authkey = secrets.token_hex(16)
+    env = dict(os.environ, **{CHANNEL_KEY_ENV: authkey})
+    script = os.path.abspath(__file__)
+    process = subprocess.Popen(
+        [sys.executable, script, "--port", str(port), "--channel", format_address(address),
+         "--parent-pid", str(os.getpid())],
+        env=env, cwd=os.path.dirname(script),
+    )
+    StatePublisher(state, address, authkey.encode(), stats_provider=lambda: app_stats(schedule_provider))
+    logging.info(f"Started web process {process.pid} on port {port}")
+    return process
+
+
+def watch_parent(parent_pid):
+    """Exit when the process that started this one is gone, so the web tier never outlives it."""
+    def _watch():
+        while True:
+            time.sleep(PARENT_CHECK_INTERVAL)
+            if os.getppid() != parent_pid:
+                logging.info(f"Parent process {parent_pid} exited, stopping the web process")
+                os.kill(os.getpid(), signal.SIGTERM)
+                return
+    threading.Thread(target=_watch, name="weatherpeg-parent-watch", daemon=True).start()
+
+
+def main():
+    """Run the web tier, receiving state over the channel."""
+    parser = argparse.ArgumentParser(description="WeatherPeg web tier")
+    parser.add_argument("--port", type=int, default=2046)
+    parser.add_argument("--channel", help="state channel address (socket path or host:port)")
+    parser.add_argument("--async-mode", choices=("auto", "gevent", "eventlet", "threading"), default="auto")
+    parser.add_argument("--parent-pid", type=int,
+                        help="GUI process: exit when it does, and stop it on /shutdown")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    async_mode = pick_async_mode(args.async_mode)  # the standard library was patched for it above
+
+    from channel_helper import StateSubscriber, default_address, parse_address
+    from config import Config
+    from history_helper import HISTORY_DB, HistoryStore
+    from state_helper import WeatherState
+    from webserver_helper import WebServerHelper
+
+    state = WeatherState()
+    address = parse_address(args.channel) if args.channel else default_address(args.port)
+    authkey = os.environ.get(CHANNEL_KEY_ENV)
+    if not authkey:
+        parser.error(f"set {CHANNEL_KEY_ENV} to the channel key")
+    subscriber = StateSubscriber(state, address, authkey.encode(), run_blocking=blocking_runner(async_mode))
+    if args.parent_pid:
+        watch_parent(args.parent_pid)
+
+    history_store = None
+    if Config.get_config_bool(None, key="write_log"):
+        history_store = HistoryStore(HISTORY_DB)
+
+    helper = WebServerHelper(state=state, port=args.port, history_provider=lambda: history_store,
+                             schedule_provider=lambda: (subscriber.stats or {}).get("schedule"),
+                             metrics_provider=lambda: combined_metrics(subscriber.stats),
+                             shutdown_pid=args.parent_pid, profiling=False)
+    # state changes emit over Socket.IO, so only accept them once it is initialised
+    helper.serve_forever(async_mode, ready=subscriber.start)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,65 +1,378 @@
 import threading
 import os
 import datetime
+import gzip
+import hashlib
+import json
 import logging
 import signal
-from flask import Flask, url_for, request, render_template
+import time
+import urllib.parse
+from collections import OrderedDict
+from flask import Flask, Response, url_for, request, render_template
 from flask_socketio import SocketIO
+import metrics_helper
 from config import Config
+from profiler_helper import DEFAULT_SECONDS, get_profiler
+from warning_helper import Alert, diff_alerts
+
+try:
+    import brotli
+except ImportError:  # brotli is optional, gzip is always available
+    brotli = None
 
 TEMPLATE_FOLDER = "templates"
 STATIC_FOLDER = "static"
 
 app = Flask(__name__, template_folder=TEMPLATE_FOLDER, static_folder=STATIC_FOLDER)
 
-socketio = SocketIO(app, async_mode="threading")
+socketio = SocketIO()
+
+CACHE_CONTROL = "no-cache"  # clients may keep a copy but must revalidate, which is a cheap 304
+MAX_CACHED_RESPONSES = 64
+HISTORY_ROW_LIMIT = 5000
+METRICS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+RENDER_SECONDS = metrics_helper.timer("weatherpeg_web_render_seconds", "Rendering and compressing a web response")
+CACHE_HITS = metrics_helper.counter("weatherpeg_web_cache_hits_total", "Web responses served from the render cache")
+
+
+def _accepted_encodings(header):
+    """Map each content-coding in an Accept-Encoding header to its q-value."""
+    accepted = {}
+    for item in header.split(","):
+        coding, _, params = item.partition(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        quality = 1.0
+        for param in params.split(";"):
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        accepted[coding] = quality
+    return accepted
+
+
+class RenderedResponse:
+    """A response body rendered once, with pre-compressed variants and strong ETags."""
+
+    def __init__(self, body, content_type):
+        self.content_type = content_type
+        digest = hashlib.sha1(body).hexdigest()
+        self.variants = {"identity": (body, f'"{digest}"'),
+                         "gzip": (gzip.compress(body, compresslevel=9, mtime=0), f'"{digest}-gzip"')}
+        if brotli is not None:
+            self.variants["br"] = (brotli.compress(body), f'"{digest}-br"')
+        self.etags = {etag for _, etag in self.variants.values()}
+
+    def to_response(self):
+        """Build the Flask response for the current request, honouring If-None-Match and Accept-Encoding."""
+        accepted = _accepted_encodings(request.headers.get("Accept-Encoding", ""))
+        encoding = "identity"
+        if "br" in self.variants and accepted.get("br", accepted.get("*", 0.0)) > 0:
+            encoding = "br"
+        elif accepted.get("gzip", accepted.get("*", 0.0)) > 0:
+            encoding = "gzip"
+        body, etag = self.variants[encoding]
+        headers = {"ETag": etag, "Cache-Control": CACHE_CONTROL, "Vary": "Accept-Encoding"}
+        if_none_match = request.headers.get("If-None-Match", "")
+        if if_none_match and (if_none_match.strip() == "*" or
+                              any(tag.strip() in self.etags for tag in if_none_match.split(","))):
+            return Response(status=304, headers=headers)
+        if encoding != "identity":
+            headers["Content-Encoding"] = encoding
+        return Response(body, content_type=self.content_type, headers=headers)
+
+
+class ResponseCache:
+    """Rendered responses, re-rendered only when the version of their data changes."""
+
+    def __init__(self, max_entries=MAX_CACHED_RESPONSES):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> (version, RenderedResponse)
+
+    def get(self, key, version, render, content_type):
+        """Return the cached response for `key`, calling `render()` if `version` moved on."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == version:
+                self._entries.move_to_end(key)
+                CACHE_HITS.inc()
+                return entry[1]
+        started = time.perf_counter()
+        rendered = RenderedResponse(render(), content_type)
+        RENDER_SECONDS.since(started)
+        with self._lock:
+            self._entries[key] = (version, rendered)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return rendered
+
+
+def _json_body(data):
+    return json.dumps(data, separators=(",", ":"), default=str).encode("utf-8")
+
+
+def _parse_time(value):
+    """Parse a ?from=/?to= value given as epoch seconds or ISO 8601 text."""
+    if value is None or value == "":
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        return datetime.datetime.fromisoformat(value).timestamp()
+
+def _history_page(store, start, end):
+    """The newest HISTORY_ROW_LIMIT observations in [start, end), and where the next (older) page starts."""
+    observations = store.query(start, end, limit=HISTORY_ROW_LIMIT + 1, newest=True)
+    truncated = len(observations) > HISTORY_ROW_LIMIT
+    next_url = None
+    if truncated:
+        observations = observations[1:]
+        params = {"to": repr(observations[0]["logged_at"])}
+        if start is not None:
+            params["from"] = repr(start)
+        next_url = "/api/v1/history?" + urllib.parse.urlencode(params)
+    return {"from": start, "to": end, "truncated": truncated, "next": next_url, "observations": observations}
+
 
 class WebServerHelper:
     """Helper class to manage the Flask web server and its routes."""
 
-    def __init__(self, current_title, current_summary, warning_title, warning_summary, port=2046):
-        self.current_title = current_title
-        self.current_summary = current_summary
-        self.warning_title = warning_title
-        self.warning_summary = warning_summary
+    def __init__(self, state, port=2046, location_provider=None, history_provider=None, schedule_provider=None,
+                 shutdown_pid=None, metrics_provider=None, profiling=True):
+        self.state = state
+        # /shutdown stops the whole app: in web_mode: process that is the parent, not this process
+        self.shutdown_pid = shutdown_pid or os.getpid()
+        self.location_provider = location_provider
+        self.history_provider = history_provider
+        self.schedule_provider = schedule_provider
+        self.metrics_provider = metrics_provider or metrics_helper.REGISTRY.render_prometheus
+        # in web_mode: process the profiler here would only sample the web process
+        self.profiling = profiling
         self.port = port
+        self.cache = ResponseCache()
+        self.alerts = {}  # location index -> {id: Alert} last published to browsers
         app.add_url_rule("/weather", view_func=self.webweather)
+        app.add_url_rule("/api/v1/current", view_func=self.api_current)
+        app.add_url_rule("/api/v1/warnings", view_func=self.api_warnings)
+        app.add_url_rule("/api/v1/forecast", view_func=self.api_forecast)
+        app.add_url_rule("/api/v1/history", view_func=self.api_history)
+        app.add_url_rule("/debug/schedule", view_func=self.debug_schedule)
+        app.add_url_rule("/metrics", view_func=self.metrics)
         app.add_url_rule("/shutdown", view_func=self.shutdown, methods=["GET", "POST"])
+        app.add_url_rule("/profile/<action>", view_func=self.profile, methods=["GET", "POST"])
+        self.state.subscribe(self.publish_update)
+
+    def publish_update(self, delta, snapshot):
+        """Push changed fields to connected browsers as a weather_updated event."""
+        socketio.emit("weather_updated", delta)
+        logging.info(f"Emitted weather_updated with {sorted(delta)}")
+        if "alerts" in delta:
+            self.publish_alert_events(snapshot)
 
-    def webweather(self, timestamp_var=None):
+    def publish_alert_events(self, snapshot):
+        """Emit a warning_event for each alert issued, updated or ended at the displayed location.
+
+        Alerts are compared per location, so switching locations does not
+        look like alerts being issued or ended.
+        """
+        location = snapshot["location"]
+        current = {alert["id"]: Alert(**alert) for alert in snapshot["alerts"]}
+        previous = self.alerts.get(location)
+        self.alerts[location] = current
+        if previous is None:
+            return  # first sight of this location, nothing to compare with
+        for event in diff_alerts(previous, current):
+            socketio.emit("warning_event", event.to_dict())
+            logging.info(f"Emitted warning_event {event.kind}: {event.alert.title}")
+
+    def webweather(self):
         """Flask route to display weather information."""
         logging.info("Flask route accessed!")
+        # /weather?location=N shows another polled location from the poller's cache
+        if request.args.get("location") is None:
+            snapshot = self.state.snapshot()
+            return self.cache.get(
+                "weather.html", snapshot["version"],
+                lambda: self._render_weather().encode("utf-8"), "text/html; charset=utf-8"
+            ).to_response()
+        started = time.perf_counter()
+        page = self._render_weather()
+        RENDER_SECONDS.since(started)
+        return page
+
+    def _render_weather(self):
         css_url = url_for('static', filename='styles.css')
-        try:
-            last_updated_value = timestamp_var.get()
-        except Exception:
-            last_updated_value = datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        snapshot = self.state.snapshot()
+        current_title = snapshot["title"]
+        current_summary = snapshot["summary"]
+        warning_title = snapshot["warning_title"]
+        warning_summary = snapshot["warning_summary"]
+        forecast = snapshot["forecast"]
+        last_updated_value = snapshot["last_updated"] or "never"
+        stale = snapshot["stale"]
+        live = True
+        location_index = request.args.get("location", type=int)
+        if location_index is not None and self.location_provider is not None:
+            location = self.location_provider(location_index)
+            if location is None:
+                return "Unknown location or no data yet", 404
+            current_title = location["title"]
+            current_summary = location["summary"]
+            warning_title = location["warning_title"]
+            warning_summary = location["warning_summary"]
+            forecast = location.get("forecast", [])
+            stale = False
+            live = False
 
         return render_template(
             "weather.html",
             css_url=css_url,
-            current_title=self.current_title,
-            current_summary=self.current_summary,
-            warning_title=self.warning_title,
-            warning_summary=self.warning_summary,
-            last_updated=last_updated_value
+            current_title=current_title,
+            current_summary=current_summary,
+            warning_title=warning_title,
+            warning_summary=warning_summary,
+            forecast=forecast,
+            last_updated=last_updated_value,
+            stale=stale,
+            fetched_at=snapshot["fetched_at"],
+            live=live
         )
 
+    def api_current(self):
+        """JSON API: current conditions on display."""
+        snapshot = self.state.snapshot()
+        return self.cache.get("current", snapshot["version"], lambda: _json_body({
+            "title": snapshot["title"],
+            "summary": snapshot["summary"],
+            "link": snapshot["link"],
+            "conditions": snapshot["conditions"],
+            "location": snapshot["location"],
+            "last_updated": snapshot["last_updated"],
+            "fetched_at": snapshot["fetched_at"],
+            "stale": snapshot["stale"],
+            "version": snapshot["version"],
+        }), "application/json").to_response()
+
+    def api_warnings(self):
+        """JSON API: warnings and watches on display."""
+        snapshot = self.state.snapshot()
+        return self.cache.get("warnings", snapshot["version"], lambda: _json_body({
+            "warning_title": snapshot["warning_title"],
+            "warning_summary": snapshot["warning_summary"],
+            "alerts": snapshot["alerts"],
+            "last_updated": snapshot["last_updated"],
+            "fetched_at": snapshot["fetched_at"],
+            "stale": snapshot["stale"],
+            "version": snapshot["version"],
+        }), "application/json").to_response()
+
+    def api_forecast(self):
+        """JSON API: forecast periods for the location on display."""
+        snapshot = self.state.snapshot()
+        return self.cache.get("forecast", snapshot["version"], lambda: _json_body({
+            "forecast": snapshot["forecast"],
+            "location": snapshot["location"],
+            "last_updated": snapshot["last_updated"],
+            "fetched_at": snapshot["fetched_at"],
+            "stale": snapshot["stale"],
+            "version": snapshot["version"],
+        }), "application/json").to_response()
+
+    def api_history(self):
+        """JSON API: logged observations between ?from= and ?to= (epoch seconds or ISO 8601).
+
+        At most HISTORY_ROW_LIMIT observations, the newest in the range. When
+        more matched, "truncated" is true and "next" is the URL of the page
+        before them.
+        """
+        store = self.history_provider() if self.history_provider is not None else None
+        if store is None:
+            return Response(_json_body({"error": "history is not enabled"}), status=404,
+                            content_type="application/json")
+        try:
+            start = _parse_time(request.args.get("from"))
+            end = _parse_time(request.args.get("to"))
+        except ValueError:
+            return Response(_json_body({"error": "from/to must be epoch seconds or ISO 8601"}), status=400,
+                            content_type="application/json")
+        return self.cache.get(("history", start, end), store.revision,
+                              lambda: _json_body(_history_page(store, start, end)), "application/json").to_response()
+
+    def debug_schedule(self):
+        """Active timer chains and polling rate. Only accessible from localhost."""
+        if request.remote_addr != "127.0.0.1":
+            return "Forbidden", 403
+        if self.schedule_provider is None:
+            return Response(_json_body({"error": "not available in this process"}), status=404,
+                            content_type="application/json")
+        schedule = self.schedule_provider()
+        if schedule is None:
+            return Response(_json_body({"error": "no schedule received from the app yet"}), status=503,
+                            content_type="application/json")
+        return Response(_json_body(schedule), content_type="application/json",
+                        headers={"Cache-Control": "no-store"})
+
+    def metrics(self):
+        """Counters and timers of the app in the Prometheus text format."""
+        return Response(self.metrics_provider(), content_type=METRICS_CONTENT_TYPE,
+                        headers={"Cache-Control": "no-store"})
+
     def shutdown(self):
         """Flask route to shut down the server. Only accessible from localhost."""
         if request.remote_addr != "127.0.0.1":
             return "Forbidden", 403
 
         # Schedule shutdown after response is sent
-        threading.Timer(1.0, lambda: os.kill(os.getpid(), signal.SIGTERM)).start()
+        threading.Timer(1.0, lambda: os.kill(self.shutdown_pid, signal.SIGTERM)).start()
 
         return "Server is shutting down..."
 
+    def profile(self, action):
+        """Start (?seconds=N), stop or check the sampling profiler. Only accessible from localhost."""
+        if request.remote_addr != "127.0.0.1":
+            return "Forbidden", 403
+        if not self.profiling:
+            return Response(_json_body({"error": "this web process runs apart from the app; "
+                                                 "use \"profile start\" in the app's command window"}),
+                            status=404, content_type="application/json")
+        profiler = get_profiler()
+        if action == "start":
+            if not profiler.start(request.args.get("seconds", DEFAULT_SECONDS, type=float)):
+                return Response(_json_body({"error": "a profile is already running", **profiler.status()}),
+                                status=409, content_type="application/json")
+        elif action == "stop":
+            profiler.stop()
+        elif action != "status":
+            return "Unknown profile action, use start, stop or status", 404
+        return Response(_json_body(profiler.status()), content_type="application/json",
+                        headers={"Cache-Control": "no-store"})
+
     def start_webserver(self):
         """Start the Flask web server in a separate thread."""
         if Config.get_config_bool(self, key="webserver"):
+            socketio.init_app(app, async_mode="threading")
+
             def run_server():
                 app.run(host="0.0.0.0", port=self.port, debug=False, use_reloader=False)
-            threading.Thread(target=run_server, daemon=True).start()
+            threading.Thread(target=run_server, name="weatherpeg-web", daemon=True).start()
         else:
             logging.info("Not starting webserver")
+
+    def serve_forever(self, async_mode, ready=None):
+        """Run the web server on this thread with a production Socket.IO server (web_service.py).
+
+        `ready()` is called once Socket.IO is initialised, before serving.
+        """
+        socketio.init_app(app, async_mode=async_mode)
+        if ready is not None:
+            ready()
+        logging.info(f"Serving on port {self.port} with async_mode={socketio.async_mode}")
+        socketio.run(app, host="0.0.0.0", port=self.port, allow_unsafe_werkzeug=True)